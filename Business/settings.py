@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,11 +42,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app.log.RequestContextMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'app.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -82,6 +85,40 @@ DATABASES = {
     }
 }
 
+# Cache shared by every worker process. Sessions, the catalog version,
+# rate limits, dashboard events and the Telegram limiter all rely on
+# workers seeing the same values, which the default per-process memory
+# cache doesn't give.
+#
+# Set REDIS_URL (and pip install redis) in production. Without it the
+# file backend below is used, which is only adequate for a single host
+# with light traffic:
+# - add() and incr() are read-then-write, not atomic, so two workers can
+#   both take the same token bucket slot, single-flight lock, digest lock
+#   or profiling slot, or hand out the same event/digest sequence number.
+# - Past MAX_ENTRIES it culls a third of the files at random, including
+#   keys stored without a timeout. A culled catalog:version only forces a
+#   rebuild and a culled event sequence makes dashboards resync, but a
+#   culled digest sequence or queued digest item means queued orders are
+#   never sent to Telegram.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': BASE_DIR / 'cache',
+            'OPTIONS': {
+                'MAX_ENTRIES': 10000,
+            },
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -130,6 +167,97 @@ MEDIA_ROOT = BASE_DIR / 'media'
 LOGIN_REDIRECT_URL = '/admin/'
 LOGOUT_REDIRECT_URL = '/'
 
+# Sessions (mostly anonymous shoppers' carts) are read from the cache and
+# written through to the database only when their data changes; a miss
+# (or an entry culled from the cache) falls back to the database. Run `python manage.py sweep_sessions` from a daily cron to
+# delete expired rows.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_SAVE_EVERY_REQUEST = False
+
+# On-demand profiling for staff requests (?_profile=cprofile|sample)
+PROFILING_ENABLED = True
+PROFILING_MAX_SESSIONS = 5  # profiled requests allowed per window
+PROFILING_WINDOW = 600  # seconds
+PROFILING_TTL = 3600  # seconds a captured profile is kept
+
+# Logging
+# Records from the app are queued and written as JSON lines by a background
+# listener thread, so request handling never blocks on log I/O.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'request_context': {
+            '()': 'app.log.RequestContextFilter',
+        },
+    },
+    'handlers': {
+        'json_queue': {
+            '()': 'app.log.QueueListenerHandler',
+            'filters': ['request_context'],
+        },
+    },
+    'loggers': {
+        'app': {
+            'handlers': ['json_queue'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# Live order events on the admin dashboard: each open dashboard holds a
+# request open for up to 55 seconds (admin_views.EVENT_STREAM_SECONDS) and
+# then reconnects. Under a sync WSGI server that ties up one worker per
+# open dashboard, so allow for them in the worker/thread count.
+
+# Rebuilt by one request at a time (app.singleflight); others get the
+# previous value meanwhile
+QR_CACHE_SECONDS = 86400  # UPI QR images, per UPI ID and amount
+DASHBOARD_STATS_SECONDS = 30
+
+# Each process's catalog snapshot is rebuilt when the catalog version in
+# the cache changes, and at least this often
+CATALOG_SNAPSHOT_MAX_AGE = 300
+
+# The active banner set is cached until the next scheduled start or end,
+# and at most this long
+BANNER_CACHE_SECONDS = 86400
+
+# Browser cache lifetimes of the JSON APIs, revalidated by ETag after
+PRICE_TABLE_MAX_AGE = 300  # /api/prices/
+CATALOG_API_MAX_AGE = 60  # /api/catalog/*
+
+# Per-client limits on the public endpoints, as (requests, seconds), kept
+# in token buckets in the shared cache. Refused requests get a 429 with
+# Retry-After.
+RATE_LIMITS = {
+    'track_order': (10, 60),  # per IP and per mobile number/email searched
+    'calculate_price': (60, 60),
+    'upi_qr': (30, 60),
+    'create_order': (5, 300),  # checkouts, per IP and per mobile number
+}
+RATELIMIT_IP_META = 'REMOTE_ADDR'  # e.g. 'HTTP_X_REAL_IP' behind nginx
+
+# Telegram notifications
+TELEGRAM_API_BASE = 'https://api.telegram.org'  # point at a local stub to test the bot
+# Sends share a per-chat token bucket in the shared cache, so the limit
+# applies to all worker processes together.
+TELEGRAM_MESSAGES_PER_SECOND = 1
+TELEGRAM_BURST = 1
+TELEGRAM_MAX_WAIT = 5  # seconds a request may wait for its turn before the order is queued for a digest
+# Seconds over which new orders are collected into one summary message;
+# 0 sends one message per order. Either way, orders that can't be sent
+# within TELEGRAM_MAX_WAIT are queued for a digest and flushed by a timer
+# in the worker that queued them, which is lost if that worker exits.
+# Always run `manage.py flush_telegram_digest` from cron (every minute)
+# so those orders are still sent.
+TELEGRAM_DIGEST_WINDOW = 0
+
+# Completed/cancelled orders older than this are moved to the archive
+# tables by `python manage.py archive_orders` (run it from a daily cron)
+ORDER_ARCHIVE_AFTER_DAYS = 365
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
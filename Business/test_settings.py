@@ -0,0 +1,13 @@
+"""
+Settings for the test suite.
+
+    python manage.py test --settings=Business.test_settings
+"""
+
+from .settings import *  # noqa: F401,F403
+
+# Each test process gets its own cache so tests never see entries left in
+# the shared cache directory by the running site or another run
+CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
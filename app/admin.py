@@ -1,8 +1,31 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.db.models import Exists, OuterRef
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from .models import Product, ProductImage, Order, OrderItem, CustomizationDetails, PaymentProof, WebsiteSettings, Banner
+from .models import Product, ProductImage, Order, OrderItem, CustomizationDetails, PaymentProof, WebsiteSettings, Banner, ArchivedOrder
+from .pagination import EstimatedCountPaginator
+
+
+def thumbnail(url, max_height, max_width=None, link=False):
+    """Preview image that the browser only fetches when scrolled into view"""
+    img = format_html(
+        '<img src="{}" loading="lazy" decoding="async" style="max-height: {}px; max-width: {}px;" />',
+        url, max_height, max_width or max_height
+    )
+    if link:
+        return format_html('<a href="{}" target="_blank">{}</a>', url, img)
+    return img
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Changelist settings for tables that grow with every order: no exact
+    COUNT(*) for the result total, and raw ID inputs instead of <select>s
+    listing every related row.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 class ProductImageInline(admin.TabularInline):
@@ -12,7 +35,7 @@ class ProductImageInline(admin.TabularInline):
     
     def image_preview(self, obj):
         if obj.image:
-            return format_html('<img src="{}" style="max-height: 50px; max-width: 50px;" />', obj.image.url)
+            return thumbnail(obj.image.url, 50)
         return "No image"
     image_preview.short_description = "Preview"
 
@@ -31,17 +54,20 @@ class OrderItemInline(admin.TabularInline):
     extra = 0
     readonly_fields = ['product', 'quantity', 'unit_price', 'total_price', 'customization_preview']
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product', 'customization')
+    
     def customization_preview(self, obj):
         if hasattr(obj, 'customization'):
             custom = obj.customization
             html = []
             if custom.custom_text:
-                html.append(f'<strong>Text:</strong> "{custom.custom_text}"')
+                html.append(format_html('<strong>Text:</strong> "{}"', custom.custom_text))
             if custom.custom_image:
-                html.append(f'<strong>Image:</strong> <img src="{custom.image.url}" style="max-height: 30px; max-width: 30px;" />')
+                html.append(format_html('<strong>Image:</strong> {}', thumbnail(custom.custom_image.url, 30, link=True)))
             if custom.notes:
-                html.append(f'<strong>Notes:</strong> {custom.notes}')
-            return format_html('<br>'.join(html)) if html else 'No customization'
+                html.append(format_html('<strong>Notes:</strong> {}', custom.notes))
+            return mark_safe('<br>'.join(html)) if html else 'No customization'
         return 'No customization'
     customization_preview.short_description = "Customization"
 
@@ -53,22 +79,42 @@ class PaymentProofInline(admin.TabularInline):
     
     def screenshot_preview(self, obj):
         if obj.screenshot:
-            return format_html(
-                '<a href="{}" target="_blank"><img src="{}" style="max-height: 100px; max-width: 100px;" /></a>',
-                obj.screenshot.url, obj.screenshot.url
-            )
+            return thumbnail(obj.screenshot.url, 100, link=True)
         return "No screenshot"
     screenshot_preview.short_description = "Payment Screenshot"
 
 
+def status_action(status, label):
+    """Admin action moving the selected orders to status via bulk_set_status"""
+    def action(modeladmin, request, queryset):
+        order_ids = queryset.values_list('order_id', flat=True)
+        results = Order.objects.bulk_set_status({order_id: status for order_id in order_ids})
+        changed = sum(1 for result in results.values() if result['success'])
+        modeladmin.message_user(request, f'{changed} orders marked as {label}.')
+        skipped = len(results) - changed
+        if skipped:
+            modeladmin.message_user(
+                request, f'{skipped} orders cannot move to {label} from their current status.', level=messages.WARNING
+            )
+    action.__name__ = f'mark_{status}'
+    action.short_description = f'Mark selected orders as {label}'
+    return action
+
+
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(LargeTableAdmin):
     list_display = ['order_id_short', 'full_name', 'mobile_number', 'status', 'total_amount', 'created_at', 'payment_status']
     list_filter = ['status', 'created_at']
     search_fields = ['order_id', 'full_name', 'mobile_number', 'email']
     readonly_fields = ['order_id', 'created_at', 'updated_at', 'order_summary']
+    raw_id_fields = ['user']
     inlines = [OrderItemInline, PaymentProofInline]
-    list_editable = ['status']
+    # Status changes go through bulk_set_status, which checks the allowed
+    # transitions and updates many orders at once, instead of list_editable
+    actions = [
+        status_action(status, label) for status, label in Order.STATUS_CHOICES
+        if status != 'pending_payment'  # nothing moves back to pending
+    ]
     
     fieldsets = (
         ('Order Information', {
@@ -102,17 +148,23 @@ class OrderAdmin(admin.ModelAdmin):
         )
     status_badge.short_description = 'Status'
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            has_payment_proof=Exists(PaymentProof.objects.filter(order=OuterRef('pk')))
+        )
+    
     def payment_status(self, obj):
-        if hasattr(obj, 'payment_proof'):
+        if obj.has_payment_proof:
             return format_html('<span style="color: green;">✓ Proof Uploaded</span>')
         return format_html('<span style="color: red;">✗ No Proof</span>')
     payment_status.short_description = 'Payment'
+    payment_status.admin_order_field = 'has_payment_proof'
     
     def order_summary(self, obj):
         items_html = []
-        for item in obj.items.all():
-            items_html.append(f"• {item.product.name} x {item.quantity} = ₹{item.total_price}")
-        return format_html('<br>'.join(items_html))
+        for item in obj.items.select_related('product'):
+            items_html.append(format_html("• {} x {} = ₹{}", item.product.name, item.quantity, item.total_price))
+        return mark_safe('<br>'.join(items_html))
     order_summary.short_description = 'Items'
     
     # Mobile-friendly admin
@@ -123,16 +175,20 @@ class OrderAdmin(admin.ModelAdmin):
 
 
 @admin.register(OrderItem)
-class OrderItemAdmin(admin.ModelAdmin):
+class OrderItemAdmin(LargeTableAdmin):
     list_display = ['order', 'product', 'quantity', 'unit_price', 'total_price']
     list_filter = ['product', 'order__status']
+    list_select_related = ['order', 'product']
+    raw_id_fields = ['order', 'product']
     readonly_fields = ['total_price']
 
 
 @admin.register(CustomizationDetails)
-class CustomizationDetailsAdmin(admin.ModelAdmin):
+class CustomizationDetailsAdmin(LargeTableAdmin):
     list_display = ['order_item', 'custom_text', 'has_image', 'notes_preview']
     search_fields = ['custom_text', 'notes']
+    list_select_related = ['order_item__product']
+    raw_id_fields = ['order_item']
     readonly_fields = ['image_preview']
     
     def has_image(self, obj):
@@ -146,26 +202,29 @@ class CustomizationDetailsAdmin(admin.ModelAdmin):
     
     def image_preview(self, obj):
         if obj.custom_image:
-            return format_html('<img src="{}" style="max-height: 200px; max-width: 200px;" />', obj.custom_image.url)
+            return thumbnail(obj.custom_image.url, 200, link=True)
         return "No image uploaded"
     image_preview.short_description = "Customer Image"
 
 
 @admin.register(PaymentProof)
-class PaymentProofAdmin(admin.ModelAdmin):
+class PaymentProofAdmin(LargeTableAdmin):
     list_display = ['order', 'upi_transaction_id', 'uploaded_at', 'screenshot_preview']
     list_filter = ['uploaded_at']
+    search_fields = ['=upi_transaction_id']
+    list_select_related = ['order']
+    raw_id_fields = ['order']
     readonly_fields = ['uploaded_at', 'large_screenshot_preview']
     
     def screenshot_preview(self, obj):
         if obj.screenshot:
-            return format_html('<img src="{}" style="max-height: 50px; max-width: 50px;" />', obj.screenshot.url)
+            return thumbnail(obj.screenshot.url, 50)
         return "No screenshot"
     screenshot_preview.short_description = "Preview"
     
     def large_screenshot_preview(self, obj):
         if obj.screenshot:
-            return format_html('<img src="{}" style="max-height: 400px; max-width: 400px;" />', obj.screenshot.url)
+            return thumbnail(obj.screenshot.url, 400, link=True)
         return "No screenshot uploaded"
     large_screenshot_preview.short_description = "Payment Screenshot"
 
@@ -203,7 +262,7 @@ class WebsiteSettingsAdmin(admin.ModelAdmin):
 
 @admin.register(Banner)
 class BannerAdmin(admin.ModelAdmin):
-    list_display = ['title', 'banner_type', 'is_active', 'order', 'image_preview', 'created_at']
+    list_display = ['title', 'banner_type', 'is_active', 'order', 'starts_at', 'ends_at', 'image_preview', 'created_at']
     list_filter = ['banner_type', 'is_active', 'created_at']
     list_editable = ['is_active', 'order']
     search_fields = ['title', 'subtitle']
@@ -217,17 +276,30 @@ class BannerAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
         ('Display Settings', {
-            'fields': ('is_active', 'order')
+            'fields': ('is_active', 'order', 'starts_at', 'ends_at')
         })
     )
     
     def image_preview(self, obj):
         if obj.image:
-            return format_html('<img src="{}" style="max-height: 50px; max-width: 100px;" />', obj.image.url)
+            return thumbnail(obj.image.url, 50, 100)
         return "No image"
     image_preview.short_description = "Preview"
 
 
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(LargeTableAdmin):
+    list_display = ['order_id', 'full_name', 'mobile_number', 'status', 'total_amount', 'created_at', 'archived_at']
+    list_filter = ['status']
+    search_fields = ['order_id', 'mobile_number', 'email']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 # Customize admin site
 admin.site.site_header = "Leena's Craft Admin"
 admin.site.site_title = "Leena's Craft"
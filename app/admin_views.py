@@ -2,15 +2,36 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse, HttpResponseBadRequest, Http404, StreamingHttpResponse
+from django.db import connection
 from django.db.models import Q, Count
 from django.core.paginator import Paginator
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.conf import settings as django_settings
 from datetime import datetime, timedelta
+import csv
 import json
+import logging
+import time
 
-from .models import Product, ProductImage, Order, OrderItem, CustomizationDetails, PaymentProof, WebsiteSettings, Banner
-from .forms import AdminLoginForm, ProductForm, WebsiteSettingsForm, BannerForm
+from .models import Product, ProductImage, Order, OrderItem, CustomizationDetails, PaymentProof, WebsiteSettings, Banner, ArchivedOrder
+from .forms import AdminLoginForm, ProductForm, WebsiteSettingsForm, BannerForm, ProductImportForm
+from .middleware import get_stored_profile
+from .singleflight import get_or_compute
+from . import events
+
+
+logger = logging.getLogger(__name__)
+
+
+BULK_STATUS_UPDATE_LIMIT = 500
+
+# Dashboard event stream: each connection lives this long, then the
+# browser's EventSource reconnects with Last-Event-ID
+EVENT_STREAM_SECONDS = 55
+EVENT_POLL_INTERVAL = 1
+EVENT_KEEPALIVE_SECONDS = 15
 
 
 def is_admin(user):
@@ -48,51 +69,84 @@ def admin_logout_view(request):
     return redirect('admin_login')
 
 
+def _dashboard_stats():
+    """Order counts and recent orders, with the last event they include"""
+    today = timezone.now().date()
+    stats = Order.objects.aggregate(
+        total_orders=Count('id'),
+        pending_orders=Count('id', filter=Q(status='pending_payment')),
+        confirmed_orders=Count('id', filter=Q(status='confirmed')),
+        in_progress_orders=Count('id', filter=Q(status='in_progress')),
+        completed_orders=Count('id', filter=Q(status='completed')),
+        # Orders needing attention (pending payment with proof)
+        orders_need_attention=Count('id', filter=Q(status='pending_payment', payment_proof__isnull=False)),
+        today_orders=Count('id', filter=Q(created_at__date=today)),
+    )
+    stats['recent_orders'] = list(Order.objects.order_by('-created_at')[:5])
+    stats['last_event_id'] = events.latest_event_id()
+    return stats
+
+
 @user_passes_test(is_admin)
 def admin_dashboard(request):
     """Admin dashboard with overview"""
-    # Get statistics
-    total_orders = Order.objects.count()
-    pending_orders = Order.objects.filter(status='pending_payment').count()
-    confirmed_orders = Order.objects.filter(status='confirmed').count()
-    in_progress_orders = Order.objects.filter(status='in_progress').count()
-    completed_orders = Order.objects.filter(status='completed').count()
-    
-    # Recent orders
-    recent_orders = Order.objects.select_related().prefetch_related('items__product').order_by('-created_at')[:5]
-    
-    # Orders needing attention (pending payment with proof)
-    orders_need_attention = Order.objects.filter(
-        status='pending_payment',
-        payment_proof__isnull=False
-    ).count()
-    
-    # Today's orders
-    today = timezone.now().date()
-    today_orders = Order.objects.filter(created_at__date=today).count()
-    
-    context = {
-        'total_orders': total_orders,
-        'pending_orders': pending_orders,
-        'confirmed_orders': confirmed_orders,
-        'in_progress_orders': in_progress_orders,
-        'completed_orders': completed_orders,
-        'recent_orders': recent_orders,
-        'orders_need_attention': orders_need_attention,
-        'today_orders': today_orders,
-    }
-    
+    # Shared by all open dashboards for a short while; the page's event
+    # stream resumes from the cached last_event_id, so orders placed since
+    # are replayed into the counts
+    context = get_or_compute(
+        'dashboard:stats', _dashboard_stats, getattr(django_settings, 'DASHBOARD_STATS_SECONDS', 30)
+    )
     return render(request, 'admin-portal/dashboard.html', context)
 
 
+def _sse(event_type, data, event_id=None):
+    message = f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+    return f"id: {event_id}\n{message}" if event_id is not None else message
+
+
 @user_passes_test(is_admin)
-def admin_orders(request):
-    """Orders management"""
-    status_filter = request.GET.get('status', '')
-    search = request.GET.get('search', '')
-    
-    orders = Order.objects.select_related().prefetch_related('items__product', 'payment_proof')
-    
+def admin_order_events(request):
+    """Server-sent events for the dashboard: order_created, status_changed,
+    payment_proof_added.
+    
+    The stream polls the cache-backed event sequence (app.events) and never
+    queries the database, so an idle dashboard costs nothing. Connections
+    end after EVENT_STREAM_SECONDS and the browser resumes from
+    Last-Event-ID; a client too far behind gets a "resync" event.
+    """
+    try:
+        last_id = int(request.headers.get('Last-Event-ID') or request.GET.get('since', ''))
+    except ValueError:
+        last_id = events.latest_event_id()
+    
+    def stream():
+        nonlocal last_id
+        # Nothing below uses the database; don't hold a connection open
+        connection.close()
+        yield "retry: 3000\n\n"
+        deadline = time.monotonic() + EVENT_STREAM_SECONDS
+        keepalive = time.monotonic() + EVENT_KEEPALIVE_SECONDS
+        while time.monotonic() < deadline:
+            pending = events.events_since(last_id)
+            if pending is None:
+                yield _sse('resync', {})
+                return
+            for event in pending:
+                last_id = event['id']
+                yield _sse(event['type'], event['data'], event['id'])
+            if time.monotonic() >= keepalive:
+                yield ": keepalive\n\n"
+                keepalive = time.monotonic() + EVENT_KEEPALIVE_SECONDS
+            time.sleep(EVENT_POLL_INTERVAL)
+    
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: don't buffer the stream
+    return response
+
+
+def filter_orders(orders, status_filter='', search='', date_from=None, date_to=None):
+    """Apply the admin order list filters to an Order queryset"""
     if status_filter:
         orders = orders.filter(status=status_filter)
     
@@ -104,7 +158,22 @@ def admin_orders(request):
             Q(email__icontains=search)
         )
     
-    orders = orders.order_by('-created_at')
+    if date_from:
+        orders = orders.filter(created_at__date__gte=date_from)
+    if date_to:
+        orders = orders.filter(created_at__date__lte=date_to)
+    
+    return orders
+
+
+@user_passes_test(is_admin)
+def admin_orders(request):
+    """Orders management"""
+    status_filter = request.GET.get('status', '')
+    search = request.GET.get('search', '')
+    
+    orders = Order.objects.select_related().prefetch_related('items__product', 'payment_proof')
+    orders = filter_orders(orders, status_filter, search).order_by('-created_at')
     
     # Pagination
     paginator = Paginator(orders, 10)
@@ -121,18 +190,109 @@ def admin_orders(request):
     return render(request, 'admin-portal/orders.html', context)
 
 
+class _Echo:
+    """File-like object for csv.writer that returns rows instead of storing them"""
+    def write(self, value):
+        return value
+
+
+ORDER_EXPORT_COLUMNS = [
+    ('Order ID', 'order_id'),
+    ('Order Date', 'created_at'),
+    ('Status', 'status'),
+    ('Customer Name', 'full_name'),
+    ('Mobile', 'mobile_number'),
+    ('Email', 'email'),
+    ('Delivery Address', 'delivery_address'),
+    ('Order Total', 'total_amount'),
+    ('Product', 'items__product__name'),
+    ('Quantity', 'items__quantity'),
+    ('Unit Price', 'items__unit_price'),
+    ('Item Total', 'items__total_price'),
+    ('Custom Text', 'items__customization__custom_text'),
+    ('Custom Image', 'items__customization__custom_image'),
+    ('Notes', 'items__customization__notes'),
+    ('UPI Transaction ID', 'payment_proof__upi_transaction_id'),
+    ('Payment Screenshot', 'payment_proof__screenshot'),
+    ('Payment Uploaded At', 'payment_proof__uploaded_at'),
+]
+
+
+@user_passes_test(is_admin)
+def admin_orders_export(request):
+    """Stream filtered orders as CSV, one row per order item.
+    
+    Items are left-joined onto the orders, so an order without items
+    still gets a single row with the item columns blank. Rows are read with values_list() in chunks and written as they are
+    produced, so memory stays flat regardless of the number of orders.
+    Accepts the same status/search filters as the orders page plus
+    date_from/date_to (YYYY-MM-DD).
+    """
+    try:
+        # parse_date returns None for a malformed value but raises for an
+        # impossible one like 2024-02-30
+        date_from = parse_date(request.GET.get('date_from', ''))
+        date_to = parse_date(request.GET.get('date_to', ''))
+    except ValueError:
+        return HttpResponseBadRequest('date_from and date_to must be valid YYYY-MM-DD dates')
+    
+    orders = filter_orders(
+        Order.objects.all(),
+        request.GET.get('status', ''),
+        request.GET.get('search', ''),
+        date_from,
+        date_to,
+    )
+    
+    fields = [field for _, field in ORDER_EXPORT_COLUMNS]
+    date_indexes = [fields.index('created_at'), fields.index('payment_proof__uploaded_at')]
+    file_indexes = [fields.index('items__customization__custom_image'), fields.index('payment_proof__screenshot')]
+    media_root = request.build_absolute_uri(django_settings.MEDIA_URL)
+    
+    rows = orders.order_by(
+        '-created_at', 'id', 'items__id'
+    ).values_list(*fields).iterator(chunk_size=2000)
+    
+    def stream():
+        writer = csv.writer(_Echo())
+        # BOM so Excel detects UTF-8 (customer names, ₹ symbols)
+        yield '\ufeff' + writer.writerow([label for label, _ in ORDER_EXPORT_COLUMNS])
+        for row in rows:
+            row = list(row)
+            for i in date_indexes:
+                if row[i]:
+                    row[i] = timezone.localtime(row[i]).strftime('%Y-%m-%d %H:%M:%S')
+            for i in file_indexes:
+                row[i] = media_root + row[i] if row[i] else ''
+            yield writer.writerow(['' if value is None else value for value in row])
+    
+    filename = f"orders-{timezone.localdate().strftime('%Y%m%d')}.csv"
+    response = StreamingHttpResponse(stream(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
 @user_passes_test(is_admin)
 def admin_order_detail(request, order_id):
     """Order detail and management"""
-    order = get_object_or_404(Order, order_id=order_id)
+    try:
+        order = Order.objects.with_full_detail().get(order_id=order_id)
+    except Order.DoesNotExist:
+        # Archived orders are read-only
+        order = get_object_or_404(ArchivedOrder.objects.with_full_detail(), order_id=order_id)
+        return render(request, 'admin-portal/order_detail.html', {
+            'order': order,
+            'status_choices': Order.STATUS_CHOICES,
+        })
     
     if request.method == 'POST':
-        new_status = request.POST.get('status')
-        if new_status in dict(Order.STATUS_CHOICES):
-            order.status = new_status
-            order.save()
-            messages.success(request, f'Order status updated to {order.get_status_display()}')
-            return redirect('admin_order_detail', order_id=order_id)
+        new_status = request.POST.get('status', '')
+        result, = Order.objects.bulk_set_status({order.order_id: new_status}).values()
+        if result['success']:
+            messages.success(request, f'Order status updated to {dict(Order.STATUS_CHOICES)[new_status]}')
+        else:
+            messages.error(request, result['error'])
+        return redirect('admin_order_detail', order_id=order_id)
     
     return render(request, 'admin-portal/order_detail.html', {
         'order': order,
@@ -190,7 +350,36 @@ def admin_product_add(request):
         'form': form,
         'title': 'Add New Product',
     })
-#
+
+
+@user_passes_test(is_admin)
+def admin_product_import(request):
+    """Bulk product import from a CSV and a zip of images"""
+    report = None
+    
+    if request.method == 'POST':
+        form = ProductImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            from .catalog_import import import_catalog
+            report = import_catalog(
+                form.cleaned_data['csv_file'].read(),
+                form.cleaned_data.get('images_zip'),
+                dry_run=form.cleaned_data['dry_run'],
+            )
+            if report.dry_run:
+                messages.info(request, f'Dry run: {report.products_created} products would be created.')
+            elif report.products_created:
+                messages.success(request, f'{report.products_created} products imported successfully!')
+            if report.errors:
+                messages.warning(request, f'{len(report.errors)} problems found. See the report below.')
+    else:
+        form = ProductImportForm()
+    
+    return render(request, 'admin-portal/product_import.html', {
+        'form': form,
+        'report': report,
+    })
+
 
 @user_passes_test(is_admin)
 def admin_product_edit(request, product_id):
@@ -331,8 +520,7 @@ def admin_banner_add(request):
                 return redirect('admin_banners')
             except Exception as e:
                 # Log and show user-friendly error
-                import traceback
-                traceback.print_exc()
+                logger.exception("Error saving banner")
                 messages.error(request, f'Error saving banner: {str(e)}')
         else:
             # Show form errors at top so admin can see what's wrong
@@ -406,37 +594,72 @@ def admin_product_delete(request, product_id):
 
 @user_passes_test(is_admin)
 def admin_update_order_status(request):
-    """AJAX endpoint to update order status"""
-    if request.method == 'POST':
-        try:
-            data = json.loads(request.body)
-            order_id = data.get('order_id')
-            new_status = data.get('status')
-            
-            order = get_object_or_404(Order, order_id=order_id)
-            
-            if new_status in dict(Order.STATUS_CHOICES):
-                order.status = new_status
-                order.save()
-                
-                return JsonResponse({
-                    'success': True,
-                    'message': f'Order status updated to {order.get_status_display()}',
-                    'status_display': order.get_status_display()
-                })
-            else:
-                return JsonResponse({
-                    'success': False,
-                    'error': 'Invalid status'
-                })
-                
-        except Exception as e:
-            return JsonResponse({
-                'success': False,
-                'error': str(e)
-            })
+    """AJAX endpoint to update order status, within Order.STATUS_TRANSITIONS"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request'})
+    
+    try:
+        data = json.loads(request.body)
+        order_id = data['order_id']
+        new_status = data['status']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'success': False, 'error': 'Invalid request body'})
+    if not isinstance(order_id, str) or not isinstance(new_status, str):
+        return JsonResponse({'success': False, 'error': 'Invalid request body'})
+    
+    result, = Order.objects.bulk_set_status({order_id: new_status}).values()
+    if not result['success']:
+        return JsonResponse(result)
+    
+    status_display = dict(Order.STATUS_CHOICES)[new_status]
+    return JsonResponse({
+        'success': True,
+        'message': f'Order status updated to {status_display}',
+        'status_display': status_display
+    })
+
+
+@user_passes_test(is_admin)
+def admin_bulk_update_order_status(request):
+    """AJAX endpoint to update the status of many orders at once.
+    
+    Accepts either {"order_ids": [...], "status": "..."} or
+    {"updates": [{"order_id": "...", "status": "..."}, ...]} and returns
+    per-order results.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request'})
     
-    return JsonResponse({'success': False, 'error': 'Invalid request'})
+    try:
+        data = json.loads(request.body)
+        if 'updates' in data:
+            changes = {u['order_id']: u['status'] for u in data['updates']}
+        else:
+            if not isinstance(data.get('order_ids', []), list):
+                raise TypeError
+            changes = {order_id: data.get('status') for order_id in data.get('order_ids', [])}
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return JsonResponse({'success': False, 'error': 'Invalid request body'})
+    if not all(isinstance(key, str) for key in changes):
+        return JsonResponse({'success': False, 'error': 'Invalid request body'})
+    
+    if not changes:
+        return JsonResponse({'success': False, 'error': 'No orders selected'})
+    if len(changes) > BULK_STATUS_UPDATE_LIMIT:
+        return JsonResponse({
+            'success': False,
+            'error': f'At most {BULK_STATUS_UPDATE_LIMIT} orders can be updated at once'
+        })
+    
+    results = Order.objects.bulk_set_status(changes)
+    updated = sum(1 for result in results.values() if result['success'])
+    
+    return JsonResponse({
+        'success': True,
+        'updated': updated,
+        'failed': len(results) - updated,
+        'results': results,
+    })
 
 
 @user_passes_test(is_admin)
@@ -469,4 +692,34 @@ def admin_analytics(request):
         'top_products': top_products,
     }
     
-    return render(request, 'admin-portal/analytics.html', context)
\ No newline at end of file
+    return render(request, 'admin-portal/analytics.html', context)
+
+@user_passes_test(is_admin)
+def admin_profile_detail(request, profile_id):
+    """Download a profile captured by ProfilingMiddleware.
+
+    ?format=collapsed returns flamegraph-ready stacks (sample mode),
+    ?format=pstats returns a .prof file for snakeviz/flameprof (cProfile mode),
+    anything else returns the timings and SQL as JSON.
+    """
+    profile = get_stored_profile(profile_id)
+    if profile is None:
+        raise Http404('Profile not found or expired')
+
+    output = request.GET.get('format', 'json')
+    if output == 'collapsed' and 'collapsed' in profile:
+        return HttpResponse(profile['collapsed'], content_type='text/plain; charset=utf-8')
+    if output == 'pstats' and 'pstats' in profile:
+        response = HttpResponse(profile['pstats'], content_type='application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="{profile_id}.prof"'
+        return response
+
+    return JsonResponse({
+        'mode': profile['mode'],
+        'method': profile['method'],
+        'path': profile['path'],
+        'status_code': profile['status_code'],
+        'duration_ms': profile['duration_ms'],
+        'query_count': profile['query_count'],
+        'queries': profile['queries'],
+    })
@@ -0,0 +1,133 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from .models import (
+    Order, OrderItem, ArchivedOrder, ArchivedOrderItem,
+    ArchivedCustomizationDetails, ArchivedPaymentProof,
+)
+from .storage import media_storage
+
+
+ARCHIVABLE_STATUSES = ['completed', 'cancelled']
+
+
+def archive_cutoff(days=None):
+    """Orders created before this moment are eligible for archiving"""
+    if days is None:
+        days = getattr(settings, 'ORDER_ARCHIVE_AFTER_DAYS', 365)
+    return timezone.now() - timedelta(days=days)
+
+
+def archivable_orders(cutoff):
+    return Order.objects.filter(status__in=ARCHIVABLE_STATUSES, created_at__lt=cutoff)
+
+
+def archive_batch(order_pks):
+    """
+    Copy the given orders with their items, customizations and payment
+    proofs into the archive tables and delete them from the live tables,
+    all in one transaction. Media files are left in place; the archive
+    rows point at the same paths.
+
+    Returns:
+        int: number of orders archived
+    """
+    with transaction.atomic():
+        orders = list(
+            Order.objects.filter(pk__in=order_pks, status__in=ARCHIVABLE_STATUSES)
+            .select_for_update()
+            .select_related('payment_proof')
+            .prefetch_related(Prefetch(
+                'items', queryset=OrderItem.objects.select_related('product', 'customization')
+            ))
+        )
+        if not orders:
+            return 0
+
+        archived = ArchivedOrder.objects.bulk_create([
+            ArchivedOrder(
+                order_id=order.order_id,
+                user_id=order.user_id,
+                full_name=order.full_name,
+                mobile_number=order.mobile_number,
+                email=order.email,
+                delivery_address=order.delivery_address,
+                status=order.status,
+                total_amount=order.total_amount,
+                created_at=order.created_at,
+                updated_at=order.updated_at,
+            )
+            for order in orders
+        ])
+
+        items = []
+        customizations = []
+        proofs = []
+        for order, archived_order in zip(orders, archived):
+            for item in order.items.all():
+                archived_item = ArchivedOrderItem(
+                    order=archived_order,
+                    product_id=item.product_id,
+                    product_name=item.product.name,
+                    quantity=item.quantity,
+                    unit_price=item.unit_price,
+                    total_price=item.total_price,
+                )
+                items.append(archived_item)
+                customization = getattr(item, 'customization', None)
+                if customization is not None:
+                    customizations.append((archived_item, customization))
+            proof = getattr(order, 'payment_proof', None)
+            if proof is not None:
+                proofs.append(ArchivedPaymentProof(
+                    order=archived_order,
+                    screenshot=proof.screenshot.name,
+                    upi_transaction_id=proof.upi_transaction_id,
+                    uploaded_at=proof.uploaded_at,
+                    **{field: getattr(proof, field) for field in ArchivedPaymentProof.PHASH_FIELDS},
+                ))
+
+        ArchivedOrderItem.objects.bulk_create(items)
+        ArchivedCustomizationDetails.objects.bulk_create([
+            ArchivedCustomizationDetails(
+                order_item=archived_item,
+                custom_text=customization.custom_text,
+                custom_image=customization.custom_image.name,
+                notes=customization.notes,
+            )
+            for archived_item, customization in customizations
+        ])
+        ArchivedPaymentProof.objects.bulk_create(proofs)
+
+        # The archive rows take over the files, so each takes a reference
+        # before deleting the live rows releases theirs
+        for name in [proof.screenshot.name for proof in proofs] + [
+            customization.custom_image.name for _, customization in customizations
+        ]:
+            if name:
+                media_storage.retain(name)
+
+        # Cascades to items, customizations and payment proofs
+        Order.objects.filter(pk__in=[order.pk for order in orders]).delete()
+
+    return len(orders)
+
+
+def archive_orders(cutoff, batch_size=500):
+    """
+    Archive all eligible orders created before cutoff, one transaction per
+    batch so the live tables are never locked for long.
+
+    Yields the running total after each batch.
+    """
+    total = 0
+    while True:
+        batch = list(archivable_orders(cutoff).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return
+        total += archive_batch(batch)
+        yield total
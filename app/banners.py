@@ -0,0 +1,67 @@
+"""
+Which banners are showing right now.
+
+The active set only changes when an admin edits a banner (signals.py
+clears the cache) or when a scheduled start or end passes. The resolved
+set is cached until the next such time, so pages that show banners
+don't query them between transitions.
+"""
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Min, Q
+from django.utils import timezone
+
+
+BANNERS_CACHE_KEY = 'banners:active'
+
+
+def scheduled_now(now):
+    """Filter for banners whose schedule includes now"""
+    return (
+        (Q(starts_at__isnull=True) | Q(starts_at__lte=now))
+        & (Q(ends_at__isnull=True) | Q(ends_at__gt=now))
+    )
+
+
+def _resolve(now):
+    from .models import Banner
+
+    active = Banner.objects.filter(is_active=True)
+    grouped = {banner_type: [] for banner_type, _ in Banner.BANNER_TYPES}
+    for banner in active.filter(scheduled_now(now)):
+        grouped.setdefault(banner.banner_type, []).append(banner)
+
+    transitions = active.aggregate(
+        next_start=Min('starts_at', filter=Q(starts_at__gt=now)),
+        next_end=Min('ends_at', filter=Q(ends_at__gt=now)),
+    )
+    upcoming = [moment for moment in transitions.values() if moment is not None]
+    return grouped, min(upcoming) if upcoming else None
+
+
+def active_banners():
+    """
+    Active, currently scheduled banners by type ('hero', 'promotion',
+    'announcement'), each list in display order.
+    """
+    cached = cache.get(BANNERS_CACHE_KEY)
+    if cached is not None:
+        expires_at, grouped = cached
+        if time.time() < expires_at:
+            return grouped
+
+    now = timezone.now()
+    grouped, next_transition = _resolve(now)
+    ttl = getattr(settings, 'BANNER_CACHE_SECONDS', 86400)
+    if next_transition is not None:
+        ttl = min(ttl, (next_transition - now).total_seconds())
+    # The stored expiry is exact; the cache timeout only has to outlive it
+    cache.set(BANNERS_CACHE_KEY, (time.time() + ttl, grouped), math.ceil(ttl) + 1)
+    return grouped
+
+
+def clear_cache():
+    cache.delete(BANNERS_CACHE_KEY)
@@ -0,0 +1,128 @@
+from django.db import transaction
+
+from .catalog import get_catalog
+from .models import OrderItem, CustomizationDetails, IdempotencyKey
+
+
+CART_SESSION_KEY = 'cart'
+MAX_CART_LINES = 20
+
+
+class CartLine:
+    """A cart entry joined with its catalog product and current price"""
+
+    def __init__(self, index, product, data):
+        self.index = index
+        self.product = product
+        self.quantity = data['quantity']
+        self.custom_text = data.get('custom_text', '')
+        self.custom_image = data.get('custom_image', '')
+        self.notes = data.get('notes', '')
+        self.unit_price = product.base_price
+        self.total_price = product.base_price * self.quantity
+
+    @property
+    def custom_image_url(self):
+        if not self.custom_image:
+            return ''
+        return CustomizationDetails._meta.get_field('custom_image').storage.url(self.custom_image)
+
+
+class Cart:
+    """
+    Shopping cart kept in the session as a list of plain dicts.
+
+    Customization images are stored as soon as they are added, through the
+    normal content-hash storage, and only the stored name goes into the
+    session. Images from abandoned carts are unreferenced files that the
+    orphaned media collector reclaims after its grace period.
+    """
+
+    def __init__(self, request):
+        self.session = request.session
+        self.data = self.session.get(CART_SESSION_KEY, [])
+
+    def __len__(self):
+        return len(self.data)
+
+    def save(self):
+        self.session[CART_SESSION_KEY] = self.data
+        self.session.modified = True
+
+    def add(self, product, quantity, custom_text='', custom_image=None, notes=''):
+        image_name = ''
+        if custom_image:
+            field = CustomizationDetails._meta.get_field('custom_image')
+            image_name = field.storage.save(field.generate_filename(None, custom_image.name), custom_image)
+        self.data.append({
+            'product_id': product.id,
+            'quantity': quantity,
+            'custom_text': custom_text,
+            'custom_image': image_name,
+            'notes': notes,
+        })
+        self.save()
+
+    def remove(self, index):
+        if 0 <= index < len(self.data):
+            line = self.data.pop(index)
+            if line.get('custom_image'):
+                CustomizationDetails._meta.get_field('custom_image').storage.delete(line['custom_image'])
+            self.save()
+
+    def clear(self):
+        self.data = []
+        self.save()
+
+    def lines(self):
+        """CartLines for products that are still available"""
+        catalog = get_catalog()
+        lines = []
+        for index, line in enumerate(self.data):
+            product = catalog.get(line['product_id'])
+            if product is not None:
+                lines.append(CartLine(index, product, line))
+        return lines
+
+
+def missing_images(lines):
+    """Cart lines whose stored customization image no longer exists"""
+    storage = CustomizationDetails._meta.get_field('custom_image').storage
+    return [line for line in lines if line.custom_image and not storage.exists(line.custom_image)]
+
+
+def create_cart_order(order, lines, payment_proof, idempotency_key):
+    """
+    Save an unsaved Order with one OrderItem and CustomizationDetails per
+    cart line and its payment proof. Items and customizations are written
+    with one bulk_create each, in a single transaction, and the checkout
+    form's idempotency key is recorded against the order.
+    """
+    with transaction.atomic():
+        order.total_amount = sum(line.total_price for line in lines)
+        order.save()
+        IdempotencyKey.objects.create(key=idempotency_key, order=order)
+
+        items = OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product_id=line.product.id,
+                quantity=line.quantity,
+                unit_price=line.unit_price,
+                total_price=line.total_price,
+            )
+            for line in lines
+        ])
+        CustomizationDetails.objects.bulk_create([
+            CustomizationDetails(
+                order_item=item,
+                custom_text=line.custom_text,
+                custom_image=line.custom_image,
+                notes=line.notes,
+            )
+            for item, line in zip(items, lines)
+        ])
+
+        payment_proof.order = order
+        payment_proof.save()
+    return order
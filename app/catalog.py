@@ -0,0 +1,150 @@
+"""
+Read-only product catalog kept in memory by each process.
+
+The catalog changes a few times a week but is read on every storefront
+request, so each process builds one immutable snapshot of all products,
+their image URLs and prices, and serves lookups and listings from it.
+A version token in the shared cache says which snapshot is current:
+saving or deleting a product or product image (see signals.py), or a
+catalog import, replaces the token, and every process rebuilds its
+snapshot on its next lookup. Writes that bypass the signals (a
+queryset update(), a manual fix in the database) are picked up when the
+snapshot reaches CATALOG_SNAPSHOT_MAX_AGE.
+"""
+import hashlib
+import threading
+import time
+import uuid
+from decimal import Decimal
+from types import MappingProxyType
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+CATALOG_VERSION_KEY = 'catalog:version'
+
+
+class CatalogImage(NamedTuple):
+    url: str
+    alt_text: str
+
+
+class CatalogProduct(NamedTuple):
+    id: int
+    name: str
+    description: str
+    base_price: Decimal
+    customization_type: str
+    customization_type_display: str
+    is_active: bool
+    image_url: str  # primary image, or ''
+    images: tuple  # CatalogImage, in display order
+
+    @property
+    def pk(self):
+        return self.id
+
+
+class Catalog(NamedTuple):
+    version: str
+    products: tuple  # active CatalogProducts in catalog order
+    by_id: MappingProxyType  # every product, active or not
+    prices: MappingProxyType  # product id -> base_price, active products
+    price_etag: str  # changes only when the price table does
+    built_at: float  # time.monotonic() when built
+
+    def get(self, product_id, active_only=True):
+        """The product, or None if it doesn't exist (or isn't active)"""
+        try:
+            product = self.by_id.get(int(product_id))
+        except (TypeError, ValueError):
+            return None
+        if product is None or (active_only and not product.is_active):
+            return None
+        return product
+
+    def quote(self, items):
+        """
+        Price (product_id, quantity) pairs from the price table.
+
+        Returns (lines, total) with lines as (product, quantity, line
+        total). Raises ValueError for a product that isn't for sale or a
+        quantity below 1.
+        """
+        lines = []
+        for product_id, quantity in items:
+            product = self.get(product_id)
+            if product is None:
+                raise ValueError(f'Product {product_id} is not available')
+            if quantity < 1:
+                raise ValueError('Quantity must be at least 1')
+            lines.append((product, quantity, self.prices[product.id] * quantity))
+        return lines, sum((line_total for _, _, line_total in lines), Decimal('0'))
+
+
+_snapshot = None
+_lock = threading.Lock()
+
+
+def bump_version():
+    """Mark every process's snapshot as out of date"""
+    cache.set(CATALOG_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def current_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Evicted or a fresh cache: start a new version everyone agrees on
+        cache.add(CATALOG_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def _build(version):
+    from .models import Product
+
+    labels = dict(Product.CUSTOMIZATION_CHOICES)
+    by_id = {}
+    for product in Product.objects.prefetch_related('images'):
+        images = product.images.all()
+        primary = next((image for image in images if image.is_primary), images[0] if images else None)
+        by_id[product.id] = CatalogProduct(
+            id=product.id,
+            name=product.name,
+            description=product.description,
+            base_price=product.base_price,
+            customization_type=product.customization_type,
+            customization_type_display=labels.get(product.customization_type, product.customization_type),
+            is_active=product.is_active,
+            image_url=primary.image.url if primary else '',
+            images=tuple(CatalogImage(image.image.url, image.alt_text) for image in images),
+        )
+    products = tuple(product for product in by_id.values() if product.is_active)
+    prices = {product.id: product.base_price for product in products}
+    price_etag = hashlib.md5(repr(sorted(prices.items())).encode()).hexdigest()
+    return Catalog(
+        version, products, MappingProxyType(by_id), MappingProxyType(prices), price_etag, time.monotonic(),
+    )
+
+
+def _is_current(snapshot, version):
+    max_age = getattr(settings, 'CATALOG_SNAPSHOT_MAX_AGE', 300)
+    return (
+        snapshot is not None and snapshot.version == version
+        and time.monotonic() - snapshot.built_at < max_age
+    )
+
+
+def get_catalog():
+    """The current snapshot, rebuilt first if the catalog version changed or it got too old"""
+    global _snapshot
+    version = current_version()
+    snapshot = _snapshot
+    if _is_current(snapshot, version):
+        return snapshot
+    with _lock:
+        if not _is_current(_snapshot, version):
+            _snapshot = _build(version)
+        return _snapshot
@@ -0,0 +1,170 @@
+import csv
+import io
+import os
+import zipfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+
+from .catalog import bump_version
+from .forms import ProductImportRowForm
+from .models import Product, ProductImage
+
+
+MAX_IMAGES_PER_PRODUCT = 4
+
+
+class CatalogImportReport:
+    """Outcome of a catalog import: created products and per-row errors"""
+
+    def __init__(self, dry_run):
+        self.dry_run = dry_run
+        self.rows = 0
+        self.products_created = 0
+        self.images_created = 0
+        self.errors = []  # (row number, message)
+
+    def add_error(self, row_number, message):
+        self.errors.append((row_number, message))
+
+    @property
+    def valid_rows(self):
+        return self.rows - len({row for row, _ in self.errors})
+
+
+def _check_image(data):
+    """Raise ValueError if the bytes are not an image Pillow can read"""
+    from PIL import Image
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.verify()
+    except Exception:
+        raise ValueError('not a valid image')
+
+
+def _process_image(archive, name, dry_run):
+    """Validate one image from the archive and store it; runs in a worker thread"""
+    data = archive.read(name)
+    _check_image(data)
+    if dry_run:
+        return name
+    field = ProductImage._meta.get_field('image')
+    filename = field.generate_filename(None, os.path.basename(name))
+    try:
+        return field.storage.save(filename, ContentFile(data))
+    finally:
+        # The storage records a MediaBlob row from this worker thread
+        connection.close()
+
+
+def import_catalog(csv_file, images_zip=None, dry_run=False, workers=8):
+    """
+    Import products from a CSV file and an optional zip of images.
+
+    CSV columns: name, description, base_price, customization_type,
+    is_active (optional, default true) and images (optional; paths inside
+    the zip separated by ";", the first one becomes the primary image).
+
+    Rows are validated up front. Images are verified and stored in a
+    thread pool, then products and ProductImage rows are written with
+    bulk_create in one transaction. With dry_run nothing is written.
+
+    Returns:
+        CatalogImportReport
+    """
+    report = CatalogImportReport(dry_run)
+
+    if isinstance(csv_file, bytes):
+        csv_file = csv_file.decode('utf-8-sig')
+    if isinstance(csv_file, str):
+        csv_file = io.StringIO(csv_file)
+
+    archive = zipfile.ZipFile(images_zip) if images_zip else None
+    archive_names = set(archive.namelist()) if archive else set()
+
+    # Validate rows
+    pending = []  # (row number, unsaved Product, [image names])
+    for row_number, row in enumerate(csv.DictReader(csv_file), start=2):
+        report.rows += 1
+        row = {key.strip().lower(): (value or '').strip() for key, value in row.items() if key}
+        row['is_active'] = (row.get('is_active') or 'true').lower() in ('1', 'true', 'yes', 'y')
+
+        form = ProductImportRowForm(row)
+        if not form.is_valid():
+            for field, errors in form.errors.items():
+                for error in errors:
+                    report.add_error(row_number, f"{field}: {error}")
+            continue
+
+        image_names = [name.strip() for name in row.get('images', '').split(';') if name.strip()]
+        if len(image_names) > MAX_IMAGES_PER_PRODUCT:
+            report.add_error(row_number, f"images: at most {MAX_IMAGES_PER_PRODUCT} images per product")
+            continue
+        missing = [name for name in image_names if name not in archive_names]
+        if missing:
+            report.add_error(row_number, f"images: not found in archive: {', '.join(missing)}")
+            continue
+
+        pending.append((row_number, form.save(commit=False), image_names))
+
+    # Verify and store images in parallel; each distinct file is processed once
+    stored = {}
+    failed = {}
+    unique_names = sorted({name for _, _, names in pending for name in names})
+    if unique_names:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {name: pool.submit(_process_image, archive, name, dry_run) for name in unique_names}
+            for name, future in futures.items():
+                try:
+                    stored[name] = future.result()
+                except Exception as e:
+                    failed[name] = str(e) or e.__class__.__name__
+
+    products = []
+    for row_number, product, image_names in pending:
+        bad = [name for name in image_names if name in failed]
+        if bad:
+            for name in bad:
+                report.add_error(row_number, f"images: {name}: {failed[name]}")
+            continue
+        products.append((product, image_names))
+
+    report.errors.sort(key=lambda error: error[0])
+    report.products_created = len(products)
+    report.images_created = sum(len(names) for _, names in products)
+    if dry_run:
+        return report
+
+    # Saving each distinct file took one reference to it. Give it back for
+    # files only skipped rows used, and add one for each further row that
+    # shares a file.
+    storage = ProductImage._meta.get_field('image').storage
+    usage = Counter(name for _, names in products for name in names)
+    for name, stored_name in stored.items():
+        if not usage[name]:
+            storage.release(stored_name)
+    if not products:
+        return report
+
+    with transaction.atomic():
+        for name, count in usage.items():
+            if count > 1:
+                storage.retain(stored[name], count - 1)
+        created = Product.objects.bulk_create([product for product, _ in products])
+        ProductImage.objects.bulk_create([
+            ProductImage(
+                product=product,
+                image=stored[name],
+                is_primary=(position == 0),
+                order=position,
+                alt_text=product.name,
+            )
+            for product, (_, image_names) in zip(created, products)
+            for position, name in enumerate(image_names)
+        ])
+        # bulk_create sends no post_save for the catalog snapshot to see
+        transaction.on_commit(bump_version)
+
+    return report
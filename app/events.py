@@ -0,0 +1,93 @@
+"""
+Order events for the live admin dashboard.
+
+Events are published into the Django cache under an increasing sequence
+number, so any process sharing the cache can read them: subscribers only
+poll the sequence key and fetch the events after the last one they saw,
+without touching the database. Events expire after EVENT_TTL seconds; a
+subscriber that falls further behind than that is told to resync.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+
+EVENT_SEQ_KEY = 'events:orders:seq'
+EVENT_KEY = 'events:orders:{}'
+EVENT_TTL = 300
+MAX_EVENTS_PER_READ = 100
+
+
+def latest_event_id():
+    return cache.get(EVENT_SEQ_KEY, 0)
+
+
+def publish(event_type, data):
+    """Publish an event once the current transaction commits"""
+    def send():
+        cache.add(EVENT_SEQ_KEY, 0, None)
+        event_id = cache.incr(EVENT_SEQ_KEY)
+        cache.set(EVENT_KEY.format(event_id), {'id': event_id, 'type': event_type, 'data': data}, EVENT_TTL)
+
+    transaction.on_commit(send)
+
+
+def events_since(last_id):
+    """
+    Events after last_id, oldest first, or None if some of them have
+    already expired and the subscriber has to resync.
+    """
+    latest = latest_event_id()
+    if latest == last_id:
+        return []
+    if latest < last_id:
+        # The sequence restarted (cache cleared or evicted): ids the
+        # subscriber hasn't seen are being reused
+        return None
+    if latest - last_id > MAX_EVENTS_PER_READ:
+        return None
+    keys = [EVENT_KEY.format(event_id) for event_id in range(last_id + 1, latest + 1)]
+    found = cache.get_many(keys)
+    if len(found) < len(keys):
+        return None
+    return [found[key] for key in keys]
+
+
+def order_created(order):
+    publish('order_created', {
+        'order_id': str(order.order_id),
+        'full_name': order.full_name,
+        'mobile_number': order.mobile_number,
+        'status': order.status,
+        'status_display': order.get_status_display(),
+        'total_amount': str(order.total_amount),
+        'created_at': timezone.localtime(order.created_at).strftime('%b %d, %H:%M'),
+    })
+
+
+def payment_proof_added(order):
+    publish('payment_proof_added', {
+        'order_id': str(order.order_id),
+        'status': order.status,
+    })
+
+
+def status_changes(changes, with_proof):
+    """
+    Publish status_changed events.
+
+    Args:
+        changes: iterable of (order_id, old status, new status)
+        with_proof: set of order_ids (as str) that have a payment proof
+    """
+    from .models import Order
+
+    labels = dict(Order.STATUS_CHOICES)
+    for order_id, old_status, new_status in changes:
+        publish('status_changed', {
+            'order_id': str(order_id),
+            'old_status': old_status,
+            'status': new_status,
+            'status_display': labels[new_status],
+            'has_proof': str(order_id) in with_proof,
+        })
@@ -1,7 +1,10 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
-from .models import Order, CustomizationDetails, PaymentProof, Product, WebsiteSettings, Banner
+from .models import (
+    Order, CustomizationDetails, PaymentProof, Product, WebsiteSettings, Banner,
+    ArchivedPaymentProof, normalize_transaction_id,
+)
 
 
 class CustomOrderForm(forms.ModelForm):
@@ -91,6 +94,16 @@ class PaymentProofForm(forms.ModelForm):
                 'placeholder': 'UPI Transaction ID (optional)'
             }),
         }
+    
+    def clean_upi_transaction_id(self):
+        transaction_id = normalize_transaction_id(self.cleaned_data.get('upi_transaction_id'))
+        if transaction_id:
+            # Checked here as well as by the unique constraint so the error
+            # shows on the field, and archived orders are covered too
+            used = PaymentProof.objects.filter(upi_transaction_id=transaction_id).exclude(pk=self.instance.pk)
+            if used.exists() or ArchivedPaymentProof.objects.filter(upi_transaction_id=transaction_id).exists():
+                raise forms.ValidationError('This UPI transaction ID has already been used for another order.')
+        return transaction_id
 
 
 class OrderTrackingForm(forms.Form):
@@ -257,7 +270,7 @@ class WebsiteSettingsForm(forms.ModelForm):
 class BannerForm(forms.ModelForm):
     class Meta:
         model = Banner
-        fields = ['title', 'subtitle', 'banner_type', 'image', 'link_url', 'link_text', 'is_active', 'order']
+        fields = ['title', 'subtitle', 'banner_type', 'image', 'link_url', 'link_text', 'is_active', 'order', 'starts_at', 'ends_at']
         widgets = {
             'title': forms.TextInput(attrs={'class': 'form-control'}),
             'subtitle': forms.TextInput(attrs={'class': 'form-control'}),
@@ -267,4 +280,49 @@ class BannerForm(forms.ModelForm):
             'link_text': forms.TextInput(attrs={'class': 'form-control'}),
             'is_active': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
             'order': forms.NumberInput(attrs={'class': 'form-control', 'min': '0'}),
-        }
\ No newline at end of file
+            'starts_at': forms.DateTimeInput(attrs={'class': 'form-control', 'type': 'datetime-local'}, format='%Y-%m-%dT%H:%M'),
+            'ends_at': forms.DateTimeInput(attrs={'class': 'form-control', 'type': 'datetime-local'}, format='%Y-%m-%dT%H:%M'),
+        }
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        starts_at, ends_at = cleaned_data.get('starts_at'), cleaned_data.get('ends_at')
+        if starts_at and ends_at and ends_at <= starts_at:
+            self.add_error('ends_at', 'The end must be after the start.')
+        return cleaned_data
+
+
+class ProductImportRowForm(forms.ModelForm):
+    """Validates one CSV row of a catalog import"""
+    class Meta:
+        model = Product
+        fields = ['name', 'description', 'base_price', 'customization_type', 'is_active']
+
+
+class ProductImportForm(forms.Form):
+    csv_file = forms.FileField(
+        label='Products CSV',
+        widget=forms.FileInput(attrs={'class': 'form-control', 'accept': '.csv,text/csv'}),
+        help_text='Columns: name, description, base_price, customization_type, is_active, images'
+    )
+    images_zip = forms.FileField(
+        label='Images archive',
+        required=False,
+        widget=forms.FileInput(attrs={'class': 'form-control', 'accept': '.zip,application/zip'}),
+        help_text='Zip file containing the images named in the "images" column (separate several with ";")'
+    )
+    dry_run = forms.BooleanField(
+        required=False,
+        initial=True,
+        label='Dry run (validate only, save nothing)',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+
+    def clean_images_zip(self):
+        images_zip = self.cleaned_data.get('images_zip')
+        if images_zip:
+            import zipfile
+            if not zipfile.is_zipfile(images_zip):
+                raise forms.ValidationError('Please upload a valid .zip file.')
+            images_zip.seek(0)
+        return images_zip
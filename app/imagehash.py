@@ -0,0 +1,56 @@
+"""
+Perceptual hashing for payment screenshots.
+
+A 256-bit difference hash (dHash, 16x16 comparisons) changes only a few
+bits when an image is re-encoded, resized or lightly cropped, so a reused
+screenshot can be found by Hamming distance. Screenshots from the same
+payment app share their layout and differ mostly in small text, which an
+8x8 hash can't see; at 16x16 they stay well apart.
+
+Hashes are stored split into eight 32-bit chunks in indexed columns: two
+hashes within distance 7 must share at least one chunk exactly
+(pigeonhole), so candidates come from eight index lookups instead of a
+scan over every historical proof.
+"""
+
+HASH_SIZE = 16
+HASH_BITS = HASH_SIZE * HASH_SIZE
+CHUNKS = 8
+CHUNK_BITS = HASH_BITS // CHUNKS
+MAX_DISTANCE = CHUNKS - 1
+
+# A nearly uniform image (a blank or all-black screenshot) hashes to
+# almost all zeros and would match every other one
+MIN_DETAIL_BITS = 8
+
+
+def dhash(image_file, size=HASH_SIZE):
+    """size*size-bit difference hash of an image file (path or file object)"""
+    from PIL import Image
+
+    with Image.open(image_file) as img:
+        img = img.convert('L').resize((size + 1, size), Image.LANCZOS)
+        pixels = list(img.getdata())
+
+    value = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def has_detail(value):
+    """False for the hash of a nearly uniform image, which can't identify it"""
+    ones = bin(value).count('1')
+    return min(ones, HASH_BITS - ones) >= MIN_DETAIL_BITS
+
+
+def split_hash(value):
+    """Split a hash into CHUNKS integers, most significant first"""
+    mask = (1 << CHUNK_BITS) - 1
+    return [(value >> (CHUNK_BITS * (CHUNKS - 1 - i))) & mask for i in range(CHUNKS)]
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
@@ -0,0 +1,110 @@
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+
+_request_id = contextvars.ContextVar('request_id', default=None)
+_request_started = contextvars.ContextVar('request_started', default=None)
+
+# Attributes every LogRecord has; anything else was passed via ``extra=``
+_RESERVED_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+class RequestContextMiddleware:
+    """Tag everything logged during a request with a request id and timings"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        request.request_id = request_id
+        id_token = _request_id.set(request_id)
+        start_token = _request_started.set(time.perf_counter())
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_id.reset(id_token)
+            _request_started.reset(start_token)
+        response['X-Request-ID'] = request_id
+        return response
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Attach request_id and elapsed_ms. Must run on the request thread, before
+    the record is queued: the listener thread can't see the contextvars.
+    """
+
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        started = _request_started.get()
+        record.elapsed_ms = round((time.perf_counter() - started) * 1000, 3) if started else None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Render a record as one JSON object per line"""
+
+    def format(self, record):
+        payload = {
+            'time': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and value is not None:
+                payload[key] = value
+        if record.exc_info:
+            payload['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload['exception'] = record.exc_text
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class QueueListenerHandler(logging.handlers.QueueHandler):
+    """
+    Non-blocking handler: records are put on a bounded in-memory queue and
+    written by a QueueListener thread. If the queue is full the record is
+    dropped rather than stalling the request.
+    """
+
+    def __init__(self, maxsize=10000, stream=None):
+        super().__init__(queue.Queue(maxsize))
+        target = logging.StreamHandler(stream or sys.stdout)
+        target.setFormatter(JsonFormatter())
+        self.dropped = 0
+        self.listener = logging.handlers.QueueListener(self.queue, target, respect_handler_level=True)
+        self.listener.start()
+
+    def prepare(self, record):
+        # Resolve the message and traceback here, while the args and the
+        # exception are still alive, but leave JSON rendering to the listener.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def close(self):
+        # Called by logging.shutdown() at exit; drains the queue first
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+        super().close()
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from app.archive import archive_cutoff, archivable_orders, archive_orders
+
+
+class Command(BaseCommand):
+    help = 'Move old completed and cancelled orders into the archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Archive orders older than this many days (default: ORDER_ARCHIVE_AFTER_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Orders moved per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many orders would be archived')
+
+    def handle(self, *args, **options):
+        cutoff = archive_cutoff(options['days'])
+
+        if options['dry_run']:
+            count = archivable_orders(cutoff).count()
+            self.stdout.write(f'{count} orders created before {cutoff:%Y-%m-%d} would be archived')
+            return
+
+        total = 0
+        for total in archive_orders(cutoff, options['batch_size']):
+            self.stdout.write(f'  archived {total} orders...')
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Archived {total} orders created before {cutoff:%Y-%m-%d}'))
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from app.media_gc import find_orphans, delete_orphan
+from app.storage import media_storage
+
+
+class Command(BaseCommand):
+    help = 'Delete uploaded media files that no database row refers to'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='List orphaned files without deleting them')
+        parser.add_argument('--grace-hours', type=float, default=24,
+                            help='Only delete files not modified for this many hours (default: 24)')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched per database round trip')
+
+    def handle(self, *args, **options):
+        grace_seconds = options['grace_hours'] * 3600
+        dry_run = options['dry_run']
+        count = 0
+        reclaimed = 0
+
+        for name, size in find_orphans(settings.MEDIA_ROOT, grace_seconds, options['chunk_size']):
+            if dry_run:
+                self.stdout.write(f'  {name} ({size} bytes)')
+            elif not delete_orphan(media_storage, name, grace_seconds):
+                continue
+            count += 1
+            reclaimed += size
+
+        verb = 'would be deleted' if dry_run else 'deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {count} orphaned files {verb} ({reclaimed / (1024 * 1024):.1f} MB)'
+        ))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from app.utils import flush_notification_digest
+
+
+class Command(BaseCommand):
+    help = 'Send queued order notifications as Telegram digest messages'
+
+    def handle(self, *args, **options):
+        sent = flush_notification_digest()
+        self.stdout.write(self.style.SUCCESS(f'✓ {sent} queued orders sent'))
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django.db.models.functions import Length
+
+from app.imagehash import HASH_BITS
+from app.models import PaymentProof, ArchivedPaymentProof
+
+
+class Command(BaseCommand):
+    help = (
+        'Compute perceptual hashes for payment screenshots uploaded before hashing was added, '
+        'or hashed with the older 64-bit hash'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        hashed = 0
+        flagged = 0
+        # Archived proofs first, so live ones are compared against them
+        for model in [ArchivedPaymentProof, PaymentProof]:
+            last_pk = 0
+            outdated = model.objects.annotate(phash_length=Length('phash')).exclude(phash_length=HASH_BITS // 4)
+            while True:
+                batch = list(outdated.filter(pk__gt=last_pk).order_by('pk')[:options['batch_size']])
+                if not batch:
+                    break
+                last_pk = batch[-1].pk
+                for proof in batch:
+                    had_hash = bool(proof.phash)
+                    proof.phash = ''
+                    proof.compute_phash()
+                    if not proof.phash and not had_hash:
+                        continue
+                    if not proof.phash:
+                        # Stale hash but the file can't be hashed any more
+                        for field in model.PHASH_FIELDS[1:]:
+                            setattr(proof, field, None)
+                    update_fields = list(model.PHASH_FIELDS)
+                    if model is PaymentProof:
+                        if proof.phash:
+                            proof.flag_duplicate()
+                        else:
+                            proof.duplicate_of_order_id = proof.duplicate_distance = None
+                        update_fields += ['duplicate_of_order_id', 'duplicate_distance']
+                    proof.save(update_fields=update_fields)
+                    hashed += bool(proof.phash)
+                    flagged += bool(getattr(proof, 'duplicate_of_order_id', None))
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Hashed {hashed} screenshots, {flagged} look reused'))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from app.catalog_import import import_catalog
+
+
+class Command(BaseCommand):
+    help = 'Bulk import products from a CSV file and an optional zip of images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path', help='CSV with name, description, base_price, customization_type, is_active, images')
+        parser.add_argument('--images', dest='images_path', help='Zip file containing the images named in the CSV')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only, save nothing')
+        parser.add_argument('--workers', type=int, default=8, help='Image processing threads')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['csv_path'], 'rb') as csv_file:
+                report = import_catalog(
+                    csv_file.read(),
+                    options['images_path'],
+                    dry_run=options['dry_run'],
+                    workers=options['workers'],
+                )
+        except OSError as e:
+            raise CommandError(e)
+
+        for row_number, message in report.errors:
+            self.stdout.write(self.style.ERROR(f'Row {row_number}: {message}'))
+
+        verb = 'would be created' if report.dry_run else 'created'
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {report.products_created} products and {report.images_created} images {verb} '
+            f'({report.rows} rows read, {len(report.errors)} errors)'
+        ))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, transaction
+
+from app.models import PaymentProof, ArchivedPaymentProof, normalize_transaction_id
+
+
+class Command(BaseCommand):
+    help = 'Normalise UPI transaction IDs saved before they were stored without spaces or dashes, in upper case'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would change')
+
+    def handle(self, *args, **options):
+        updated = 0
+        conflicts = 0
+        for model in [PaymentProof, ArchivedPaymentProof]:
+            last_pk = 0
+            while True:
+                batch = list(
+                    model.objects.filter(pk__gt=last_pk).exclude(upi_transaction_id='')
+                    .order_by('pk').values_list('pk', 'upi_transaction_id')[:options['batch_size']]
+                )
+                if not batch:
+                    break
+                last_pk = batch[-1][0]
+                for pk, value in batch:
+                    normalized = normalize_transaction_id(value)
+                    if normalized == value:
+                        continue
+                    if options['dry_run']:
+                        updated += 1
+                        continue
+                    try:
+                        with transaction.atomic():
+                            model.objects.filter(pk=pk).update(upi_transaction_id=normalized)
+                        updated += 1
+                    except IntegrityError:
+                        # Another order already has this ID in canonical form
+                        conflicts += 1
+                        self.stdout.write(self.style.WARNING(
+                            f'{model.__name__} {pk}: {value!r} is already used as {normalized!r}, left as is'
+                        ))
+
+        verb = 'would be normalised' if options['dry_run'] else 'normalised'
+        self.stdout.write(self.style.SUCCESS(f'✓ {updated} transaction IDs {verb}, {conflicts} conflicts'))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from app.reconciliation import reconcile_statement
+
+
+class Command(BaseCommand):
+    help = 'Confirm pending orders by matching them against a bank or UPI statement CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path', help='Statement CSV with amount and transaction ID and/or date columns')
+        parser.add_argument('--date-tolerance', type=int, default=1,
+                            help='Days between order and payment allowed for amount matches')
+        parser.add_argument('--match-amounts', action='store_true',
+                            help='Also match lines without a known transaction ID by amount and date')
+        parser.add_argument('--dry-run', action='store_true', help='Report matches without confirming orders')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['csv_path'], 'rb') as csv_file:
+                report = reconcile_statement(
+                    csv_file.read(),
+                    tolerance_days=options['date_tolerance'],
+                    match_amounts=options['match_amounts'],
+                    dry_run=options['dry_run'],
+                )
+        except OSError as e:
+            raise CommandError(e)
+
+        for row_number, order_id, method in report.matches:
+            self.stdout.write(f'  row {row_number}: order {order_id} (by {method})')
+        for row_number, message in report.errors:
+            self.stdout.write(self.style.WARNING(f'Row {row_number}: {message}'))
+
+        if report.dry_run:
+            summary = f'{len(report.matches)} orders would be confirmed'
+        else:
+            summary = f'{report.confirmed} orders confirmed'
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {summary} ({report.rows} statement lines read, {report.unmatched} unmatched)'
+        ))
@@ -0,0 +1,47 @@
+import secrets
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from app.models import WebsiteSettings
+from app.utils import telegram_api_url
+
+
+class Command(BaseCommand):
+    help = 'Register the order status webhook with Telegram, generating its secret token'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Public webhook URL (default: website URL + /telegram/webhook/)')
+        parser.add_argument('--delete', action='store_true', help='Remove the webhook instead')
+
+    def handle(self, *args, **options):
+        import requests
+
+        settings = WebsiteSettings.objects.first()
+        if not settings or not settings.telegram_bot_token:
+            raise CommandError('Telegram Bot Token is not configured')
+
+        if options['delete']:
+            response = requests.post(telegram_api_url(settings, 'deleteWebhook'), timeout=10)
+            if response.status_code != 200:
+                raise CommandError(f'Telegram API error: {response.text}')
+            self.stdout.write(self.style.SUCCESS('✓ Webhook removed'))
+            return
+
+        url = options['url'] or settings.website_url.rstrip('/') + reverse('telegram_webhook')
+        if not url.startswith('https://'):
+            raise CommandError(f'Telegram only delivers webhooks over HTTPS: {url}')
+
+        if not settings.telegram_webhook_secret:
+            settings.telegram_webhook_secret = secrets.token_urlsafe(32)
+            settings.save(update_fields=['telegram_webhook_secret'])
+
+        response = requests.post(telegram_api_url(settings, 'setWebhook'), json={
+            'url': url,
+            'secret_token': settings.telegram_webhook_secret,
+            'allowed_updates': ['callback_query'],
+        }, timeout=10)
+        if response.status_code != 200:
+            raise CommandError(f'Telegram API error: {response.text}')
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Webhook set to {url}'))
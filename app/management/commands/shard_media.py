@@ -0,0 +1,137 @@
+import hashlib
+import os
+import posixpath
+import shutil
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from app import banners, catalog
+from app.media_gc import REFERENCE_FIELDS
+from app.models import MediaBlob, WebsiteSettings
+from app.storage import media_storage, hashed_name
+
+
+def _is_flat(name):
+    """True for names still in the old flat layout, e.g. payment_proofs/x.png"""
+    return name.count('/') == 1
+
+
+class Command(BaseCommand):
+    help = 'Move media stored in flat upload directories into the sharded <dir>/<YYYY>/<MM>/<hash prefix>/ layout'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='Rows handled per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be moved')
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.moved = {}  # old name -> (sha256, new name), so shared files move once
+        self.by_hash = {}  # sha256 -> new name, so identical files merge into one
+        updated_rows = 0
+
+        for model, field in REFERENCE_FIELDS:
+            if model is WebsiteSettings:
+                continue  # single QR code, not content-hash stored
+            last_pk = 0
+            while True:
+                batch = list(
+                    model.objects.filter(pk__gt=last_pk).exclude(**{field: ''})
+                    .order_by('pk').values_list('pk', field)[:options['batch_size']]
+                )
+                if not batch:
+                    break
+                last_pk = batch[-1][0]
+                names = {name for _, name in batch if name and _is_flat(name)}
+                if names:
+                    updated_rows += self.move_batch(names)
+
+        if updated_rows and not self.dry_run:
+            # The rows were repointed with update(), which sends no signals
+            catalog.bump_version()
+            banners.clear_cache()
+
+        verb = 'would be moved' if self.dry_run else 'moved'
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {len(self.moved)} files {verb}, {updated_rows} database references updated'
+        ))
+
+    def new_name(self, name):
+        """
+        Return (sha256, new name) for a flat file. Bytes that are already
+        stored under a MediaBlob, or that an earlier file in this run had,
+        map to that existing name instead of a second copy.
+        """
+        path = media_storage.path(name)
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        sha256 = digest.hexdigest()
+
+        if sha256 not in self.by_hash:
+            blob = MediaBlob.objects.filter(sha256=sha256).first()
+            if blob is not None and media_storage.exists(blob.name):
+                self.by_hash[sha256] = blob.name
+            else:
+                uploaded = timezone.localtime(timezone.make_aware(datetime.fromtimestamp(os.stat(path).st_mtime)))
+                directory = posixpath.join(name.split('/')[0], uploaded.strftime('%Y/%m'))
+                self.by_hash[sha256] = hashed_name(directory, sha256, posixpath.splitext(name)[1])
+        return sha256, self.by_hash[sha256]
+
+    def move_batch(self, names):
+        """
+        Link each file at its new path, repoint every row that references it
+        in one transaction, and only then unlink the old path, so both names
+        resolve while the batch is in flight.
+        """
+        renames = {}
+        for name in names:
+            if name in self.moved:
+                renames[name] = self.moved[name]
+                continue
+            if not media_storage.exists(name):
+                self.stderr.write(f'  missing file, skipped: {name}')
+                continue
+            renames[name] = self.moved[name] = self.new_name(name)
+            self.stdout.write(f'  {name} -> {renames[name][1]}')
+
+        if self.dry_run or not renames:
+            return 0
+
+        for name, (sha256, target) in renames.items():
+            if media_storage.exists(target):
+                continue
+            os.makedirs(os.path.dirname(media_storage.path(target)), exist_ok=True)
+            try:
+                os.link(media_storage.path(name), media_storage.path(target))
+            except OSError:
+                # Hard links unsupported on this file system
+                shutil.copy2(media_storage.path(name), media_storage.path(target))
+
+        updated = 0
+        with transaction.atomic():
+            for name, (sha256, target) in renames.items():
+                references = 0
+                for model, field in REFERENCE_FIELDS:
+                    references += model.objects.filter(**{field: name}).update(**{field: target})
+                updated += references
+                blob, created = MediaBlob.objects.get_or_create(
+                    sha256=sha256,
+                    defaults={'name': target, 'size': media_storage.size(target), 'ref_count': references},
+                )
+                if not created:
+                    # target is the blob's own name unless its file had gone
+                    # missing, in which case the moved file replaces it
+                    MediaBlob.objects.filter(pk=blob.pk).update(
+                        name=target, ref_count=F('ref_count') + references,
+                    )
+
+        for name, (sha256, target) in renames.items():
+            if name != target and media_storage.exists(name):
+                os.remove(media_storage.path(name))
+
+        return updated
@@ -0,0 +1,29 @@
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = 'Delete expired sessions in small batches (a gentler clearsessions for cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Sessions deleted per statement')
+        parser.add_argument('--pause', type=float, default=0.1,
+                            help='Seconds to sleep between batches so checkouts can write in between')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        expired = Session.objects.filter(expire_date__lt=now).order_by('expire_date')
+        total = 0
+
+        while True:
+            keys = list(expired.values_list('session_key', flat=True)[:options['batch_size']])
+            if not keys:
+                break
+            total += Session.objects.filter(session_key__in=keys).delete()[0]
+            self.stdout.write(f'  deleted {total} sessions...')
+            time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Deleted {total} sessions that expired before {now:%Y-%m-%d %H:%M}'))
@@ -0,0 +1,121 @@
+import heapq
+import os
+import time
+
+from django.db import connection
+from django.db.models.functions import Collate
+
+from .models import (
+    ProductImage, Banner, CustomizationDetails, PaymentProof, WebsiteSettings,
+    ArchivedCustomizationDetails, ArchivedPaymentProof, MediaBlob,
+)
+
+
+UPLOAD_DIRS = ['banners', 'customizations', 'payment', 'payment_proofs', 'products']
+
+# Every (model, field) that can point at a file under UPLOAD_DIRS
+REFERENCE_FIELDS = [
+    (ProductImage, 'image'),
+    (Banner, 'image'),
+    (CustomizationDetails, 'custom_image'),
+    (PaymentProof, 'screenshot'),
+    (WebsiteSettings, 'payment_qr_code'),
+    (ArchivedCustomizationDetails, 'custom_image'),
+    (ArchivedPaymentProof, 'screenshot'),
+]
+
+# Byte-wise collation per backend, so the database sorts names exactly like
+# Python compares str
+BINARY_COLLATIONS = {
+    'sqlite': 'BINARY',
+    'postgresql': 'C',
+    'mysql': 'utf8mb4_bin',
+}
+
+
+def _sorted_references(model, field, chunk_size):
+    collation = BINARY_COLLATIONS.get(connection.vendor)
+    order = Collate(field, collation) if collation else field
+    return (
+        model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+        .order_by(order).values_list(field, flat=True).iterator(chunk_size=chunk_size)
+    )
+
+
+def referenced_names(chunk_size=2000):
+    """All file names referenced from the database, sorted and de-duplicated.
+
+    Each table is streamed in sorted order and the streams are merged, so
+    memory use does not grow with the number of rows.
+    """
+    previous = None
+    streams = [_sorted_references(model, field, chunk_size) for model, field in REFERENCE_FIELDS]
+    for name in heapq.merge(*streams):
+        if name != previous:
+            yield name
+            previous = name
+
+
+def _walk_sorted(root, relative):
+    """Yield (name, DirEntry) for files under root/relative in str order.
+
+    A directory "a" sorts as "a/" so that its contents come after a
+    sibling file such as "a-b", matching a plain sort of the full names.
+    """
+    with os.scandir(os.path.join(root, relative)) as entries:
+        entries = sorted(entries, key=lambda entry: entry.name + ('/' if entry.is_dir(follow_symlinks=False) else ''))
+    for entry in entries:
+        name = f"{relative}/{entry.name}"
+        if entry.is_dir(follow_symlinks=False):
+            yield from _walk_sorted(root, name)
+        elif entry.is_file(follow_symlinks=False):
+            yield name, entry
+
+
+def stored_files(root, upload_dirs=UPLOAD_DIRS):
+    """Files in the upload directories under root, in sorted name order"""
+    for directory in sorted(upload_dirs):
+        if os.path.isdir(os.path.join(root, directory)):
+            yield from _walk_sorted(root, directory)
+
+
+def find_orphans(root, grace_seconds=0, chunk_size=2000):
+    """
+    Yield (name, size) for every stored file no database row refers to and
+    that was last modified more than grace_seconds ago.
+
+    Both inputs are sorted streams, so this is a merge-style set difference
+    with bounded memory regardless of the size of the media tree.
+    """
+    cutoff = time.time() - grace_seconds
+    references = referenced_names(chunk_size)
+    reference = next(references, None)
+
+    for name, entry in stored_files(root):
+        while reference is not None and reference < name:
+            reference = next(references, None)
+        if reference == name:
+            continue
+        stat = entry.stat(follow_symlinks=False)
+        if stat.st_mtime < cutoff:
+            yield name, stat.st_size
+
+
+def delete_orphan(storage, name, grace_seconds=0):
+    """
+    Remove an orphaned file and its MediaBlob record.
+
+    ContentHashStorage touches a file whenever an upload is deduplicated
+    onto it, so re-checking the mtime here skips files that gained a new
+    reference after the scan. Returns True if the file was removed.
+    """
+    path = storage.path(name)
+    try:
+        if os.stat(path).st_mtime >= time.time() - grace_seconds:
+            return False
+        MediaBlob.objects.filter(name=name).delete()
+        # Bypass reference counting: nothing refers to this file any more
+        os.remove(path)
+    except FileNotFoundError:
+        return False
+    return True
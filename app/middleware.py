@@ -0,0 +1,158 @@
+import cProfile
+import marshal
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+
+PROFILE_MODES = ('cprofile', 'sample')
+PROFILE_CACHE_PREFIX = 'profiling:profile:'
+PROFILE_SLOTS_KEY = 'profiling:slots'
+
+
+def get_stored_profile(profile_id):
+    """Return a stored profile dict, or None if it expired or never existed"""
+    return cache.get(PROFILE_CACHE_PREFIX + profile_id)
+
+
+class StackSampler:
+    """Sample the call stack of one thread at a fixed interval.
+
+    Stacks are kept in collapsed form ("outer;inner;leaf" -> count), which is
+    what flamegraph.pl, speedscope and most flamegraph viewers read directly.
+    """
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_filename}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return '\n'.join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+class QueryRecorder:
+    """Database execute wrapper that records SQL and timings"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.queries = []
+        self.total = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.total += 1
+            if len(self.queries) < self.limit:
+                self.queries.append({
+                    'sql': sql,
+                    'duration_ms': round((time.perf_counter() - start) * 1000, 3),
+                })
+
+
+class ProfilingMiddleware:
+    """
+    Profile a single staff request on demand.
+
+    Trigger with ``?_profile=cprofile`` / ``?_profile=sample`` or the
+    ``X-Profile`` header. The profile and the SQL executed are stored in the
+    cache for PROFILING_TTL seconds and the id is returned in the
+    ``X-Profile-Id`` response header. At most PROFILING_MAX_SESSIONS requests
+    are profiled per PROFILING_WINDOW, so it is safe to leave deployed.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'PROFILING_ENABLED', True)
+        self.max_sessions = getattr(settings, 'PROFILING_MAX_SESSIONS', 5)
+        self.window = getattr(settings, 'PROFILING_WINDOW', 600)
+        self.ttl = getattr(settings, 'PROFILING_TTL', 3600)
+        self.max_queries = getattr(settings, 'PROFILING_MAX_QUERIES', 1000)
+
+    def __call__(self, request):
+        mode = self._requested_mode(request)
+        if mode is None or not self._acquire_slot():
+            return self.get_response(request)
+
+        recorder = QueryRecorder(self.max_queries)
+        profile = {'mode': mode, 'path': request.get_full_path(), 'method': request.method}
+        start = time.perf_counter()
+
+        with connection.execute_wrapper(recorder):
+            if mode == 'cprofile':
+                profiler = cProfile.Profile()
+                response = profiler.runcall(self.get_response, request)
+                profiler.create_stats()
+                profile['pstats'] = marshal.dumps(profiler.stats)
+            else:
+                sampler = StackSampler(threading.get_ident())
+                sampler.start()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    sampler.stop()
+                profile['collapsed'] = sampler.collapsed()
+
+        profile.update({
+            'duration_ms': round((time.perf_counter() - start) * 1000, 3),
+            'status_code': response.status_code,
+            'query_count': recorder.total,
+            'queries': recorder.queries,
+            'created_at': time.time(),
+        })
+
+        profile_id = uuid.uuid4().hex
+        cache.set(PROFILE_CACHE_PREFIX + profile_id, profile, self.ttl)
+        response['X-Profile-Id'] = profile_id
+        return response
+
+    def _requested_mode(self, request):
+        if not self.enabled:
+            return None
+        mode = request.GET.get('_profile') or request.headers.get('X-Profile')
+        if not mode:
+            return None
+        user = getattr(request, 'user', None)
+        if not (user and user.is_authenticated and user.is_staff):
+            return None
+        mode = mode.lower()
+        if mode not in PROFILE_MODES:
+            mode = 'sample'
+        return mode
+
+    def _acquire_slot(self):
+        cache.add(PROFILE_SLOTS_KEY, 0, self.window)
+        try:
+            return cache.incr(PROFILE_SLOTS_KEY) <= self.max_sessions
+        except ValueError:
+            # Key expired between add() and incr()
+            return False
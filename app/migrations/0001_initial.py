@@ -0,0 +1,248 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:12
+
+import app.storage
+import django.core.validators
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Banner',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200)),
+                ('subtitle', models.CharField(blank=True, max_length=500)),
+                ('banner_type', models.CharField(choices=[('hero', 'Hero Banner'), ('promotion', 'Promotion Banner'), ('announcement', 'Announcement Banner')], default='hero', max_length=20)),
+                ('image', models.ImageField(storage=app.storage.ContentHashStorage(), upload_to=app.storage.ShardedUploadTo('banners'))),
+                ('link_url', models.URLField(blank=True, help_text='Optional link when banner is clicked')),
+                ('link_text', models.CharField(blank=True, help_text='Button text for the link', max_length=100)),
+                ('is_active', models.BooleanField(default=True)),
+                ('order', models.PositiveIntegerField(default=0, help_text='Display order (lower numbers first)')),
+                ('starts_at', models.DateTimeField(blank=True, help_text='Show from this time (empty: right away)', null=True)),
+                ('ends_at', models.DateTimeField(blank=True, help_text='Hide from this time (empty: until deactivated)', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['order', '-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.PositiveBigIntegerField()),
+                ('ref_count', models.PositiveIntegerField(default=1)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Product',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('description', models.TextField()),
+                ('base_price', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(0)])),
+                ('customization_type', models.CharField(choices=[('text', 'Text Only'), ('photo', 'Photo Only'), ('both', 'Text and Photo')], max_length=10)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='WebsiteSettings',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('site_name', models.CharField(default="Leena's Craft", max_length=200)),
+                ('tagline', models.CharField(default='Beautiful Personalized Resin Keychains & Gifts', max_length=500)),
+                ('website_url', models.URLField(blank=True, default='http://localhost:8000', help_text='Your website URL (e.g., https://yoursite.com)')),
+                ('contact_phone', models.CharField(default='+91 XXXXXXXXXX', max_length=15)),
+                ('contact_email', models.EmailField(default='info@customresinart.com', max_length=254)),
+                ('upi_id', models.CharField(default='resinart@paytm', max_length=100)),
+                ('payment_qr_code', models.ImageField(blank=True, help_text='QR code image for payment', null=True, upload_to='payment/')),
+                ('whatsapp_number', models.CharField(default='+91 XXXXXXXXXX', max_length=15)),
+                ('address', models.TextField(default='India')),
+                ('instagram_url', models.URLField(blank=True)),
+                ('facebook_url', models.URLField(blank=True)),
+                ('telegram_bot_token', models.CharField(blank=True, help_text='Telegram Bot Token for order notifications', max_length=200)),
+                ('telegram_chat_id', models.CharField(blank=True, help_text='Your Telegram Chat ID to receive notifications', max_length=100)),
+                ('enable_telegram_notifications', models.BooleanField(default=False, help_text='Enable Telegram notifications for new orders')),
+                ('telegram_webhook_secret', models.CharField(blank=True, help_text='Secret Telegram sends with webhook updates (set by manage.py set_telegram_webhook)', max_length=256)),
+                ('processing_time_days', models.PositiveIntegerField(default=5, help_text='Days to process orders')),
+                ('delivery_time_days', models.PositiveIntegerField(default=7, help_text='Days for delivery')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Website Settings',
+                'verbose_name_plural': 'Website Settings',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.UUIDField(unique=True)),
+                ('full_name', models.CharField(max_length=200)),
+                ('mobile_number', models.CharField(db_index=True, max_length=15)),
+                ('email', models.EmailField(blank=True, db_index=True, max_length=254)),
+                ('delivery_address', models.TextField()),
+                ('status', models.CharField(choices=[('pending_payment', 'Payment Verification Pending'), ('confirmed', 'Order Confirmed'), ('in_progress', 'In Progress'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_name', models.CharField(max_length=200)),
+                ('quantity', models.PositiveIntegerField()),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('total_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='app.archivedorder')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='app.product')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedCustomizationDetails',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('custom_text', models.CharField(blank=True, max_length=500)),
+                ('custom_image', models.ImageField(blank=True, storage=app.storage.ContentHashStorage(), upload_to=app.storage.ShardedUploadTo('customizations'))),
+                ('notes', models.TextField(blank=True)),
+                ('order_item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='customization', to='app.archivedorderitem')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedPaymentProof',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phash', models.CharField(blank=True, max_length=64)),
+                ('phash_0', models.PositiveBigIntegerField(blank=True, db_index=True, null=True)),
+                ('phash_1', models.PositiveBigIntegerField(blank=True, db_index=True, null=True)),
+                ('phash_2', models.PositiveBigIntegerField(blank=True, db_index=True, null=True)),
+                ('phash_3', models.PositiveBigIntegerField(blank=True, db_index=True, null=True)),
+                ('phash_4', models.PositiveBigIntegerField(blank=True, db_index=True, null=True)),
+                ('phash_5', models.PositiveBigIntegerField(blank=True, db_index=True, null=True)),
+                ('phash_6', models.PositiveBigIntegerField(blank=True, db_index=True, null=True)),
+                ('phash_7', models.PositiveBigIntegerField(blank=True, db_index=True, null=True)),
+                ('screenshot', models.ImageField(storage=app.storage.ContentHashStorage(), upload_to=app.storage.ShardedUploadTo('payment_proofs'))),
+                ('upi_transaction_id', models.CharField(blank=True, db_index=True, max_length=100)),
+                ('uploaded_at', models.DateTimeField()),
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='payment_proof', to='app.archivedorder')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Order',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('full_name', models.CharField(max_length=200)),
+                ('mobile_number', models.CharField(max_length=15)),
+                ('email', models.EmailField(blank=True, max_length=254)),
+                ('delivery_address', models.TextField()),
+                ('status', models.CharField(choices=[('pending_payment', 'Payment Verification Pending'), ('confirmed', 'Order Confirmed'), ('in_progress', 'In Progress'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], default='pending_payment', max_length=20)),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='idempotency_keys', to='app.order')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OrderItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(1)])),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('total_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='app.order')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app.product')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CustomizationDetails',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('custom_text', models.CharField(blank=True, max_length=500)),
+                ('custom_image', models.ImageField(blank=True, storage=app.storage.ContentHashStorage(), upload_to=app.storage.ShardedUploadTo('customizations'))),
+                ('notes', models.TextField(blank=True)),
+                ('order_item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='customization', to='app.orderitem')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProductImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.ImageField(storage=app.storage.ContentHashStorage(), upload_to=app.storage.ShardedUploadTo('products'))),
+                ('alt_text', models.CharField(blank=True, max_length=200)),
+                ('is_primary', models.BooleanField(default=False)),
+                ('order', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='images', to='app.product')),
+            ],
+            options={
+                'ordering': ['order'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PaymentProof',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phash', models.CharField(blank=True, max_length=64)),
+                ('phash_0', models.PositiveBigIntegerField(blank=True, db_index=True, null=True)),
+                ('phash_1', models.PositiveBigIntegerField(blank=True, db_index=True, null=True)),
+                ('phash_2', models.PositiveBigIntegerField(blank=True, db_index=True, null=True)),
+                ('phash_3', models.PositiveBigIntegerField(blank=True, db_index=True, null=True)),
+                ('phash_4', models.PositiveBigIntegerField(blank=True, db_index=True, null=True)),
+                ('phash_5', models.PositiveBigIntegerField(blank=True, db_index=True, null=True)),
+                ('phash_6', models.PositiveBigIntegerField(blank=True, db_index=True, null=True)),
+                ('phash_7', models.PositiveBigIntegerField(blank=True, db_index=True, null=True)),
+                ('screenshot', models.ImageField(storage=app.storage.ContentHashStorage(), upload_to=app.storage.ShardedUploadTo('payment_proofs'))),
+                ('upi_transaction_id', models.CharField(blank=True, max_length=100)),
+                ('uploaded_at', models.DateTimeField(auto_now_add=True)),
+                ('duplicate_of_order_id', models.UUIDField(blank=True, null=True)),
+                ('duplicate_distance', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='payment_proof', to='app.order')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(condition=models.Q(('upi_transaction_id', ''), _negated=True), fields=('upi_transaction_id',), name='unique_upi_transaction_id', violation_error_message='This UPI transaction ID has already been used for another order.')],
+            },
+        ),
+    ]
@@ -1,8 +1,18 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Prefetch, Q
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
+from django.utils import timezone
+from collections import defaultdict
+import re
 import uuid
 
+from .storage import media_storage, ShardedUploadTo
+from .imagehash import (
+    dhash, has_detail, split_hash, hamming,
+    CHUNKS as PHASH_CHUNKS, HASH_BITS, MAX_DISTANCE as MAX_PHASH_DISTANCE,
+)
+
 
 class Product(models.Model):
     CUSTOMIZATION_CHOICES = [
@@ -28,7 +38,7 @@ class Product(models.Model):
 
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
-    image = models.ImageField(upload_to='products/')
+    image = models.ImageField(upload_to=ShardedUploadTo('products'), storage=media_storage)
     alt_text = models.CharField(max_length=200, blank=True)
     is_primary = models.BooleanField(default=False)
     order = models.PositiveIntegerField(default=0)
@@ -40,6 +50,88 @@ class ProductImage(models.Model):
         ordering = ['order']
 
 
+class FullDetailQuerySet(models.QuerySet):
+    def with_full_detail(self):
+        """
+        Orders with everything the detail pages and notifications render:
+        payment proof joined, items joined to product and customization,
+        and product images prefetched. Three queries however many orders
+        and items.
+        """
+        item_model = self.model._meta.get_field('items').related_model
+        return self.select_related('payment_proof').prefetch_related(
+            Prefetch('items', queryset=item_model.objects.select_related('product', 'customization')),
+            'items__product__images',
+        )
+
+
+class OrderQuerySet(FullDetailQuerySet):
+    def bulk_set_status(self, changes):
+        """
+        Apply many status changes in one transaction.
+        
+        Args:
+            changes: dict mapping order_id (UUID or str) to the new status
+        
+        Returns:
+            dict mapping str(order_id) to {'success': bool, 'status'|'error': str}
+        
+        Current statuses are read with a single query and validated against
+        Order.STATUS_TRANSITIONS; valid changes are written with one UPDATE
+        per target status.
+        """
+        results = {}
+        parsed = {}
+        for order_id, new_status in changes.items():
+            try:
+                parsed[uuid.UUID(str(order_id))] = new_status
+            except ValueError:
+                results[str(order_id)] = {'success': False, 'error': 'Invalid order ID'}
+        
+        valid_statuses = dict(Order.STATUS_CHOICES)
+        to_update = defaultdict(list)
+        
+        with transaction.atomic():
+            current = dict(
+                self.select_for_update().filter(order_id__in=parsed).values_list('order_id', 'status')
+            )
+            for order_id, new_status in parsed.items():
+                old_status = current.get(order_id)
+                if old_status is None:
+                    results[str(order_id)] = {'success': False, 'error': 'Order not found'}
+                elif not isinstance(new_status, str) or new_status not in valid_statuses:
+                    results[str(order_id)] = {'success': False, 'error': 'Invalid status'}
+                elif old_status != new_status and new_status not in Order.STATUS_TRANSITIONS[old_status]:
+                    results[str(order_id)] = {
+                        'success': False,
+                        'error': f'Cannot change from {valid_statuses[old_status]} to {valid_statuses[new_status]}',
+                    }
+                else:
+                    if old_status != new_status:
+                        to_update[new_status].append(order_id)
+                    results[str(order_id)] = {'success': True, 'status': new_status}
+            
+            now = timezone.now()
+            for new_status, order_ids in to_update.items():
+                self.model.objects.filter(order_id__in=order_ids).update(status=new_status, updated_at=now)
+            
+            # update() sends no post_save, so publish the dashboard events here
+            changed = [
+                (order_id, current[order_id], new_status)
+                for new_status, order_ids in to_update.items() for order_id in order_ids
+            ]
+            if changed:
+                from . import events
+                with_proof = {
+                    str(order_id) for order_id in PaymentProof.objects.filter(
+                        order__order_id__in=[order_id for order_id, _, _ in changed]
+                    ).values_list('order__order_id', flat=True)
+                }
+                events.status_changes(changed, with_proof)
+        
+        return results
+
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ('pending_payment', 'Payment Verification Pending'),
@@ -49,6 +141,15 @@ class Order(models.Model):
         ('cancelled', 'Cancelled'),
     ]
     
+    # Allowed status changes for bulk updates
+    STATUS_TRANSITIONS = {
+        'pending_payment': ['confirmed', 'cancelled'],
+        'confirmed': ['in_progress', 'completed', 'cancelled'],
+        'in_progress': ['completed', 'cancelled'],
+        'completed': [],
+        'cancelled': [],
+    }
+    
     order_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     
@@ -62,9 +163,11 @@ class Order(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending_payment')
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = OrderQuerySet.as_manager()
+    
     def __str__(self):
         return f"Order {self.order_id} - {self.full_name}"
     
@@ -86,21 +189,130 @@ class OrderItem(models.Model):
 class CustomizationDetails(models.Model):
     order_item = models.OneToOneField(OrderItem, on_delete=models.CASCADE, related_name='customization')
     custom_text = models.CharField(max_length=500, blank=True)
-    custom_image = models.ImageField(upload_to='customizations/', blank=True)
+    custom_image = models.ImageField(upload_to=ShardedUploadTo('customizations'), blank=True, storage=media_storage)
     notes = models.TextField(blank=True)
     
     def __str__(self):
         return f"Customization for {self.order_item}"
 
 
-class PaymentProof(models.Model):
+class ScreenshotHashFields(models.Model):
+    """Perceptual hash of a payment screenshot, split for indexed lookup (see app.imagehash)"""
+    phash = models.CharField(max_length=HASH_BITS // 4, blank=True)
+    phash_0 = models.PositiveBigIntegerField(null=True, blank=True, db_index=True)
+    phash_1 = models.PositiveBigIntegerField(null=True, blank=True, db_index=True)
+    phash_2 = models.PositiveBigIntegerField(null=True, blank=True, db_index=True)
+    phash_3 = models.PositiveBigIntegerField(null=True, blank=True, db_index=True)
+    phash_4 = models.PositiveBigIntegerField(null=True, blank=True, db_index=True)
+    phash_5 = models.PositiveBigIntegerField(null=True, blank=True, db_index=True)
+    phash_6 = models.PositiveBigIntegerField(null=True, blank=True, db_index=True)
+    phash_7 = models.PositiveBigIntegerField(null=True, blank=True, db_index=True)
+    
+    PHASH_FIELDS = ['phash'] + [f'phash_{i}' for i in range(PHASH_CHUNKS)]
+    
+    class Meta:
+        abstract = True
+    
+    def set_phash(self, value):
+        self.phash = f"{value:0{HASH_BITS // 4}x}"
+        for i, chunk in enumerate(split_hash(value)):
+            setattr(self, f'phash_{i}', chunk)
+    
+    def compute_phash(self):
+        """
+        Hash self.screenshot; leaves the fields empty if it can't be read as
+        an image or is too uniform to identify
+        """
+        try:
+            self.screenshot.open('rb')
+            try:
+                value = dhash(self.screenshot)
+            finally:
+                self.screenshot.seek(0)
+        except Exception:
+            return
+        if has_detail(value):
+            self.set_phash(value)
+
+
+def find_similar_screenshots(value, exclude_order=None):
+    """
+    Return [(order_id, distance)] for live and archived payment proofs whose
+    screenshot hash is within imagehash.MAX_DISTANCE of value, nearest first.
+    """
+    lookup = Q()
+    for i, chunk in enumerate(split_hash(value)):
+        lookup |= Q(**{f'phash_{i}': chunk})
+    lookup &= ~Q(phash='')
+    
+    live = PaymentProof.objects.filter(lookup)
+    if exclude_order is not None:
+        live = live.exclude(order=exclude_order)
+    candidates = list(live.values_list('order__order_id', 'phash'))
+    candidates += ArchivedPaymentProof.objects.filter(lookup).values_list('order__order_id', 'phash')
+    
+    matches = []
+    for order_id, phash in candidates:
+        distance = hamming(value, int(phash, 16))
+        if distance <= MAX_PHASH_DISTANCE:
+            matches.append((order_id, distance))
+    return sorted(matches, key=lambda match: match[1])
+
+
+def normalize_transaction_id(value):
+    """Canonical form of a UPI/bank transaction reference: no spaces or dashes, upper case"""
+    return re.sub(r'[\s-]+', '', value or '').upper()
+
+
+class PaymentProof(ScreenshotHashFields):
     order = models.OneToOneField(Order, on_delete=models.CASCADE, related_name='payment_proof')
-    screenshot = models.ImageField(upload_to='payment_proofs/')
+    screenshot = models.ImageField(upload_to=ShardedUploadTo('payment_proofs'), storage=media_storage)
     upi_transaction_id = models.CharField(max_length=100, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     
+    # Set at upload when the screenshot looks like one from another order
+    duplicate_of_order_id = models.UUIDField(null=True, blank=True)
+    duplicate_distance = models.PositiveSmallIntegerField(null=True, blank=True)
+    
+    class Meta:
+        constraints = [
+            # Partial unique index: doubles as the lookup index for
+            # reconciliation while allowing any number of blank IDs
+            models.UniqueConstraint(
+                fields=['upi_transaction_id'],
+                condition=~Q(upi_transaction_id=''),
+                name='unique_upi_transaction_id',
+                violation_error_message='This UPI transaction ID has already been used for another order.',
+            ),
+        ]
+    
     def __str__(self):
         return f"Payment proof for {self.order.order_id}"
+    
+    def save(self, *args, **kwargs):
+        self.upi_transaction_id = normalize_transaction_id(self.upi_transaction_id)
+        if self.screenshot and not self.phash:
+            self.compute_phash()
+            if self.phash:
+                self.flag_duplicate()
+        super().save(*args, **kwargs)
+    
+    def flag_duplicate(self):
+        matches = find_similar_screenshots(int(self.phash, 16), exclude_order=self.order_id)
+        if matches:
+            self.duplicate_of_order_id, self.duplicate_distance = matches[0]
+        else:
+            self.duplicate_of_order_id = self.duplicate_distance = None
+
+
+class IdempotencyKey(models.Model):
+    """Key embedded in a checkout form, recorded with the order it created"""
+    key = models.CharField(max_length=64, unique=True)
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='idempotency_keys')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.key} -> {self.order.order_id}"
 
 
 class WebsiteSettings(models.Model):
@@ -122,6 +334,7 @@ class WebsiteSettings(models.Model):
     telegram_bot_token = models.CharField(max_length=200, blank=True, help_text='Telegram Bot Token for order notifications')
     telegram_chat_id = models.CharField(max_length=100, blank=True, help_text='Your Telegram Chat ID to receive notifications')
     enable_telegram_notifications = models.BooleanField(default=False, help_text='Enable Telegram notifications for new orders')
+    telegram_webhook_secret = models.CharField(max_length=256, blank=True, help_text='Secret Telegram sends with webhook updates (set by manage.py set_telegram_webhook)')
     
     # Business settings
     processing_time_days = models.PositiveIntegerField(default=5, help_text='Days to process orders')
@@ -154,12 +367,14 @@ class Banner(models.Model):
     title = models.CharField(max_length=200)
     subtitle = models.CharField(max_length=500, blank=True)
     banner_type = models.CharField(max_length=20, choices=BANNER_TYPES, default='hero')
-    image = models.ImageField(upload_to='banners/')
+    image = models.ImageField(upload_to=ShardedUploadTo('banners'), storage=media_storage)
     link_url = models.URLField(blank=True, help_text='Optional link when banner is clicked')
     link_text = models.CharField(max_length=100, blank=True, help_text='Button text for the link')
     
     is_active = models.BooleanField(default=True)
     order = models.PositiveIntegerField(default=0, help_text='Display order (lower numbers first)')
+    starts_at = models.DateTimeField(null=True, blank=True, help_text='Show from this time (empty: right away)')
+    ends_at = models.DateTimeField(null=True, blank=True, help_text='Hide from this time (empty: until deactivated)')
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -169,3 +384,79 @@ class Banner(models.Model):
     
     def __str__(self):
         return f"{self.get_banner_type_display()} - {self.title}"
+
+
+class ArchivedOrder(models.Model):
+    """
+    Completed or cancelled order moved out of the live tables by the
+    archive_orders command. Mirrors Order (and its items, customizations
+    and payment proof below) so the same templates can render it.
+    """
+    is_archived = True
+    
+    order_id = models.UUIDField(unique=True)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    
+    full_name = models.CharField(max_length=200)
+    mobile_number = models.CharField(max_length=15, db_index=True)
+    email = models.EmailField(blank=True, db_index=True)
+    delivery_address = models.TextField()
+    
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    objects = FullDetailQuerySet.as_manager()
+    
+    def __str__(self):
+        return f"Archived order {self.order_id} - {self.full_name}"
+    
+    class Meta:
+        ordering = ['-created_at']
+
+
+class ArchivedOrderItem(models.Model):
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True)
+    product_name = models.CharField(max_length=200)
+    quantity = models.PositiveIntegerField()
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    total_price = models.DecimalField(max_digits=10, decimal_places=2)
+    
+    def __str__(self):
+        return f"{self.product_name} x {self.quantity}"
+
+
+class ArchivedCustomizationDetails(models.Model):
+    order_item = models.OneToOneField(ArchivedOrderItem, on_delete=models.CASCADE, related_name='customization')
+    custom_text = models.CharField(max_length=500, blank=True)
+    custom_image = models.ImageField(upload_to=ShardedUploadTo('customizations'), blank=True, storage=media_storage)
+    notes = models.TextField(blank=True)
+    
+    def __str__(self):
+        return f"Customization for {self.order_item}"
+
+
+class ArchivedPaymentProof(ScreenshotHashFields):
+    order = models.OneToOneField(ArchivedOrder, on_delete=models.CASCADE, related_name='payment_proof')
+    screenshot = models.ImageField(upload_to=ShardedUploadTo('payment_proofs'), storage=media_storage)
+    upi_transaction_id = models.CharField(max_length=100, blank=True, db_index=True)
+    uploaded_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"Payment proof for {self.order.order_id}"
+
+
+class MediaBlob(models.Model):
+    """One stored file of ContentHashStorage, with its reference count"""
+    sha256 = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
@@ -0,0 +1,52 @@
+import hashlib
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that avoids an exact COUNT(*) over large tables.
+
+    An unfiltered queryset on PostgreSQL uses the planner's row estimate
+    from pg_class once the table is past ESTIMATE_THRESHOLD rows. Every
+    other count is exact but cached for COUNT_CACHE_SECONDS, keyed by the
+    query, so paging through a filtered changelist counts once.
+    """
+
+    ESTIMATE_THRESHOLD = 10000
+    COUNT_CACHE_SECONDS = 60
+
+    def _estimated_count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if queryset.query.where or connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if row and row[0] >= self.ESTIMATE_THRESHOLD:
+            return row[0]
+        return None
+
+    @cached_property
+    def count(self):
+        if not hasattr(self.object_list, 'query'):
+            return super().count
+
+        estimate = self._estimated_count()
+        if estimate is not None:
+            return estimate
+
+        sql, params = self.object_list.query.sql_with_params()
+        key = 'paginator:count:' + hashlib.md5(repr((self.object_list.db, sql, params)).encode()).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = self.object_list.count()
+            cache.set(key, count, self.COUNT_CACHE_SECONDS)
+        return count
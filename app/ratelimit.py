@@ -0,0 +1,133 @@
+import hashlib
+import math
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+
+
+class TokenBucket:
+    """
+    Token bucket kept in the Django cache.
+
+    Every process that uses the same cache backend draws from the same
+    bucket, so a shared backend (Redis, Memcached, database) limits all
+    workers together. State is (tokens, updated_at, paused_until) under one
+    key; updates are serialised with a short cache.add() lock.
+    """
+
+    LOCK_TIMEOUT = 2  # seconds a crashed holder can block the bucket
+
+    def __init__(self, key, rate, capacity=1):
+        self.key = f"ratelimit:{key}"
+        self.lock_key = f"{self.key}:lock"
+        self.rate = float(rate)  # tokens added per second
+        self.capacity = capacity
+        self.retry_after = 0  # seconds until the next token, after a refused acquire()
+
+    @contextmanager
+    def _lock(self, timeout=1.0):
+        deadline = time.monotonic() + timeout
+        acquired = cache.add(self.lock_key, 1, self.LOCK_TIMEOUT)
+        while not acquired and time.monotonic() < deadline:
+            time.sleep(0.01)
+            acquired = cache.add(self.lock_key, 1, self.LOCK_TIMEOUT)
+        try:
+            # Best effort if the lock can't be had: a rare extra message
+            # beats blocking the caller
+            yield
+        finally:
+            if acquired:
+                cache.delete(self.lock_key)
+
+    def _state(self, now):
+        tokens, updated_at, paused_until = cache.get(self.key) or (self.capacity, now, 0)
+        tokens = min(self.capacity, tokens + (now - updated_at) * self.rate)
+        return tokens, paused_until
+
+    def _save(self, tokens, now, paused_until):
+        # Expire once the bucket would be full again anyway
+        timeout = max(paused_until - now, 0) + self.capacity / self.rate + 1
+        cache.set(self.key, (tokens, now, paused_until), int(timeout) + 1)
+
+    def acquire(self, max_wait=0):
+        """
+        Take a token, sleeping until it is available if that is at most
+        max_wait seconds away. Returns False, without taking a token, if
+        the wait would be longer.
+        """
+        with self._lock():
+            now = time.time()
+            tokens, paused_until = self._state(now)
+            wait = max((1 - tokens) / self.rate, paused_until - now, 0)
+            if wait > max_wait:
+                self.retry_after = wait
+                return False
+            self._save(tokens - 1, now, paused_until)
+        if wait:
+            time.sleep(wait)
+        return True
+
+    def pause(self, seconds):
+        """Hold every caller back for the given time, e.g. a 429's retry_after"""
+        with self._lock():
+            now = time.time()
+            tokens, paused_until = self._state(now)
+            self._save(min(tokens, 0), now, max(paused_until, now + seconds))
+
+
+def client_ip(request):
+    """
+    Address requests are limited by. Behind a reverse proxy set
+    RATELIMIT_IP_META to the header it fills in, e.g. 'HTTP_X_REAL_IP'.
+    """
+    return request.META.get(getattr(settings, 'RATELIMIT_IP_META', 'REMOTE_ADDR'), '')
+
+
+def post_field(name):
+    """Key function limiting by a submitted form field, e.g. the mobile number"""
+    def key(request):
+        return request.POST.get(name, '').strip().lower()
+    key.__name__ = name
+    return key
+
+
+def rate_limit(name, keys=(client_ip,), methods=None, json=False):
+    """
+    Limit a view to RATE_LIMITS[name] = (requests, seconds) for each key.
+
+    Every key function (client IP, a form field, ...) gets its own token
+    bucket in the cache; a request needs a token from each of them. Refused
+    requests get a 429 with Retry-After before the view runs. With methods
+    set, other methods pass through unlimited.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            limit = getattr(settings, 'RATE_LIMITS', {}).get(name)
+            if limit and (methods is None or request.method in methods):
+                requests, seconds = limit
+                for key in keys:
+                    value = key(request)
+                    if not value:
+                        continue
+                    digest = hashlib.md5(value.encode()).hexdigest()
+                    bucket = TokenBucket(f"{name}:{key.__name__}:{digest}", requests / seconds, requests)
+                    if not bucket.acquire():
+                        return _too_many_requests(bucket.retry_after, json)
+            return view(request, *args, **kwargs)
+        return wrapped
+    return decorator
+
+
+def _too_many_requests(retry_after, json):
+    message = 'Too many requests. Please wait a moment and try again.'
+    if json:
+        response = JsonResponse({'success': False, 'error': message}, status=429)
+    else:
+        response = HttpResponse(message, status=429, content_type='text/plain')
+    response['Retry-After'] = max(1, math.ceil(retry_after))
+    return response
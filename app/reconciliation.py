@@ -0,0 +1,181 @@
+import csv
+import io
+import re
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.utils import timezone
+
+from .models import Order, normalize_transaction_id
+
+
+# Accepted header names (lower case) for each statement column
+TRANSACTION_COLUMNS = ['transaction id', 'transaction_id', 'txn id', 'utr', 'utr no', 'upi ref no', 'reference', 'ref no']
+AMOUNT_COLUMNS = ['amount', 'credit', 'credit amount', 'deposit amount']
+DATE_COLUMNS = ['date', 'transaction date', 'txn date', 'value date']
+
+DATE_FORMATS = [
+    '%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d/%m/%y', '%d-%b-%Y', '%d %b %Y',
+    '%Y-%m-%d %H:%M:%S', '%d/%m/%Y %H:%M:%S', '%d-%m-%Y %H:%M:%S',
+]
+
+
+class ReconciliationReport:
+    """Outcome of matching a statement against pending orders"""
+
+    def __init__(self, dry_run):
+        self.dry_run = dry_run
+        self.rows = 0
+        self.matches = []  # (row number, order_id, 'transaction id' | 'amount and date')
+        self.unmatched = 0
+        self.errors = []  # (row number, message)
+        self.confirmed = 0
+
+    def add_error(self, row_number, message):
+        self.errors.append((row_number, message))
+
+
+AMOUNT_PATTERN = re.compile(r'-?\d[\d,]*(?:\.\d+)?')
+
+
+def parse_amount(value):
+    """Decimal from a statement amount such as "₹1,250.00" or "Rs. 500"; None if unreadable"""
+    # Match the number itself, so the dot in a prefix like "Rs." isn't
+    # taken for a decimal point
+    number = AMOUNT_PATTERN.search(value or '')
+    if number is None:
+        return None
+    try:
+        return Decimal(number.group().replace(',', ''))
+    except InvalidOperation:
+        return None
+
+
+def parse_date(value):
+    value = (value or '').strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _find_column(fieldnames, candidates):
+    for name in fieldnames:
+        if name.strip().lower().rstrip('.') in candidates:
+            return name
+    return None
+
+
+class PendingOrderIndex:
+    """
+    Orders awaiting payment verification, loaded with one query and
+    hashed by transaction ID and by amount so each statement line is
+    matched with dictionary lookups.
+    """
+
+    def __init__(self, orders):
+        # orders: iterable of (order_id, total_amount, created_at, upi_transaction_id)
+        self.by_transaction = {}
+        self.by_amount = defaultdict(list)
+        self.matched = set()
+        for order_id, amount, created_at, transaction_id in orders:
+            entry = (order_id, amount, timezone.localdate(created_at))
+            if transaction_id:
+                self.by_transaction[transaction_id] = entry
+            self.by_amount[amount].append(entry)
+
+    @classmethod
+    def load(cls):
+        return cls(
+            Order.objects.filter(status='pending_payment')
+            .values_list('order_id', 'total_amount', 'created_at', 'payment_proof__upi_transaction_id')
+        )
+
+    def match(self, transaction_id, amount, date, tolerance, match_amounts=False):
+        """
+        Return (order_id, method) for a statement line, or (None, reason).
+
+        A transaction ID match must also agree on amount. With
+        match_amounts, a line without one matches on amount when exactly
+        one unmatched order has that total and was placed within tolerance
+        of the statement date.
+        """
+        entry = self.by_transaction.get(transaction_id) if transaction_id else None
+        if entry is not None and entry[0] not in self.matched:
+            if entry[1] != amount:
+                return None, f'amount {amount} does not match order total {entry[1]}'
+            self.matched.add(entry[0])
+            return entry[0], 'transaction id'
+
+        if not match_amounts or date is None:
+            return None, None
+        candidates = [
+            order_id for order_id, _, created in self.by_amount.get(amount, [])
+            if order_id not in self.matched and abs(date - created) <= tolerance
+        ]
+        if len(candidates) > 1:
+            return None, f'{len(candidates)} pending orders for {amount} around {date}, match manually'
+        if candidates:
+            self.matched.add(candidates[0])
+            return candidates[0], 'amount and date'
+        return None, None
+
+
+def reconcile_statement(csv_file, tolerance_days=1, match_amounts=False, dry_run=False):
+    """
+    Match a bank/UPI statement CSV against orders pending payment and
+    confirm the matched orders with a single bulk_set_status call.
+
+    Lines match by transaction ID, or also by amount and date with
+    match_amounts: two customers paying the same total on the same day
+    can't be told apart that way, so it is opt-in. The statement needs an
+    amount column and a transaction ID and/or date column; common bank
+    header names are recognised. Lines that are not credits, or whose
+    match is ambiguous, are reported and left for manual review.
+
+    Returns:
+        ReconciliationReport
+    """
+    report = ReconciliationReport(dry_run)
+
+    if isinstance(csv_file, bytes):
+        csv_file = csv_file.decode('utf-8-sig')
+    if isinstance(csv_file, str):
+        csv_file = io.StringIO(csv_file)
+
+    reader = csv.DictReader(csv_file)
+    fieldnames = reader.fieldnames or []
+    transaction_column = _find_column(fieldnames, TRANSACTION_COLUMNS)
+    amount_column = _find_column(fieldnames, AMOUNT_COLUMNS)
+    date_column = _find_column(fieldnames, DATE_COLUMNS)
+    if amount_column is None or (transaction_column is None and date_column is None):
+        report.add_error(1, 'Statement needs an amount column and a transaction ID or date column')
+        return report
+
+    index = PendingOrderIndex.load()
+    tolerance = timedelta(days=tolerance_days)
+
+    for row_number, row in enumerate(reader, start=2):
+        report.rows += 1
+        amount = parse_amount(row.get(amount_column))
+        if amount is None or amount <= 0:
+            continue  # debits and blank lines
+        transaction_id = normalize_transaction_id(row.get(transaction_column)) if transaction_column else ''
+        date = parse_date(row.get(date_column)) if date_column else None
+
+        order_id, detail = index.match(transaction_id, amount, date, tolerance, match_amounts)
+        if order_id is not None:
+            report.matches.append((row_number, order_id, detail))
+        else:
+            report.unmatched += 1
+            if detail:
+                report.add_error(row_number, detail)
+
+    if report.matches and not dry_run:
+        results = Order.objects.bulk_set_status({order_id: 'confirmed' for _, order_id, _ in report.matches})
+        report.confirmed = sum(1 for result in results.values() if result['success'])
+
+    return report
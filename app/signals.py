@@ -0,0 +1,99 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from . import banners, catalog, events
+from .models import (
+    Banner, Order, PaymentProof, Product, ProductImage, CustomizationDetails,
+    ArchivedCustomizationDetails, ArchivedPaymentProof,
+)
+from .storage import media_storage
+
+
+# Each row of these models holds one reference to its file in media_storage
+MEDIA_FIELDS = {
+    ProductImage: 'image',
+    Banner: 'image',
+    CustomizationDetails: 'custom_image',
+    PaymentProof: 'screenshot',
+    ArchivedCustomizationDetails: 'custom_image',
+    ArchivedPaymentProof: 'screenshot',
+}
+
+
+@receiver(post_init, sender=Order)
+def remember_loaded_status(sender, instance, **kwargs):
+    # Read __dict__ so a deferred status field isn't fetched just for this
+    instance._loaded_status = instance.__dict__.get('status')
+
+
+@receiver(post_save, sender=Order)
+def publish_order_saved(sender, instance, created, **kwargs):
+    if created:
+        events.order_created(instance)
+    elif instance._loaded_status is not None and instance.status != instance._loaded_status:
+        with_proof = set()
+        if PaymentProof.objects.filter(order_id=instance.pk).exists():
+            with_proof.add(str(instance.order_id))
+        events.status_changes([(instance.order_id, instance._loaded_status, instance.status)], with_proof)
+    instance._loaded_status = instance.status
+
+
+@receiver(post_save, sender=PaymentProof)
+def publish_payment_proof_saved(sender, instance, created, **kwargs):
+    if created:
+        events.payment_proof_added(instance.order)
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=ProductImage)
+def invalidate_catalog(sender, **kwargs):
+    # After commit, so no process rebuilds its snapshot from the old rows
+    transaction.on_commit(catalog.bump_version)
+
+
+@receiver([post_save, post_delete], sender=Banner)
+def invalidate_banners(sender, **kwargs):
+    transaction.on_commit(banners.clear_cache)
+
+
+def _file_name(instance):
+    value = instance.__dict__.get(MEDIA_FIELDS[type(instance)])
+    return getattr(value, 'name', value) or ''
+
+
+def _release_on_commit(name):
+    # After commit, so a rolled back delete doesn't lose the file
+    transaction.on_commit(lambda: media_storage.release(name))
+
+
+def remember_loaded_file(sender, instance, **kwargs):
+    instance._loaded_file = _file_name(instance)
+
+
+def note_new_upload(sender, instance, **kwargs):
+    # An identical upload gets the same name back but still takes a
+    # reference, so the old one has to be released even then
+    file = getattr(instance, MEDIA_FIELDS[sender])
+    instance._uploading_file = not getattr(file, '_committed', True)
+
+
+def release_replaced_file(sender, instance, created, **kwargs):
+    name = _file_name(instance)
+    replaced = instance._uploading_file or instance._loaded_file != name
+    if not created and instance._loaded_file and replaced:
+        _release_on_commit(instance._loaded_file)
+    instance._loaded_file = name
+
+
+def release_deleted_file(sender, instance, **kwargs):
+    name = _file_name(instance)
+    if name:
+        _release_on_commit(name)
+
+
+for model in MEDIA_FIELDS:
+    post_init.connect(remember_loaded_file, sender=model)
+    pre_save.connect(note_new_upload, sender=model)
+    post_save.connect(release_replaced_file, sender=model)
+    post_delete.connect(release_deleted_file, sender=model)
@@ -0,0 +1,62 @@
+"""
+Single-flight caching for expensive values.
+
+When a cached value expires, only the caller that wins a short cache.add()
+lock recomputes it. Everyone else keeps getting the previous value for a
+while (it is stored past its freshness time), or, on a cold cache, waits
+briefly for the winner's result. This keeps a burst of requests after a
+deploy or an expiry from all running the same queries or rendering the
+same image at once.
+"""
+import time
+
+from django.core.cache import cache
+
+
+LOCK_TIMEOUT = 30  # seconds a crashed rebuilder can hold up a key
+POLL_INTERVAL = 0.05
+
+
+def _rebuild(key, lock_key, compute, timeout, stale_timeout):
+    try:
+        value = compute()
+        cache.set(key, (value, time.time() + timeout), timeout + stale_timeout)
+        return value
+    finally:
+        cache.delete(lock_key)
+
+
+def get_or_compute(key, compute, timeout, stale_timeout=None, wait=2.0):
+    """
+    Cached result of compute(), rebuilt by one caller at a time.
+
+    Args:
+        key: cache key
+        compute: callable producing the value; it must be picklable
+        timeout: seconds the value is fresh
+        stale_timeout: seconds an expired value may still be served while
+            it is rebuilt (default: timeout)
+        wait: seconds to wait for another caller's rebuild when nothing is
+            cached; after that the caller computes the value itself
+    """
+    if stale_timeout is None:
+        stale_timeout = timeout
+    lock_key = f"{key}:rebuild"
+
+    entry = cache.get(key)
+    if entry is not None:
+        value, fresh_until = entry
+        if time.time() < fresh_until or not cache.add(lock_key, 1, LOCK_TIMEOUT):
+            return value
+        return _rebuild(key, lock_key, compute, timeout, stale_timeout)
+
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        return _rebuild(key, lock_key, compute, timeout, stale_timeout)
+
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+    return compute()
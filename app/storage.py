@@ -0,0 +1,112 @@
+import hashlib
+import os
+import posixpath
+
+from django.core.files.storage import FileSystemStorage
+from django.db.models import F
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+
+def file_sha256(content):
+    """SHA-256 hex digest of a Django File, read in chunks"""
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def hashed_name(directory, sha256, extension):
+    """<directory>/<first two hex digits>/<sha256><ext>"""
+    return posixpath.join(directory, sha256[:2], sha256 + extension.lower())
+
+
+@deconstructible
+class ShardedUploadTo:
+    """
+    upload_to callable that spreads uploads over <directory>/<YYYY>/<MM>/.
+
+    ContentHashStorage adds a hash-prefix level below that, so no single
+    directory grows past a few thousand files.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def __call__(self, instance, filename):
+        return posixpath.join(self.directory, timezone.localdate().strftime('%Y/%m'), filename)
+
+    def __eq__(self, other):
+        return isinstance(other, ShardedUploadTo) and other.directory == self.directory
+
+
+@deconstructible
+class ContentHashStorage(FileSystemStorage):
+    """
+    File system storage that writes each distinct file only once.
+
+    Files are named by the SHA-256 of their bytes inside the field's
+    upload_to directory, under a two-character hash prefix. A MediaBlob row per hash keeps a reference count:
+    saving bytes that are already stored just bumps the count and returns
+    the existing name, and delete() only removes the file once the last
+    reference is released.
+    """
+
+    def _save(self, name, content):
+        from .models import MediaBlob
+
+        sha256 = file_sha256(content)
+        blob = MediaBlob.objects.filter(sha256=sha256).first()
+        if blob is not None and self.exists(blob.name):
+            MediaBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+            # Refresh the mtime so the orphan collector's grace period
+            # protects a file that just gained a reference
+            os.utime(self.path(blob.name))
+            return blob.name
+
+        directory, filename = posixpath.split(name)
+        target = hashed_name(directory, sha256, posixpath.splitext(filename)[1])
+        if not self.exists(target):
+            target = super()._save(target, content)
+
+        blob, created = MediaBlob.objects.get_or_create(
+            sha256=sha256,
+            defaults={'name': target, 'size': content.size},
+        )
+        if not created:
+            MediaBlob.objects.filter(pk=blob.pk).update(name=target, ref_count=F('ref_count') + 1)
+        return target
+
+    def delete(self, name):
+        """Release one reference; the file is removed with the last one"""
+        from .models import MediaBlob
+
+        blob = MediaBlob.objects.filter(name=name).first()
+        if blob is None:
+            # Stored before deduplication was introduced
+            return super().delete(name)
+
+        MediaBlob.objects.filter(pk=blob.pk, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+        if MediaBlob.objects.filter(pk=blob.pk, ref_count__lte=0).delete()[0]:
+            super().delete(name)
+
+    def retain(self, name, count=1):
+        """Add references for other rows that now point at a stored file"""
+        from .models import MediaBlob
+
+        MediaBlob.objects.filter(name=name).update(ref_count=F('ref_count') + count)
+
+    def release(self, name):
+        """
+        Release the reference a deleted or replaced row held. Files stored
+        before deduplication have no count, so other rows may still point
+        at them; collect_orphaned_media removes those once they aren't.
+        """
+        from .models import MediaBlob
+
+        if MediaBlob.objects.filter(name=name).exists():
+            self.delete(name)
+
+
+media_storage = ContentHashStorage()
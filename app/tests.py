@@ -1,5 +1,106 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import logging
+import os
+import tempfile
+import time
+import uuid
+import zipfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image, ImageDraw, ImageFont
+
+from app import admin_views, events, utils, views_qr
+from app.admin_views import ORDER_EXPORT_COLUMNS
+from app.archive import archive_batch
+from app.banners import BANNERS_CACHE_KEY, active_banners
+from app.catalog import get_catalog
+from app.catalog_import import import_catalog
+from app.forms import BannerForm
+from app.imagehash import CHUNK_BITS, CHUNKS, MAX_DISTANCE, dhash, hamming, split_hash
+from app.log import QueueListenerHandler
+from app.media_gc import stored_files
+from app.models import (
+    ArchivedOrder, Banner, CustomizationDetails, IdempotencyKey, MediaBlob, Order, OrderItem,
+    PaymentProof, Product, ProductImage, WebsiteSettings, normalize_transaction_id,
+)
+from app.pagination import EstimatedCountPaginator
+from app.ratelimit import TokenBucket, client_ip, post_field, rate_limit
+from app.reconciliation import PendingOrderIndex, parse_amount
+from app.singleflight import get_or_compute
+from app.storage import media_storage
 from app.templatetags import phone_extras
+from app.utils import format_order_digest, replace_status_buttons, status_buttons
+from app.views_api import PRODUCT_FIELDS, BadRequest, _fields
+
+
+def create_staff(username='staff'):
+    return User.objects.create_user(username, password='pw', is_staff=True)
+
+
+def create_product(name='Mug', base_price='250', **fields):
+    return Product.objects.create(
+        name=name, base_price=Decimal(base_price), **{'description': '', 'customization_type': 'text', **fields}
+    )
+
+
+def create_order(total_amount='100', **fields):
+    return Order.objects.create(total_amount=Decimal(total_amount), **{
+        'full_name': 'Asha', 'mobile_number': '9876543210', 'delivery_address': 'Pune', **fields,
+    })
+
+
+def create_item(order, product, quantity=1, **customization):
+    """An order line at the product's price, with CustomizationDetails when given"""
+    item = OrderItem.objects.create(
+        order=order, product=product, quantity=quantity,
+        unit_price=product.base_price, total_price=product.base_price * quantity,
+    )
+    if customization:
+        CustomizationDetails.objects.create(order_item=item, **customization)
+    return item
+
+
+def png(color='white', size=(4, 4)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def zip_archive(**files):
+    """An in-memory zip file of name -> bytes"""
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w') as zf:
+        for name, data in files.items():
+            zf.writestr(name, data)
+    archive.seek(0)
+    return archive
+
+
+class TempMediaMixin:
+    """Store files in a temporary MEDIA_ROOT for the duration of each test"""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
 
 
 class PhoneExtrasTests(TestCase):
@@ -17,3 +118,1045 @@ class PhoneExtrasTests(TestCase):
 
     def test_wa_number_empty(self):
         self.assertEqual(phone_extras.wa_number(''), '')
+
+
+
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = create_staff()
+        self.url = reverse('admin_profile_detail', args=['missing'])
+
+    def test_staff_request_is_profiled(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(self.url, {'_profile': 'cprofile'})
+        detail_url = reverse('admin_profile_detail', args=[response['X-Profile-Id']])
+
+        detail = self.client.get(detail_url).json()
+        self.assertEqual(detail['mode'], 'cprofile')
+        self.assertEqual(detail['status_code'], 404)
+        self.assertEqual(detail['query_count'], len(detail['queries']))
+
+        stats = self.client.get(detail_url, {'format': 'pstats'})
+        self.assertEqual(stats['Content-Type'], 'application/octet-stream')
+
+    def test_anonymous_request_is_not_profiled(self):
+        response = self.client.get(self.url, HTTP_X_PROFILE='sample')
+        self.assertNotIn('X-Profile-Id', response)
+
+    @override_settings(PROFILING_MAX_SESSIONS=2)
+    def test_sessions_are_capped(self):
+        self.client.force_login(self.staff)
+        for _ in range(2):
+            response = self.client.get(self.url, {'_profile': 'sample'})
+            self.assertIn('X-Profile-Id', response)
+        response = self.client.get(self.url, {'_profile': 'sample'})
+        self.assertNotIn('X-Profile-Id', response)
+
+
+class JsonLoggingTests(TestCase):
+    def test_records_are_written_as_json_off_thread(self):
+        stream = io.StringIO()
+        handler = QueueListenerHandler(stream=stream)
+        logger = logging.getLogger('app.tests.json')
+        logger.addHandler(handler)
+        logger.propagate = False
+        try:
+            logger.info('Order %s created', 'abc', extra={'order_id': 'abc'})
+        finally:
+            logger.removeHandler(handler)
+            handler.close()
+
+        record = json.loads(stream.getvalue())
+        self.assertEqual(record['message'], 'Order abc created')
+        self.assertEqual(record['order_id'], 'abc')
+
+    def test_request_id_header(self):
+        response = self.client.get(reverse('admin_dashboard'), HTTP_X_REQUEST_ID='req-1')
+        self.assertEqual(response['X-Request-ID'], 'req-1')
+
+
+class CatalogImportTests(TestCase):
+    def test_dry_run_reports_row_errors(self):
+        archive = zip_archive(**{'ok.png': png(), 'broken.png': b'not an image'})
+
+        report = import_catalog(
+            'name,description,base_price,customization_type,images\n'
+            'Keychain,Name keychain,249,text,ok.png\n'
+            'Frame,Photo frame,-5,photo,\n'
+            'Magnet,Fridge magnet,99,both,broken.png\n'
+            'Coaster,Coaster,149,both,missing.png\n',
+            archive,
+            dry_run=True,
+        )
+
+        self.assertEqual(report.rows, 4)
+        self.assertEqual(report.products_created, 1)
+        self.assertEqual([row for row, _ in report.errors], [3, 4, 5])
+
+
+class CatalogImportStorageTests(TempMediaMixin, TransactionTestCase):
+    # Images are stored from worker threads on their own connections, which
+    # can't write while a TestCase transaction holds the table
+
+    def test_shared_image_survives_deleting_one_product(self):
+        import_catalog(
+            'name,description,base_price,customization_type,images\n'
+            'Keychain,Name keychain,249,text,shared.png\n'
+            'Magnet,Fridge magnet,99,both,shared.png\n',
+            zip_archive(**{'shared.png': png('red')}),
+        )
+        name = Product.objects.get(name='Keychain').images.get().image.name
+        self.assertEqual(MediaBlob.objects.get(name=name).ref_count, 2)
+
+        Product.objects.get(name='Keychain').delete()
+        self.assertEqual(MediaBlob.objects.get(name=name).ref_count, 1)
+        self.assertTrue(media_storage.exists(name))
+
+    def test_images_of_skipped_rows_are_released(self):
+        report = import_catalog(
+            'name,description,base_price,customization_type,images\n'
+            'Magnet,Fridge magnet,99,both,ok.png;broken.png\n',
+            zip_archive(**{'ok.png': png('blue'), 'broken.png': b'not an image'}),
+        )
+
+        self.assertEqual(report.products_created, 0)
+        self.assertFalse(MediaBlob.objects.exists())
+
+
+class MediaGarbageCollectorTests(TestCase):
+    def test_stored_files_are_listed_in_sorted_order(self):
+        with tempfile.TemporaryDirectory() as root:
+            names = ['products/a-b.png', 'products/a/c.png', 'products/b.png', 'banners/z.png', 'other/skip.png']
+            for name in names:
+                os.makedirs(os.path.dirname(os.path.join(root, name)), exist_ok=True)
+                open(os.path.join(root, name), 'wb').close()
+
+            listed = [name for name, _ in stored_files(root)]
+
+        self.assertEqual(listed, sorted(name for name in names if not name.startswith('other/')))
+
+
+class MediaReferenceTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.product = create_product()
+
+    def _upload(self, content):
+        return SimpleUploadedFile('mug.png', content, content_type='image/png')
+
+    def _image(self, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            return ProductImage.objects.create(product=self.product, image=self._upload(content))
+
+    def _refs(self, name):
+        blob = MediaBlob.objects.filter(name=name).first()
+        return blob.ref_count if blob else 0
+
+    def test_deleting_rows_releases_shared_file(self):
+        first, second = self._image(b'one'), self._image(b'one')
+        name = first.image.name
+        self.assertEqual(second.image.name, name)
+        self.assertEqual(self._refs(name), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(self._refs(name), 1)
+        self.assertTrue(media_storage.exists(name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.delete()  # cascades to the second image
+        self.assertEqual(self._refs(name), 0)
+        self.assertFalse(media_storage.exists(name))
+
+    def test_replacing_a_file_releases_the_old_one(self):
+        image = ProductImage.objects.get(pk=self._image(b'old').pk)
+        old_name = image.image.name
+
+        image.image = self._upload(b'new')
+        with self.captureOnCommitCallbacks(execute=True):
+            image.save()
+        self.assertFalse(media_storage.exists(old_name))
+        self.assertEqual(self._refs(image.image.name), 1)
+
+        # Same bytes again: same name, still one reference
+        image.image = self._upload(b'new')
+        with self.captureOnCommitCallbacks(execute=True):
+            image.save()
+        self.assertEqual(self._refs(image.image.name), 1)
+
+
+class ShardMediaCommandTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.product = create_product()
+
+    def _legacy(self, name, content, rows=1):
+        """Write a file in the old flat layout and point rows at it"""
+        os.makedirs(os.path.dirname(media_storage.path(name)), exist_ok=True)
+        with open(media_storage.path(name), 'wb') as f:
+            f.write(content)
+        return [ProductImage.objects.create(product=self.product, image=name) for _ in range(rows)]
+
+    def _shard(self):
+        call_command('shard_media', stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_identical_legacy_files_merge_into_one_blob(self):
+        self._legacy('products/a.png', b'same bytes')
+        self._legacy('products/b.png', b'same bytes', rows=2)
+
+        self._shard()
+
+        names = set(ProductImage.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        name = names.pop()
+        self.assertEqual(MediaBlob.objects.get().name, name)
+        self.assertEqual(MediaBlob.objects.get().ref_count, 3)
+        self.assertTrue(media_storage.exists(name))
+        self.assertFalse(media_storage.exists('products/a.png'))
+        self.assertFalse(media_storage.exists('products/b.png'))
+
+    def test_legacy_file_joins_existing_blob(self):
+        stored = media_storage.save('products/mug.png', ContentFile(b'same bytes'))
+        self._legacy('products/old.png', b'same bytes', rows=2)
+
+        self._shard()
+
+        self.assertEqual(set(ProductImage.objects.values_list('image', flat=True)), {stored})
+        blob = MediaBlob.objects.get()
+        self.assertEqual((blob.name, blob.ref_count), (stored, 3))
+        self.assertFalse(media_storage.exists('products/old.png'))
+
+    def test_dry_run_changes_nothing(self):
+        image, = self._legacy('products/a.png', b'bytes')
+
+        call_command('shard_media', '--dry-run', stdout=io.StringIO())
+
+        image.refresh_from_db()
+        self.assertEqual(image.image.name, 'products/a.png')
+        self.assertTrue(media_storage.exists('products/a.png'))
+        self.assertFalse(MediaBlob.objects.exists())
+
+
+class ImageHashTests(TempMediaMixin, TestCase):
+    def _screenshot(self, size=(360, 720), fmt='PNG', amount='₹ 500.00', payee='Leena Crafts', ref='412345678901'):
+        """A payment app confirmation screen: same layout, different details"""
+        image = Image.new('RGB', (360, 720), 'white')
+        draw = ImageDraw.Draw(image)
+        draw.rectangle([0, 0, 360, 60], fill=(30, 60, 140))
+        draw.ellipse([150, 100, 210, 160], fill=(40, 170, 90))
+        draw.text((180, 200), amount, fill='black', font=ImageFont.load_default(size=28), anchor='mm')
+        draw.text((180, 260), f'Paid to {payee}', fill='black', font=ImageFont.load_default(size=14), anchor='mm')
+        draw.text((180, 300), f'UPI Ref {ref}', fill='grey', font=ImageFont.load_default(size=14), anchor='mm')
+        draw.rectangle([40, 620, 320, 670], fill=(30, 60, 140))
+        buffer = io.BytesIO()
+        image.resize(size).save(buffer, fmt)
+        buffer.seek(0)
+        return buffer
+
+    def test_reencoded_screenshot_is_within_distance(self):
+        original = dhash(self._screenshot())
+        reencoded = dhash(self._screenshot(size=(300, 600), fmt='JPEG'))
+        self.assertLessEqual(hamming(original, reencoded), MAX_DISTANCE)
+
+    def test_other_payment_in_the_same_app_is_not_a_match(self):
+        # An 8x8 hash of these two differs in a single bit
+        original = dhash(self._screenshot())
+        other = dhash(self._screenshot(amount='₹ 75.00', payee='Mohan General Stores', ref='498765432109'))
+        self.assertGreater(hamming(original, other), MAX_DISTANCE)
+
+    def test_only_the_reused_screenshot_is_flagged(self):
+        def proof(screenshot):
+            return PaymentProof.objects.create(
+                order=create_order('500'), screenshot=SimpleUploadedFile('s.png', screenshot.read()),
+            )
+
+        first = proof(self._screenshot())
+        other = proof(self._screenshot(amount='₹ 75.00', payee='Mohan General Stores', ref='498765432109'))
+        reused = proof(self._screenshot(size=(300, 600), fmt='JPEG'))
+
+        self.assertIsNone(other.duplicate_of_order_id)
+        self.assertEqual(reused.duplicate_of_order_id, first.order.order_id)
+
+    def test_uniform_screenshot_is_left_unhashed(self):
+        proof = PaymentProof(screenshot=SimpleUploadedFile('blank.png', png(size=(360, 720))))
+        proof.compute_phash()
+        self.assertEqual(proof.phash, '')
+
+    def test_missing_screenshot_is_left_unhashed(self):
+        proof = PaymentProof(screenshot='payment_proofs/missing.png')
+        proof.compute_phash()
+        self.assertEqual(proof.phash, '')
+
+    def test_split_hash_round_trip(self):
+        value = int('0123456789abcdef' * 4, 16)
+        chunks = split_hash(value)
+        self.assertEqual(chunks, [0x01234567, 0x89abcdef] * 4)
+        self.assertEqual(sum(chunk << (CHUNK_BITS * (CHUNKS - 1 - i)) for i, chunk in enumerate(chunks)), value)
+
+
+class PaymentReconciliationTests(TestCase):
+    def _index(self):
+        created = timezone.make_aware(datetime(2024, 5, 10, 12, 0))
+        self.orders = [uuid.uuid4() for _ in range(3)]
+        return PendingOrderIndex([
+            (self.orders[0], Decimal('499.00'), created, 'UTR123456789'),
+            (self.orders[1], Decimal('250.00'), created, None),
+            (self.orders[2], Decimal('300.00'), created, None),
+            (uuid.uuid4(), Decimal('300.00'), created, None),
+        ])
+
+    def test_normalize_transaction_id(self):
+        self.assertEqual(normalize_transaction_id(' utr 1234-5678 '), 'UTR12345678')
+        self.assertEqual(normalize_transaction_id(None), '')
+
+    def test_match_by_transaction_id_then_amount_and_date(self):
+        index = self._index()
+        tolerance = timedelta(days=1)
+        self.assertEqual(index.match('UTR123456789', Decimal('499'), None, tolerance),
+                         (self.orders[0], 'transaction id'))
+        # Each order is matched at most once
+        self.assertEqual(index.match('UTR123456789', Decimal('499'), None, tolerance), (None, None))
+        # Amount matching is opt-in
+        self.assertEqual(index.match('', Decimal('250'), date(2024, 5, 11), tolerance), (None, None))
+        self.assertEqual(index.match('', Decimal('250'), date(2024, 5, 11), tolerance, match_amounts=True),
+                         (self.orders[1], 'amount and date'))
+        self.assertEqual(index.match('', Decimal('250'), date(2024, 5, 11), tolerance, match_amounts=True),
+                         (None, None))
+
+    def test_ambiguous_and_out_of_tolerance_lines_are_not_matched(self):
+        index = self._index()
+        tolerance = timedelta(days=1)
+        order_id, reason = index.match('', Decimal('300'), date(2024, 5, 10), tolerance, match_amounts=True)
+        self.assertIsNone(order_id)
+        self.assertIn('match manually', reason)
+        self.assertEqual(index.match('', Decimal('250'), date(2024, 5, 20), tolerance, match_amounts=True),
+                         (None, None))
+
+    def test_parse_amount(self):
+        self.assertEqual(parse_amount('Rs. 500'), Decimal('500'))
+        self.assertEqual(parse_amount('₹1,250.00'), Decimal('1250.00'))
+        self.assertEqual(parse_amount('INR 75.50 CR'), Decimal('75.50'))
+        self.assertEqual(parse_amount('-200.00'), Decimal('-200.00'))
+        self.assertIsNone(parse_amount(''))
+
+
+class TokenBucketTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_burst_then_throttled(self):
+        bucket = TokenBucket('test', rate=0.5, capacity=2)
+        self.assertTrue(bucket.acquire())
+        self.assertTrue(bucket.acquire())
+        self.assertFalse(bucket.acquire())
+        # A later caller may wait for the next token
+        self.assertFalse(TokenBucket('test', rate=0.5, capacity=2).acquire(max_wait=1))
+
+    def test_pause_holds_back_all_callers(self):
+        TokenBucket('paused', rate=10, capacity=5).pause(30)
+        self.assertFalse(TokenBucket('paused', rate=10, capacity=5).acquire(max_wait=5))
+
+    @override_settings(RATE_LIMITS={'test': (2, 60)})
+    def test_rate_limit_decorator_per_ip_and_field(self):
+        view = rate_limit('test', keys=(client_ip, post_field('mobile_number')), methods=('POST',))(
+            lambda request: HttpResponse('ok')
+        )
+        factory = RequestFactory()
+
+        def post(ip, mobile):
+            return view(factory.post('/', {'mobile_number': mobile}, REMOTE_ADDR=ip))
+
+        self.assertEqual(post('10.0.0.1', '9000000001').status_code, 200)
+        self.assertEqual(post('10.0.0.1', '9000000002').status_code, 200)
+        response = post('10.0.0.1', '9000000003')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        # Same mobile number from another address: limited by the number
+        self.assertEqual(post('10.0.0.2', '9000000001').status_code, 200)
+        self.assertEqual(post('10.0.0.3', '9000000001').status_code, 429)
+        # GET isn't limited
+        self.assertEqual(view(factory.get('/', REMOTE_ADDR='10.0.0.1')).status_code, 200)
+
+
+class TelegramStatusButtonTests(TestCase):
+    order_id = '5f560d9f-32fc-44eb-b38d-59e5b0202589'
+
+    def test_buttons_follow_status_transitions(self):
+        buttons = status_buttons(self.order_id, 'pending_payment')
+        self.assertEqual([b['callback_data'] for b in buttons], [
+            f'status:{self.order_id}:confirmed', f'status:{self.order_id}:cancelled',
+        ])
+        self.assertTrue(all(len(b['callback_data'].encode()) <= 64 for b in buttons))
+        self.assertEqual(status_buttons(self.order_id, 'completed'), [])
+
+    def test_replace_keeps_other_orders_and_url_buttons(self):
+        other = '11111111-2222-3333-4444-555555555555'
+        url_button = {'text': '🔍 View', 'url': 'https://example.com/'}
+        keyboard = [
+            [url_button] + status_buttons(self.order_id, 'pending_payment', compact=True),
+            status_buttons(other, 'pending_payment', compact=True),
+        ]
+        rows = replace_status_buttons(keyboard, self.order_id, 'confirmed')
+        self.assertEqual(rows[0], [url_button] + status_buttons(self.order_id, 'confirmed', compact=True))
+        self.assertEqual(rows[1], keyboard[1])
+        # No buttons left for a finished order
+        self.assertEqual(replace_status_buttons(keyboard[1:], other, 'cancelled'), [])
+
+
+class TelegramWebhookTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        WebsiteSettings.objects.create(
+            telegram_bot_token='token', telegram_chat_id='42', telegram_webhook_secret='s3cret',
+        )
+        self.order = create_order()
+        # Stub the Bot API
+        self.api = self.enterContext(mock.patch('requests.post', return_value=mock.Mock(status_code=200)))
+
+    def post(self, update, secret='s3cret'):
+        return self.client.post(
+            reverse('telegram_webhook'), json.dumps(update), content_type='application/json',
+            headers={'X-Telegram-Bot-Api-Secret-Token': secret},
+        )
+
+    def tap(self, new_status, chat_id=42):
+        return self.post({'callback_query': {
+            'id': 'cb1',
+            'from': {'username': 'leena'},
+            'data': f'status:{self.order.order_id}:{new_status}',
+            'message': {
+                'message_id': 7,
+                'chat': {'id': chat_id},
+                'text': 'New order',
+                'reply_markup': {'inline_keyboard': [status_buttons(self.order.order_id, 'pending_payment')]},
+            },
+        }})
+
+    def status(self):
+        self.order.refresh_from_db()
+        return self.order.status
+
+    def test_secret_token_is_required(self):
+        self.assertEqual(self.post({}, secret='').status_code, 403)
+        self.assertEqual(self.post({}, secret='wrong').status_code, 403)
+
+    def test_malformed_updates(self):
+        self.assertEqual(self.post([1, 2]).status_code, 400)
+        self.assertEqual(self.post('update').status_code, 400)
+        self.assertEqual(self.post({'message': {'text': 'hi'}}).json(), {})
+        self.assertEqual(self.post({'callback_query': 'x'}).json(), {})
+        response = self.post({'callback_query': {'id': 'cb1', 'data': 5, 'message': {'chat': {'id': 42}}}})
+        self.assertEqual(response.json()['text'], 'Unknown action')
+
+    def test_other_chat_is_not_allowed(self):
+        response = self.tap('confirmed', chat_id=99)
+        self.assertEqual(response.json()['text'], 'Not allowed')
+        self.assertEqual(self.status(), 'pending_payment')
+        self.api.assert_not_called()
+
+    def test_tap_changes_status_and_edits_message(self):
+        with self.assertLogs('app.utils', 'INFO'):
+            response = self.tap('confirmed')
+        self.assertEqual(response.json(), {
+            'method': 'answerCallbackQuery', 'callback_query_id': 'cb1', 'text': 'Order Confirmed ✓',
+        })
+        self.assertEqual(self.status(), 'confirmed')
+        url, = self.api.call_args.args
+        self.assertTrue(url.endswith('/editMessageText'))
+        self.assertTrue(self.api.call_args.kwargs['json']['text'].endswith('Order Confirmed by leena'))
+
+    def test_stale_button_does_not_undo_later_change(self):
+        Order.objects.filter(pk=self.order.pk).update(status='completed')
+        with self.assertLogs('app.utils', 'INFO'):
+            response = self.tap('cancelled')
+        self.assertEqual(response.json()['text'], 'Already: Completed')
+        self.assertEqual(self.status(), 'completed')
+
+    def test_concurrent_change_wins_the_compare_and_set(self):
+        now = timezone.now
+
+        def change_first():
+            # Runs between the status read and the UPDATE
+            Order.objects.filter(pk=self.order.pk).update(status='cancelled')
+            return now()
+
+        with mock.patch('django.utils.timezone.now', side_effect=change_first), \
+                self.assertLogs('app.utils', 'INFO'):
+            response = self.tap('confirmed')
+        self.assertEqual(response.json()['text'], 'Already: Cancelled')
+        self.assertEqual(self.status(), 'cancelled')
+
+
+class OrderEventStreamTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = create_staff()
+
+    def test_events_are_read_in_order_and_gaps_force_resync(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            events.publish('order_created', {'order_id': 'a'})
+            events.publish('status_changed', {'order_id': 'a'})
+        self.assertEqual([e['type'] for e in events.events_since(0)], ['order_created', 'status_changed'])
+        self.assertEqual(events.events_since(2), [])
+
+        cache.delete(events.EVENT_KEY.format(1))
+        self.assertIsNone(events.events_since(0))
+
+        # A subscriber ahead of the sequence saw ids from before a reset
+        self.assertIsNone(events.events_since(5))
+
+    def test_stream_sends_events_after_since(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            events.publish('order_created', {'order_id': 'a'})
+            events.publish('order_created', {'order_id': 'b'})
+        self.client.force_login(self.staff)
+        with mock.patch.multiple(admin_views, EVENT_STREAM_SECONDS=0.05, EVENT_POLL_INTERVAL=0.01):
+            response = self.client.get(reverse('admin_order_events'), {'since': 1})
+            body = b''.join(response.streaming_content).decode()
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertIn('id: 2\nevent: order_created\ndata: {"order_id": "b"}', body)
+        self.assertNotIn('"a"', body)
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_count_is_cached_per_query(self):
+        User.objects.create_user('a')
+        self.assertEqual(EstimatedCountPaginator(User.objects.order_by('pk'), 10).count, 1)
+
+        User.objects.create_user('b')
+        self.assertEqual(EstimatedCountPaginator(User.objects.order_by('pk'), 10).count, 1)
+        self.assertEqual(EstimatedCountPaginator(User.objects.filter(username='b').order_by('pk'), 10).count, 1)
+        self.assertEqual(EstimatedCountPaginator(User.objects.exclude(username='zz').order_by('pk'), 10).count, 2)
+
+    def test_order_changelist_queries_dont_grow_with_rows(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='pw'))
+        url = reverse('admin:app_order_changelist')
+
+        def queries():
+            cache.clear()  # the cached count would save a query the second time
+            with CaptureQueriesContext(connection) as captured:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            return len(captured)
+
+        def add_orders(count):
+            for _ in range(count):
+                create_order()
+
+        add_orders(2)
+        baseline = queries()
+        add_orders(5)
+        self.assertEqual(queries(), baseline)
+
+    def test_plain_lists_are_counted(self):
+        self.assertEqual(EstimatedCountPaginator([1, 2, 3], 2).count, 3)
+
+
+class SingleFlightTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_value_is_computed_once_and_cached(self):
+        calls = []
+        compute = lambda: calls.append(1) or len(calls)
+        self.assertEqual(get_or_compute('sf', compute, 60), 1)
+        self.assertEqual(get_or_compute('sf', compute, 60), 1)
+        self.assertEqual(len(calls), 1)
+
+    def test_stale_value_served_while_another_caller_rebuilds(self):
+        cache.set('sf', ('old', 0), 60)
+        cache.add('sf:rebuild', 1)
+        self.assertEqual(get_or_compute('sf', lambda: 'new', 60), 'old')
+
+        cache.delete('sf:rebuild')
+        self.assertEqual(get_or_compute('sf', lambda: 'new', 60), 'new')
+
+
+class CatalogSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.product = create_product()
+
+    def test_saves_bump_the_version_and_updates_wait_for_max_age(self):
+        self.assertEqual(get_catalog().prices[self.product.id], Decimal('250'))
+
+        self.product.base_price = Decimal('300')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        self.assertEqual(get_catalog().prices[self.product.id], Decimal('300'))
+
+        # update() sends no signal: only the snapshot's age catches it
+        Product.objects.filter(pk=self.product.pk).update(base_price=Decimal('350'))
+        self.assertEqual(get_catalog().prices[self.product.id], Decimal('300'))
+        with override_settings(CATALOG_SNAPSHOT_MAX_AGE=0):
+            self.assertEqual(get_catalog().prices[self.product.id], Decimal('350'))
+
+
+class UpiQrTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        WebsiteSettings.objects.create(upi_id='shop@upi')
+        self.url = reverse('upi_qr')
+
+    def test_second_request_is_served_from_cache(self):
+        with mock.patch.object(views_qr, 'generate_qr_image_bytes', wraps=views_qr.generate_qr_image_bytes) as generate:
+            first = self.client.get(self.url, {'amount': '250'})
+            second = self.client.get(self.url, {'amount': '250'})
+        self.assertEqual(first['Content-Type'], 'image/png')
+        self.assertEqual(second.content, first.content)
+        generate.assert_called_once()
+
+    @override_settings(RATE_LIMITS={'upi_qr': (3, 60)})
+    def test_rate_limited_after_the_configured_requests(self):
+        for _ in range(3):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+
+    def test_generation_error_is_a_500_without_details(self):
+        with mock.patch.object(views_qr, 'generate_qr_image_bytes', side_effect=OSError('/srv/fonts missing')), \
+                self.assertLogs('app.views_qr', 'ERROR'):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 500)
+        self.assertNotIn(b'/srv/fonts', response.content)
+
+
+class PriceTableTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.product = create_product()
+
+    def get(self, **headers):
+        return self.client.get(reverse('price_table'), headers=headers)
+
+    def test_etag_revalidates_to_304(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['prices'], {str(self.product.id): '250.00'})
+
+        revalidated = self.get(if_none_match=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.content, b'')
+
+    @override_settings(PRICE_TABLE_MAX_AGE=120)
+    def test_cache_control(self):
+        response = self.get()
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('max-age=120', response['Cache-Control'])
+
+    def test_quote_and_malformed_items(self):
+        url = reverse('price_table')
+        response = self.client.get(url, {'items': f'{self.product.id}:3'})
+        self.assertEqual(response.json()['total'], '750.00')
+        for items in ['abc', f'{self.product.id}:x', '1:2:3']:
+            response = self.client.get(url, {'items': items})
+            self.assertEqual(response.status_code, 400, items)
+            self.assertFalse(response.json()['success'])
+
+    def test_price_change_changes_etag(self):
+        etag = self.get()['ETag']
+        self.product.base_price = Decimal('300')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+
+        response = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['prices'][str(self.product.id)], '300.00')
+
+
+class ActiveBannerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now()
+
+    def _banner(self, title, starts=None, ends=None, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Banner.objects.create(
+                title=title, image='banners/b.png',
+                starts_at=starts and self.now + timedelta(hours=starts),
+                ends_at=ends and self.now + timedelta(hours=ends),
+                **fields,
+            )
+
+    def _titles(self):
+        return sorted(banner.title for banners in active_banners().values() for banner in banners)
+
+    def test_only_scheduled_active_banners_are_shown(self):
+        self._banner('always')
+        self._banner('running', starts=-1, ends=1)
+        self._banner('ended', starts=-2, ends=-1)
+        self._banner('upcoming', starts=1)
+        self._banner('off', is_active=False)
+
+        self.assertEqual(self._titles(), ['always', 'running'])
+
+    def test_cache_expires_at_next_start_or_end(self):
+        self._banner('running', ends=3)
+        self._banner('upcoming', starts=2)
+        active_banners()
+        expires_at, _ = cache.get(BANNERS_CACHE_KEY)
+        self.assertAlmostEqual(expires_at - time.time(), 2 * 3600, delta=5)
+
+        with override_settings(BANNER_CACHE_SECONDS=60):
+            cache.clear()
+            active_banners()
+            expires_at, _ = cache.get(BANNERS_CACHE_KEY)
+            self.assertAlmostEqual(expires_at - time.time(), 60, delta=5)
+
+    def test_saving_or_deleting_a_banner_clears_the_cache(self):
+        self.assertEqual(self._titles(), [])
+        banner = self._banner('new')
+        self.assertEqual(self._titles(), ['new'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            banner.delete()
+        self.assertEqual(self._titles(), [])
+
+    def test_form_rejects_end_before_start(self):
+        form = BannerForm({
+            'title': 'Sale', 'banner_type': 'promotion', 'order': 0,
+            'starts_at': '2026-05-02T10:00', 'ends_at': '2026-05-01T10:00',
+        })
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors['ends_at'], ['The end must be after the start.'])
+
+
+class CatalogApiFieldsTests(TestCase):
+    def test_fields_projection(self):
+        factory = RequestFactory()
+        self.assertEqual(_fields(factory.get('/'), PRODUCT_FIELDS), PRODUCT_FIELDS)
+        self.assertEqual(_fields(factory.get('/', {'fields': 'name, base_price'}), PRODUCT_FIELDS), ['name', 'base_price'])
+        with self.assertRaises(BadRequest):
+            _fields(factory.get('/', {'fields': 'name,telegram_bot_token'}), PRODUCT_FIELDS)
+
+    def test_invalid_parameters_are_rejected(self):
+        cache.clear()
+        products = reverse('api_products')
+        for params in [{'cursor': '-1'}, {'cursor': 'abc'}, {'limit': '0'}]:
+            response = self.client.get(products, params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertFalse(response.json()['success'])
+        self.assertEqual(self.client.get(products, {'cursor': '0'}).status_code, 200)
+
+        banners = reverse('api_banners')
+        response = self.client.get(banners, {'type': 'popup'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('hero', response.json()['error'])
+        self.assertEqual(self.client.get(banners, {'type': 'hero'}).json()['results'], [])
+
+
+class OrderPageQueryTests(TestCase):
+    """The order pages run a fixed number of queries however many items there are"""
+
+    def setUp(self):
+        cache.clear()
+        self.order = create_order(email='asha@example.com')
+        # bulk_create skips the screenshot hashing in save()
+        PaymentProof.objects.bulk_create([PaymentProof(order=self.order, screenshot='payment_proofs/p.png')])
+        self.add_items(1)
+
+    def add_items(self, count):
+        for i in range(count):
+            product = create_product(f'Mug {i}', '100', customization_type='both')
+            ProductImage.objects.create(product=product, image=f'products/{i}.png', is_primary=True)
+            create_item(self.order, product, custom_text='Hi', custom_image=f'customizations/{i}.png')
+
+    def assertQueriesPerPage(self, expected, fetch):
+        for _ in range(2):
+            with self.assertNumQueries(expected):
+                self.assertEqual(fetch().status_code, 200)
+            self.add_items(4)
+
+    def test_order_confirmation(self):
+        url = reverse('order_confirmation', args=[self.order.order_id])
+        self.assertQueriesPerPage(4, lambda: self.client.get(url))
+
+    def test_admin_order_detail(self):
+        self.client.force_login(create_staff())
+        url = reverse('admin_order_detail', args=[self.order.order_id])
+        # The session comes from the cache; the extra query loads the user
+        self.assertQueriesPerPage(5, lambda: self.client.get(url))
+
+    def test_track_order(self):
+        url = reverse('track_order')
+        # Archived orders are looked up too
+        self.assertQueriesPerPage(5, lambda: self.client.post(url, {'tracking_info': '9876543210'}))
+
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        self.staff = create_staff()
+        self.order = create_order('1000')
+        create_item(self.order, create_product('Mug', '250'), quantity=2, custom_text='Happy birthday')
+        create_item(self.order, create_product('Shirt', '500'))
+        create_order('0', full_name='Ravi', mobile_number='9123456780', delivery_address='Goa', status='cancelled')
+
+    def export(self, **params):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('admin_orders_export'), params)
+        self.assertEqual(response.status_code, 200)
+        body = b''.join(response.streaming_content).decode('utf-8-sig')
+        return list(csv.reader(body.splitlines()))
+
+    def test_one_row_per_item_under_the_header(self):
+        rows = self.export(search='Asha')
+        self.assertEqual(rows[0], [label for label, _ in ORDER_EXPORT_COLUMNS])
+        products = rows[0].index('Product')
+        self.assertEqual(sorted(row[products] for row in rows[1:]), ['Mug', 'Shirt'])
+        self.assertEqual({row[0] for row in rows[1:]}, {str(self.order.order_id)})
+        self.assertIn('Happy birthday', rows[1] + rows[2])
+
+    def test_order_without_items_gets_one_row(self):
+        rows = self.export(status='cancelled')
+        self.assertEqual(len(rows), 2)
+        header, row = rows
+        self.assertEqual(row[header.index('Customer Name')], 'Ravi')
+        self.assertEqual(row[header.index('Product')], '')
+        self.assertEqual(row[header.index('Quantity')], '')
+
+    def test_filters(self):
+        self.assertEqual(len(self.export(status='cancelled')), 2)
+        self.assertEqual(len(self.export(search='Asha')), 3)
+        today = timezone.localdate()
+        self.assertEqual(len(self.export(date_from=str(today + timedelta(days=1)))), 1)
+        self.assertEqual(len(self.export(date_from=str(today), date_to=str(today))), 4)
+
+    def test_impossible_date_is_rejected(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('admin_orders_export'), {'date_from': '2024-02-30'})
+        self.assertEqual(response.status_code, 400)
+
+
+class OrderStatusUpdateTests(TestCase):
+    def setUp(self):
+        self.client.force_login(create_staff())
+        self.pending, self.confirmed, self.completed = (
+            create_order(status=status) for status in ['pending_payment', 'confirmed', 'completed']
+        )
+
+    def post(self, name, data):
+        return self.client.post(reverse(name), json.dumps(data), content_type='application/json').json()
+
+    def status(self, order):
+        order.refresh_from_db()
+        return order.status
+
+    def test_single_update_follows_transitions(self):
+        data = self.post('admin_update_order_status', {'order_id': str(self.completed.order_id), 'status': 'pending_payment'})
+        self.assertFalse(data['success'])
+        self.assertEqual(self.status(self.completed), 'completed')
+
+        data = self.post('admin_update_order_status', {'order_id': str(self.pending.order_id), 'status': 'confirmed'})
+        self.assertTrue(data['success'])
+        self.assertEqual(self.status(self.pending), 'confirmed')
+
+    def test_malformed_bodies_are_rejected(self):
+        order_id = str(self.pending.order_id)
+        for name, body in [
+            ('admin_update_order_status', {'order_id': order_id, 'status': ['confirmed']}),
+            ('admin_update_order_status', {'order_id': order_id}),
+            ('admin_bulk_update_order_status', {'order_ids': order_id, 'status': 'confirmed'}),
+            ('admin_bulk_update_order_status', {'order_ids': [[order_id]], 'status': 'confirmed'}),
+        ]:
+            self.assertFalse(self.post(name, body)['success'], body)
+
+        # A well-formed bulk request reports a bad status per order
+        data = self.post('admin_bulk_update_order_status', {'order_ids': [order_id], 'status': {'a': 1}})
+        self.assertEqual(data['results'][order_id], {'success': False, 'error': 'Invalid status'})
+        self.assertEqual(self.status(self.pending), 'pending_payment')
+
+    def test_bulk_results_per_order(self):
+        missing = '11111111-2222-3333-4444-555555555555'
+        changes = {
+            str(self.pending.order_id): 'confirmed',
+            str(self.confirmed.order_id): 'in_progress',
+            str(self.completed.order_id): 'cancelled',
+            missing: 'confirmed',
+            'not-a-uuid': 'confirmed',
+        }
+        data = self.post('admin_bulk_update_order_status', {
+            'updates': [{'order_id': k, 'status': v} for k, v in changes.items()],
+        })
+        self.assertEqual((data['updated'], data['failed']), (2, 3))
+        self.assertEqual(data['results'][str(self.pending.order_id)], {'success': True, 'status': 'confirmed'})
+        self.assertEqual(data['results'][missing]['error'], 'Order not found')
+        self.assertEqual(data['results']['not-a-uuid']['error'], 'Invalid order ID')
+        self.assertFalse(data['results'][str(self.completed.order_id)]['success'])
+        self.assertEqual(self.status(self.confirmed), 'in_progress')
+        self.assertEqual(self.status(self.completed), 'completed')
+
+    def test_bulk_queries_dont_grow_with_orders(self):
+        changes = {order.order_id: 'cancelled' for order in [self.pending, self.confirmed]}
+        # SAVEPOINT, current statuses, one UPDATE per target status,
+        # payment proofs, RELEASE
+        with self.assertNumQueries(5):
+            Order.objects.bulk_set_status(changes)
+
+
+class OrderArchiveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.product = create_product('Photo Mug', '250')
+        self.order = create_order('500', status='completed')
+        create_item(self.order, self.product, quantity=2, custom_text='Happy birthday')
+        self.live = create_order('250')
+
+    def test_archive_batch_moves_finished_orders(self):
+        self.assertEqual(archive_batch([self.order.pk, self.live.pk]), 1)
+        self.assertEqual(list(Order.objects.values_list('pk', flat=True)), [self.live.pk])
+
+        archived = ArchivedOrder.objects.with_full_detail().get(order_id=self.order.order_id)
+        item, = archived.items.all()
+        self.assertEqual((item.product_name, item.quantity, item.customization.custom_text), ('Photo Mug', 2, 'Happy birthday'))
+        self.assertEqual(archived.created_at, self.order.created_at)
+
+    def test_archived_items_keep_their_product_name(self):
+        archive_batch([self.order.pk])
+        self.product.delete()
+
+        response = self.client.post(reverse('track_order'), {'tracking_info': '9876543210'})
+        self.assertContains(response, 'Photo Mug')
+
+        self.client.force_login(create_staff())
+        response = self.client.get(reverse('admin_order_detail', args=[self.order.order_id]))
+        self.assertContains(response, 'Photo Mug')
+
+
+class SweepSessionsTests(TestCase):
+    def test_only_expired_sessions_are_deleted(self):
+        now = timezone.now()
+        for key, expires in [('old1', -2), ('old2', -1), ('live', 1)]:
+            Session.objects.create(session_key=key, session_data='', expire_date=now + timedelta(days=expires))
+
+        out = io.StringIO()
+        call_command('sweep_sessions', '--batch-size', '1', '--pause', '0', stdout=out)
+
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['live'])
+        self.assertIn('Deleted 2 sessions', out.getvalue())
+
+
+class CheckoutTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.notify = self.enterContext(mock.patch('app.views._notify_new_order'))
+        self.logs = self.enterContext(self.assertLogs('app.views', 'INFO'))
+        self.mug = create_product('Mug', '250')
+        self.frame = create_product('Frame', '800')
+
+    def _image(self, color='white'):
+        return SimpleUploadedFile('image.png', png(color, size=(40, 80)), content_type='image/png')
+
+    def _checkout_data(self, key, **extra):
+        return {
+            'full_name': 'Asha', 'mobile_number': '9876543210', 'delivery_address': 'Pune',
+            'screenshot': self._image(), 'idempotency_key': key, **extra,
+        }
+
+    def _counts(self):
+        return [model.objects.count() for model in [Order, OrderItem, CustomizationDetails, PaymentProof, IdempotencyKey]]
+
+    def test_cart_checks_out_into_one_order(self):
+        self.client.post(reverse('add_to_cart', args=[self.mug.id]), {'quantity': 2, 'custom_text': 'Asha'})
+        self.client.post(reverse('add_to_cart', args=[self.frame.id]), {'quantity': 1, 'custom_image': self._image('red')})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('cart_checkout'), self._checkout_data('a' * 32))
+
+        order = Order.objects.get()
+        self.assertRedirects(response, reverse('order_confirmation', args=[order.order_id]))
+        self.assertEqual(order.total_amount, Decimal('1300'))
+        items = {item.product_id: item for item in order.items.select_related('customization')}
+        self.assertEqual((items[self.mug.id].quantity, items[self.mug.id].total_price), (2, Decimal('500')))
+        self.assertEqual(items[self.mug.id].customization.custom_text, 'Asha')
+        self.assertTrue(items[self.frame.id].customization.custom_image.name)
+        self.assertTrue(order.payment_proof.screenshot)
+        self.notify.assert_called_once()
+        self.assertEqual(self.client.session['cart'], [])
+
+    def test_replayed_key_redirects_to_the_original_order(self):
+        key = 'b' * 32
+        url = reverse('create_order', args=[self.mug.id])
+        data = {'quantity': 1, 'custom_text': 'Asha'}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {**data, **self._checkout_data(key)})
+        order = Order.objects.get()
+        counts = self._counts()
+
+        for replay_url in [url, reverse('cart_checkout')]:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(replay_url, {**data, **self._checkout_data(key, upi_transaction_id='UTR1')})
+            self.assertRedirects(response, reverse('order_confirmation', args=[order.order_id]))
+        self.assertEqual(self._counts(), counts)
+        self.notify.assert_called_once()
+
+    def test_notification_waits_for_commit(self):
+        url = reverse('create_order', args=[self.mug.id])
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post(url, {'quantity': 1, 'custom_text': 'Asha', **self._checkout_data('c' * 32)})
+            self.notify.assert_not_called()
+        for callback in callbacks:
+            callback()
+        self.notify.assert_called_once()
+
+
+class TelegramDigestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.settings = SimpleNamespace(
+            enable_telegram_notifications=True, telegram_bot_token='token', telegram_chat_id='1',
+            website_url='https://shop.example',
+        )
+        self.orders = [create_order(full_name=name) for name in ['<b>Asha</b> & co', 'Ravi']]
+
+    def _queue(self):
+        with self.assertLogs('app.utils', 'INFO'), self.captureOnCommitCallbacks(execute=True):
+            for order in self.orders:
+                utils.queue_order_notification(order)
+
+    def test_customer_fields_are_escaped(self):
+        message = format_order_digest(self.orders)
+        self.assertIn('&lt;b&gt;Asha&lt;/b&gt; &amp; co', message)
+        self.assertNotIn('<b>Asha', message)
+
+    def test_rejected_digest_is_dropped_not_requeued(self):
+        with mock.patch('threading.Timer'):
+            self._queue()
+        rejected = utils.TelegramRejected(400, 'Bad Request: can\'t parse entities')
+        with mock.patch.object(utils, '_post_to_telegram', side_effect=rejected) as post, \
+                self.assertLogs('app.utils', 'ERROR'):
+            self.assertEqual(utils.flush_notification_digest(self.settings), 0)
+        post.assert_called_once()
+
+        with mock.patch.object(utils, '_post_to_telegram') as post:
+            self.assertEqual(utils.flush_notification_digest(self.settings), 0)
+        post.assert_not_called()
+
+    def test_failed_digest_stays_queued(self):
+        with mock.patch('threading.Timer'):
+            self._queue()
+        with mock.patch.object(utils, '_post_to_telegram', return_value=False):
+            self.assertEqual(utils.flush_notification_digest(self.settings), 0)
+        with mock.patch.object(utils, '_post_to_telegram', return_value=True):
+            self.assertEqual(utils.flush_notification_digest(self.settings), 2)
+
+    def test_throttled_order_is_sent_by_cron_flush(self):
+        WebsiteSettings.objects.create(
+            enable_telegram_notifications=True, telegram_bot_token='token', telegram_chat_id='1',
+        )
+        # The worker's flush timer never fires, as if the worker had exited
+        with mock.patch('threading.Timer'), \
+                mock.patch.object(utils, '_post_to_telegram', side_effect=utils.TelegramThrottled(5)), \
+                self.assertLogs('app.utils', 'INFO'), self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(utils.send_telegram_notification_with_buttons(self.orders[0]))
+
+        out = io.StringIO()
+        with mock.patch.object(utils, '_post_to_telegram', return_value=True) as post:
+            call_command('flush_telegram_digest', stdout=out)
+        post.assert_called_once()
+        self.assertIn('1 queued orders sent', out.getvalue())
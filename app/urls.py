@@ -1,6 +1,6 @@
 from django.urls import path
 from django.contrib.auth import views as auth_views
-from . import views, admin_views, views_qr
+from . import views, admin_views, views_qr, views_api
 
 urlpatterns = [
     # Main pages
@@ -13,6 +13,12 @@ urlpatterns = [
     path('payment/<uuid:order_id>/', views.payment_view, name='payment'),
     path('confirmation/<uuid:order_id>/', views.order_confirmation, name='order_confirmation'),
     
+    # Cart
+    path('cart/', views.view_cart, name='view_cart'),
+    path('cart/add/<int:product_id>/', views.add_to_cart, name='add_to_cart'),
+    path('cart/remove/<int:index>/', views.remove_from_cart, name='remove_from_cart'),
+    path('cart/checkout/', views.cart_checkout, name='cart_checkout'),
+    
     # Order tracking
     path('track-order/', views.track_order, name='track_order'),
     
@@ -20,10 +26,13 @@ urlpatterns = [
     path('admin-portal/', admin_views.admin_login_view, name='admin_login'),
     path('admin-portal/logout/', admin_views.admin_logout_view, name='admin_logout'),
     path('admin-portal/dashboard/', admin_views.admin_dashboard, name='admin_dashboard'),
+    path('admin-portal/dashboard/events/', admin_views.admin_order_events, name='admin_order_events'),
     path('admin-portal/orders/', admin_views.admin_orders, name='admin_orders'),
+    path('admin-portal/orders/export/', admin_views.admin_orders_export, name='admin_orders_export'),
     path('admin-portal/orders/<uuid:order_id>/', admin_views.admin_order_detail, name='admin_order_detail'),
     path('admin-portal/products/', admin_views.admin_products, name='admin_products'),
     path('admin-portal/products/add/', admin_views.admin_product_add, name='admin_product_add'),
+    path('admin-portal/products/import/', admin_views.admin_product_import, name='admin_product_import'),
     path('admin-portal/products/<int:product_id>/edit/', admin_views.admin_product_edit, name='admin_product_edit'),
     path('admin-portal/products/<int:product_id>/delete/', admin_views.admin_product_delete, name='admin_product_delete'),
     path('admin-portal/settings/', admin_views.admin_settings, name='admin_settings'),
@@ -34,8 +43,17 @@ urlpatterns = [
     path('admin-portal/banners/<int:banner_id>/edit/', admin_views.admin_banner_edit, name='admin_banner_edit'),
     path('admin-portal/banners/<int:banner_id>/delete/', admin_views.admin_banner_delete, name='admin_banner_delete'),
     path('admin-portal/analytics/', admin_views.admin_analytics, name='admin_analytics'),
+    path('admin-portal/profiles/<str:profile_id>/', admin_views.admin_profile_detail, name='admin_profile_detail'),
+    
+    # Telegram bot webhook
+    path('telegram/webhook/', views.telegram_webhook, name='telegram_webhook'),
     
     # AJAX
     path('api/calculate-price/', views.calculate_price, name='calculate_price'),
+    path('api/prices/', views.price_table, name='price_table'),
+    path('api/catalog/products/', views_api.api_products, name='api_products'),
+    path('api/catalog/banners/', views_api.api_banners, name='api_banners'),
+    path('api/catalog/settings/', views_api.api_settings, name='api_settings'),
     path('api/admin/update-order-status/', admin_views.admin_update_order_status, name='admin_update_order_status'),
+    path('api/admin/bulk-update-order-status/', admin_views.admin_bulk_update_order_status, name='admin_bulk_update_order_status'),
 ]
\ No newline at end of file
@@ -1,6 +1,20 @@
+import html
+import logging
+import threading
+import time
+import uuid
 from io import BytesIO
 from datetime import datetime
+from django.conf import settings as django_settings
+from django.core.cache import cache
 from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .ratelimit import TokenBucket
+
+
+logger = logging.getLogger(__name__)
 
 
 def generate_qr_image_bytes(data):
@@ -36,7 +50,7 @@ def send_telegram_notification(message, settings=None):
     try:
         import requests
     except ImportError:
-        print("❌ requests library not installed. Run: pip install requests")
+        logger.error("requests library not installed. Run: pip install requests")
         return False
     
     if settings is None:
@@ -44,49 +58,131 @@ def send_telegram_notification(message, settings=None):
         try:
             settings = WebsiteSettings.objects.get()
         except WebsiteSettings.DoesNotExist:
-            print("❌ WebsiteSettings not found")
+            logger.error("WebsiteSettings not found")
             return False
     
     # Check if Telegram notifications are enabled
     if not settings.enable_telegram_notifications:
-        print("⚠️ Telegram notifications are disabled in settings")
+        logger.info("Telegram notifications are disabled in settings")
         return False
     
     if not settings.telegram_bot_token:
-        print("❌ Telegram Bot Token is not configured")
+        logger.warning("Telegram Bot Token is not configured")
         return False
         
     if not settings.telegram_chat_id:
-        print("❌ Telegram Chat ID is not configured")
+        logger.warning("Telegram Chat ID is not configured")
         return False
     
     try:
-        url = f"https://api.telegram.org/bot{settings.telegram_bot_token}/sendMessage"
-        data = {
+        return _post_to_telegram(settings, {
             'chat_id': settings.telegram_chat_id,
             'text': message,
             'parse_mode': 'HTML'
-        }
+        })
+    except TelegramThrottled as e:
+        logger.warning("Telegram rate limit: retry in %ss", e.retry_after)
+        return False
+    except TelegramRejected:
+        return False  # logged by _post_to_telegram
+    except requests.exceptions.RequestException as e:
+        logger.warning("Network error sending Telegram notification: %s", e)
+        return False
+    except Exception:
+        logger.exception("Unexpected error sending Telegram notification")
+        return False
+
+
+class TelegramThrottled(Exception):
+    """Telegram can't take another message for longer than the caller may wait"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class TelegramRejected(Exception):
+    """Telegram refused the call itself (4xx other than 429); resending it won't help"""
+
+    def __init__(self, status_code, description):
+        super().__init__(f"{status_code}: {description}")
+        self.status_code = status_code
+
+
+def _telegram_bucket(chat_id):
+    """Per-chat token bucket shared by every worker through the cache"""
+    return TokenBucket(
+        f"telegram:{chat_id}",
+        rate=getattr(django_settings, 'TELEGRAM_MESSAGES_PER_SECOND', 1),
+        capacity=getattr(django_settings, 'TELEGRAM_BURST', 1),
+    )
+
+
+def telegram_api_url(settings, method):
+    """Bot API URL for a method; TELEGRAM_API_BASE can point at a local stub"""
+    base = getattr(django_settings, 'TELEGRAM_API_BASE', 'https://api.telegram.org').rstrip('/')
+    return f"{base}/bot{settings.telegram_bot_token}/{method}"
+
+
+def _post_to_telegram(settings, data, max_wait=None, log_extra=None, method='sendMessage'):
+    """
+    POST a Bot API call (sendMessage by default) through the chat's rate
+    limiter.
+    
+    Waits up to max_wait seconds (default TELEGRAM_MAX_WAIT) for a token.
+    A 429 reply pauses the bucket for every worker for its retry_after and
+    the message is retried once if that fits within max_wait.
+    
+    Returns:
+        bool: True if Telegram accepted the message, False on a server or
+        other transient error
+    
+    Raises:
+        TelegramThrottled: if the message could not be sent within max_wait
+        TelegramRejected: if Telegram rejected the request (bad markup,
+            unknown chat, bot blocked), so it should not be retried
+    """
+    import requests
+    
+    if max_wait is None:
+        max_wait = getattr(django_settings, 'TELEGRAM_MAX_WAIT', 5)
+    log_extra = log_extra or {}
+    bucket = _telegram_bucket(settings.telegram_chat_id)
+    url = telegram_api_url(settings, method)
+    
+    for attempt in range(2):
+        if not bucket.acquire(max_wait):
+            raise TelegramThrottled(max_wait)
         
-        print(f"📤 Sending Telegram notification to chat {settings.telegram_chat_id}...")
-        response = requests.post(url, data=data, timeout=10)
+        start = time.perf_counter()
+        response = requests.post(url, json=data, timeout=10)
+        duration_ms = round((time.perf_counter() - start) * 1000, 3)
         
         if response.status_code == 200:
-            print(f"✅ Telegram notification sent successfully!")
+            logger.info("Telegram %s sent", method, extra={**log_extra, 'duration_ms': duration_ms})
             return True
-        else:
-            print(f"❌ Telegram API error: {response.status_code}")
-            print(f"   Response: {response.text}")
-            return False
-            
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Network error sending Telegram notification: {e}")
-        return False
-    except Exception as e:
-        print(f"❌ Unexpected error sending Telegram notification: {e}")
-        import traceback
-        traceback.print_exc()
+        
+        if response.status_code == 429:
+            try:
+                retry_after = int(response.json()['parameters']['retry_after'])
+            except (ValueError, KeyError, TypeError):
+                retry_after = 1
+            bucket.pause(retry_after)
+            logger.warning("Telegram rate limited", extra={**log_extra, 'retry_after': retry_after})
+            if attempt == 0 and retry_after <= max_wait:
+                continue
+            raise TelegramThrottled(retry_after)
+        
+        logger.warning("Telegram API error", extra={
+            **log_extra,
+            'status_code': response.status_code,
+            'response_body': response.text,
+            'duration_ms': duration_ms,
+        })
+        if 400 <= response.status_code < 500:
+            raise TelegramRejected(response.status_code, response.text)
         return False
+    return False
 
 
 def format_order_notification(order):
@@ -102,7 +198,7 @@ def format_order_notification(order):
     items_text = ""
     for item in order.items.all():
         # Basic item info
-        items_text += f"\n\n📦 <b>{item.product.name}</b>"
+        items_text += f"\n\n📦 <b>{html.escape(item.product.name)}</b>"
         items_text += f"\n   💰 ₹{item.unit_price} × {item.quantity} = ₹{item.total_price}"
         items_text += f"\n   🎨 Type: {item.product.get_customization_type_display()}"
         
@@ -113,7 +209,7 @@ def format_order_notification(order):
             
             # Custom text
             if custom.custom_text:
-                items_text += f"\n      📝 Text: <i>\"{custom.custom_text}\"</i>"
+                items_text += f"\n      📝 Text: <i>\"{html.escape(custom.custom_text)}\"</i>"
             
             # Custom image
             if custom.custom_image:
@@ -121,7 +217,7 @@ def format_order_notification(order):
             
             # Special notes
             if custom.notes:
-                items_text += f"\n      📌 Notes: <i>{custom.notes}</i>"
+                items_text += f"\n      📌 Notes: <i>{html.escape(custom.notes)}</i>"
     
     # Get payment proof URL if exists
     payment_proof_text = ""
@@ -139,6 +235,12 @@ def format_order_notification(order):
             payment_proof_text = f'\n\n💳 <a href="{screenshot_url}">View Payment Screenshot</a>'
         except:
             payment_proof_text = "\n\n✅ Payment proof uploaded"
+        
+        if order.payment_proof.duplicate_of_order_id:
+            payment_proof_text += (
+                f"\n⚠️ <b>Screenshot looks reused</b> from order "
+                f"<code>{order.payment_proof.duplicate_of_order_id}</code>"
+            )
     else:
         payment_proof_text = "\n\n⚠️ Payment proof pending"
     
@@ -148,16 +250,16 @@ def format_order_notification(order):
 📦 <b>Order ID:</b> <code>{order.order_id}</code>
 
 👤 <b>Customer Details:</b>
-   Name: {order.full_name}
-   📱 Phone: {order.mobile_number}
-   {f'📧 Email: {order.email}' if order.email else ''}
+   Name: {html.escape(order.full_name)}
+   📱 Phone: {html.escape(order.mobile_number)}
+   {f'📧 Email: {html.escape(order.email)}' if order.email else ''}
 
 🛍️ <b>Order Items:</b>{items_text}
 
 💰 <b>Total Amount: ₹{order.total_amount}</b>
 
 📍 <b>Delivery Address:</b>
-{order.delivery_address}
+{html.escape(order.delivery_address)}
 
 ⏰ <b>Order Time:</b> {order.created_at.astimezone().strftime('%d %b %Y, %I:%M %p IST')}{payment_proof_text}
 """
@@ -178,7 +280,7 @@ def send_telegram_notification_with_buttons(order, settings=None):
     try:
         import requests
     except ImportError:
-        print("❌ requests library not installed. Run: pip install requests")
+        logger.error("requests library not installed. Run: pip install requests")
         return False
     
     if settings is None:
@@ -186,23 +288,31 @@ def send_telegram_notification_with_buttons(order, settings=None):
         try:
             settings = WebsiteSettings.objects.get()
         except WebsiteSettings.DoesNotExist:
-            print("❌ WebsiteSettings not found")
+            logger.error("WebsiteSettings not found")
             return False
     
     # Check if Telegram notifications are enabled
     if not settings.enable_telegram_notifications:
-        print("⚠️ Telegram notifications are disabled in settings")
+        logger.info("Telegram notifications are disabled in settings")
         return False
     
     if not settings.telegram_bot_token:
-        print("❌ Telegram Bot Token is not configured")
+        logger.warning("Telegram Bot Token is not configured")
         return False
         
     if not settings.telegram_chat_id:
-        print("❌ Telegram Chat ID is not configured")
+        logger.warning("Telegram Chat ID is not configured")
         return False
     
+    if getattr(django_settings, 'TELEGRAM_DIGEST_WINDOW', 0):
+        queue_order_notification(order)
+        return True
+    
     try:
+        # Reload with items, products and proof joined/prefetched, so the
+        # message costs three queries rather than several per item
+        order = type(order).objects.with_full_detail().get(pk=order.pk)
+        
         # Format the message
         message = format_order_notification(order)
         
@@ -218,6 +328,9 @@ def send_telegram_notification_with_buttons(order, settings=None):
         # Create buttons
         buttons = []
         
+        # First row: one-tap status changes, handled by telegram_webhook
+        buttons.append(status_buttons(order.order_id, order.status))
+        
         # First row: WhatsApp
         if order.mobile_number:
             # WhatsApp button
@@ -249,7 +362,6 @@ def send_telegram_notification_with_buttons(order, settings=None):
             except:
                 pass
         
-        url = f"https://api.telegram.org/bot{settings.telegram_bot_token}/sendMessage"
         data = {
             'chat_id': settings.telegram_chat_id,
             'text': message,
@@ -258,23 +370,300 @@ def send_telegram_notification_with_buttons(order, settings=None):
                 'inline_keyboard': buttons
             }
         }
-        
-        print(f"📤 Sending Telegram notification with buttons to chat {settings.telegram_chat_id}...")
-        response = requests.post(url, json=data, timeout=10)
-        
-        if response.status_code == 200:
-            print(f"✅ Telegram notification sent successfully!")
-            return True
-        else:
-            print(f"❌ Telegram API error: {response.status_code}")
-            print(f"   Response: {response.text}")
-            return False
-            
+        return _post_to_telegram(settings, data, log_extra={'order_id': order.order_id})
+    
+    except TelegramThrottled:
+        # Too many messages right now: fold this order into the next digest
+        queue_order_notification(order)
+        return True
+    except TelegramRejected:
+        return False  # logged by _post_to_telegram
     except requests.exceptions.RequestException as e:
-        print(f"❌ Network error sending Telegram notification: {e}")
+        logger.warning("Network error sending Telegram notification: %s", e, extra={'order_id': order.order_id})
         return False
-    except Exception as e:
-        print(f"❌ Unexpected error sending Telegram notification: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Unexpected error sending Telegram notification", extra={'order_id': order.order_id})
         return False
+
+
+# Digest mode: orders are queued in the cache under increasing sequence
+# numbers and sent as one summary message per window
+DIGEST_SEQ_KEY = 'telegram:digest:seq'
+DIGEST_FLUSHED_KEY = 'telegram:digest:flushed'
+DIGEST_WINDOW_KEY = 'telegram:digest:window'
+DIGEST_LOCK_KEY = 'telegram:digest:lock'
+DIGEST_ITEM_KEY = 'telegram:digest:item:{}'
+DIGEST_MAX_ORDERS = 20  # per message, well inside Telegram's size and button limits
+
+
+def queue_order_notification(order):
+    """
+    Queue an order for the next digest message once the current
+    transaction commits. Used in digest mode and for orders throttled in
+    per-order mode. The first order of a window starts a timer that
+    flushes the digest when the window closes; the timer dies with its
+    worker, so `manage.py flush_telegram_digest` must also run from cron.
+    """
+    window = getattr(django_settings, 'TELEGRAM_DIGEST_WINDOW', 0) or 60
+    order_id = str(order.order_id)
+    
+    def enqueue():
+        cache.add(DIGEST_SEQ_KEY, 0, None)
+        seq = cache.incr(DIGEST_SEQ_KEY)
+        cache.set(DIGEST_ITEM_KEY.format(seq), order_id, None)
+        if cache.add(DIGEST_WINDOW_KEY, seq, window):
+            timer = threading.Timer(window, _flush_from_timer)
+            timer.daemon = True
+            timer.start()
+        logger.info("Order queued for Telegram digest", extra={'order_id': order_id, 'digest_seq': seq})
+    
+    transaction.on_commit(enqueue)
+
+
+def _flush_from_timer():
+    try:
+        flush_notification_digest()
+    except Exception:
+        logger.exception("Telegram digest flush failed")
+    finally:
+        connection.close()
+
+
+def format_order_digest(orders):
+    """One summary message for several orders"""
+    lines = [f"🔔 <b>{len(orders)} New Orders</b>", ""]
+    for order in orders:
+        item_count = sum(item.quantity for item in order.items.all())
+        line = (f"📦 <code>{str(order.order_id)[:8]}</code> {html.escape(order.full_name)} · "
+                f"{item_count} item{'s' if item_count != 1 else ''} · <b>₹{order.total_amount}</b>")
+        proof = getattr(order, 'payment_proof', None)
+        if proof is None:
+            line += " · ⚠️ no proof"
+        elif proof.duplicate_of_order_id:
+            line += " · ⚠️ reused screenshot"
+        lines.append(line)
+    lines.append("")
+    lines.append(f"💰 <b>Total: ₹{sum(order.total_amount for order in orders)}</b>")
+    return '\n'.join(lines)
+
+
+def digest_buttons(orders, settings):
+    """One row of buttons per order in a digest"""
+    domain = settings.website_url.rstrip('/') if settings.website_url else "http://localhost:8000"
+    is_localhost = 'localhost' in domain or '127.0.0.1' in domain
+    rows = []
+    for order in orders:
+        row = [] if is_localhost else [{
+            "text": f"🔍 {str(order.order_id)[:8]} · ₹{order.total_amount}",
+            "url": f"{domain}/admin-portal/orders/{order.order_id}/",
+        }]
+        rows.append(row + status_buttons(order.order_id, order.status, compact=True))
+    return rows
+
+
+def flush_notification_digest(settings=None):
+    """
+    Send everything queued since the last flush, DIGEST_MAX_ORDERS orders
+    per message. Messages go through the same rate limiter as single
+    notifications. Returns the number of orders sent.
+    """
+    from .models import Order, WebsiteSettings
+    
+    if not cache.add(DIGEST_LOCK_KEY, 1, 300):
+        return 0  # another worker is flushing
+    try:
+        settings = settings or WebsiteSettings.objects.first()
+        flushed = cache.get(DIGEST_FLUSHED_KEY, 0)
+        last = cache.get(DIGEST_SEQ_KEY, 0)
+        keys = [DIGEST_ITEM_KEY.format(seq) for seq in range(flushed + 1, last + 1)]
+        if not keys:
+            return 0
+        if not (settings and settings.enable_telegram_notifications and
+                settings.telegram_bot_token and settings.telegram_chat_id):
+            logger.info("Telegram digest dropped: notifications not configured", extra={'orders': len(keys)})
+            cache.set(DIGEST_FLUSHED_KEY, last, None)
+            cache.delete_many(keys)
+            return 0
+        
+        queued = cache.get_many(keys)
+        seqs = {queued[key]: seq for seq, key in enumerate(keys, start=flushed + 1) if key in queued}
+        orders = list(
+            Order.objects.filter(order_id__in=list(seqs))
+            .select_related('payment_proof').prefetch_related('items')
+        )
+        orders.sort(key=lambda order: seqs[str(order.order_id)])
+        
+        sent = 0
+        for start in range(0, len(orders), DIGEST_MAX_ORDERS):
+            chunk = orders[start:start + DIGEST_MAX_ORDERS]
+            data = {
+                'chat_id': settings.telegram_chat_id,
+                'text': format_order_digest(chunk),
+                'parse_mode': 'HTML',
+                'reply_markup': {'inline_keyboard': digest_buttons(chunk, settings)},
+            }
+            try:
+                delivered = _post_to_telegram(settings, data, max_wait=60, log_extra={'orders': len(chunk)})
+            except TelegramRejected:
+                # Requeued, it would be rejected again and hold up every
+                # order behind it
+                logger.error("Telegram digest rejected, dropped", extra={
+                    'order_ids': [str(order.order_id) for order in chunk],
+                })
+                continue
+            except TelegramThrottled as e:
+                logger.warning("Telegram digest throttled: retry in %ss", e.retry_after)
+                delivered = False
+            except Exception:
+                logger.exception("Error sending Telegram digest")
+                delivered = False
+            if not delivered:
+                # Leave the rest queued for the next flush
+                last = seqs[str(chunk[0].order_id)] - 1
+                break
+            sent += len(chunk)
+        
+        cache.set(DIGEST_FLUSHED_KEY, last, None)
+        cache.delete_many(keys[:last - flushed])
+        return sent
+    finally:
+        cache.delete(DIGEST_LOCK_KEY)
+
+
+# Inline status buttons. callback_data is "status:<order_id>:<new status>",
+# at most 55 bytes, inside Telegram's 64-byte limit.
+STATUS_BUTTON_LABELS = {
+    'confirmed': '✅ Confirm',
+    'in_progress': '🛠 In Progress',
+    'completed': '📦 Complete',
+    'cancelled': '❌ Cancel',
+}
+
+
+def status_buttons(order_id, status, compact=False):
+    """
+    Callback buttons for the changes Order.STATUS_TRANSITIONS allows from
+    status. Compact buttons (used in digests, several orders per message)
+    show the emoji and short order ID instead of the full label.
+    """
+    from .models import Order
+    
+    buttons = []
+    for new_status in Order.STATUS_TRANSITIONS.get(status, []):
+        label = STATUS_BUTTON_LABELS[new_status]
+        if compact:
+            label = f"{label.split()[0]} {str(order_id)[:8]}"
+        buttons.append({'text': label, 'callback_data': f"status:{order_id}:{new_status}"})
+    return buttons
+
+
+def replace_status_buttons(keyboard, order_id, status):
+    """Swap an order's buttons in an inline keyboard for those allowed from its new status"""
+    prefix = f"status:{order_id}:"
+    rows = []
+    for row in keyboard:
+        new_row = []
+        replaced = False
+        for button in row:
+            if not button.get('callback_data', '').startswith(prefix):
+                new_row.append(button)
+            elif not replaced:
+                compact = button['text'].endswith(str(order_id)[:8])
+                new_row += status_buttons(order_id, status, compact=compact)
+                replaced = True
+        if new_row:
+            rows.append(new_row)
+    return rows
+
+
+def apply_status_callback(settings, callback):
+    """
+    Apply a tap on a status button from a Telegram callback_query.
+    
+    The current status is read and the change written with one UPDATE on
+    the indexed order_id that only matches while the status is unchanged,
+    so a stale button can't undo a later change. The message is then
+    edited in place with the buttons for the order's current status.
+    
+    Returns:
+        str: text to show the user in answerCallbackQuery
+    """
+    from .models import Order
+    
+    data = callback.get('data')
+    if not isinstance(data, str):
+        return 'Unknown action'
+    try:
+        action, order_id, new_status = data.split(':')
+        order_id = uuid.UUID(order_id)
+    except ValueError:
+        return 'Unknown action'
+    if action != 'status' or new_status not in Order.STATUS_TRANSITIONS:
+        return 'Unknown action'
+    
+    labels = dict(Order.STATUS_CHOICES)
+    current = Order.objects.filter(order_id=order_id).values_list('status', 'payment_proof__id').first()
+    if current is None:
+        return 'Order not found'
+    status, proof_id = current
+    
+    updated = 0
+    if new_status in Order.STATUS_TRANSITIONS[status]:
+        # Compare-and-set on the status just read, so a concurrent change wins
+        updated = Order.objects.filter(order_id=order_id, status=status).update(
+            status=new_status, updated_at=timezone.now()
+        )
+    
+    user = callback.get('from') or {}
+    changed_by = user.get('username') or user.get('first_name') or 'Telegram'
+    if updated:
+        from . import events
+        events.status_changes([(order_id, status, new_status)], {str(order_id)} if proof_id else set())
+        status = new_status
+        reply = f"{labels[new_status]} ✓"
+        logger.info("Order status changed from Telegram", extra={
+            'order_id': order_id, 'status': new_status, 'changed_by': changed_by,
+        })
+    else:
+        if new_status in Order.STATUS_TRANSITIONS[status]:
+            # Lost the race; show the buttons for whatever it is now
+            status = Order.objects.filter(order_id=order_id).values_list('status', flat=True).first() or status
+        reply = f"Already: {labels[status]}"
+    
+    message = callback.get('message')
+    if message:
+        note = f"{labels[status]} by {changed_by}" if updated else None
+        _edit_status_message(settings, message, order_id, status, note)
+    return reply
+
+
+def _edit_status_message(settings, message, order_id, status, note=None):
+    keyboard = (message.get('reply_markup') or {}).get('inline_keyboard', [])
+    new_keyboard = replace_status_buttons(keyboard, order_id, status)
+    if not note and new_keyboard == keyboard:
+        return  # Telegram rejects edits that change nothing
+    data = {
+        'chat_id': message['chat']['id'],
+        'message_id': message['message_id'],
+        'reply_markup': {'inline_keyboard': new_keyboard},
+    }
+    orders_in_message = {
+        button['callback_data'].split(':')[1]
+        for row in keyboard for button in row
+        if button.get('callback_data', '').startswith('status:')
+    }
+    method = 'editMessageReplyMarkup'
+    if note and message.get('text') and orders_in_message == {str(order_id)}:
+        # Single-order message: append the change, keeping the original
+        # formatting (entity offsets are unaffected by appending)
+        method = 'editMessageText'
+        data['text'] = f"{message['text']}\n\n{note}"
+        data['entities'] = message.get('entities', [])
+    try:
+        _post_to_telegram(settings, data, max_wait=2, log_extra={'order_id': order_id}, method=method)
+    except TelegramThrottled:
+        logger.warning("Telegram message not updated: rate limited", extra={'order_id': order_id})
+    except TelegramRejected:
+        pass  # logged by _post_to_telegram
+    except Exception:
+        logger.exception("Error updating Telegram message", extra={'order_id': order_id})
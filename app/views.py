@@ -3,20 +3,41 @@ from django.views.generic import ListView, DetailView
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.conf import settings as django_settings
 from django.db import transaction
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponseForbidden, HttpResponseBadRequest, Http404
 from django.db.models import Q
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST, condition
+from django.utils.cache import patch_cache_control
 from decimal import Decimal
+import hashlib
+import hmac
 import json
+import logging
+import re
+import uuid
 
-from .models import Product, Order, OrderItem, CustomizationDetails, PaymentProof, WebsiteSettings, Banner
+from .models import (
+    Product, Order, OrderItem, CustomizationDetails, PaymentProof, WebsiteSettings, Banner, ArchivedOrder,
+    IdempotencyKey,
+)
 from .forms import CustomOrderForm, CustomizationForm, PaymentProofForm, OrderTrackingForm
+from .cart import Cart, MAX_CART_LINES, create_cart_order, missing_images
+from .catalog import get_catalog
+from .ratelimit import rate_limit, client_ip, post_field
+from .banners import active_banners
+
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_KEY_RE = re.compile(r'[0-9a-f]{32}')
 
 
 def home(request):
     """Landing page with featured products and banners"""
-    featured_products = Product.objects.filter(is_active=True)[:6]
-    banners = Banner.objects.filter(is_active=True, banner_type='hero')[:3]
+    featured_products = get_catalog().products[:6]
+    banners = active_banners()
     
     # Get website settings
     try:
@@ -26,7 +47,8 @@ def home(request):
     
     return render(request, 'app/home.html', {
         'featured_products': featured_products,
-        'banners': banners,
+        'banners': banners['hero'][:3],
+        'promotion_banners': banners['promotion'],
         'settings': settings
     })
 
@@ -38,7 +60,7 @@ class ProductListView(ListView):
     paginate_by = 12
     
     def get_queryset(self):
-        return Product.objects.filter(is_active=True).prefetch_related('images')
+        return get_catalog().products
 
 
 class ProductDetailView(DetailView):
@@ -46,15 +68,56 @@ class ProductDetailView(DetailView):
     template_name = 'app/product_detail.html'
     context_object_name = 'product'
     
+    def get_object(self, queryset=None):
+        product = get_catalog().get(self.kwargs['pk'], active_only=False)
+        if product is None:
+            raise Http404('Product not found')
+        return product
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['customization_form'] = CustomizationForm()
         return context
 
 
+def _idempotency_key(request):
+    """The checkout form's idempotency key, or '' if missing or malformed"""
+    key = request.POST.get('idempotency_key', '')
+    return key if IDEMPOTENCY_KEY_RE.fullmatch(key) else ''
+
+
+def _replayed_order_redirect(key):
+    """Redirect to the order a key already created, or None"""
+    if not key:
+        return None
+    order_id = IdempotencyKey.objects.filter(key=key).values_list('order__order_id', flat=True).first()
+    if order_id is None:
+        return None
+    return redirect('order_confirmation', order_id=order_id)
+
+
+def _notify_new_order(order, website_settings):
+    """Send the Telegram notification for a new order; never raises"""
+    try:
+        from .utils import send_telegram_notification_with_buttons
+        if not send_telegram_notification_with_buttons(order, website_settings):
+            logger.warning("Telegram notification not sent", extra={
+                'order_id': order.order_id,
+                'notifications_enabled': bool(website_settings and website_settings.enable_telegram_notifications),
+                'bot_token_set': bool(website_settings and website_settings.telegram_bot_token),
+                'chat_id_set': bool(website_settings and website_settings.telegram_chat_id),
+            })
+    except Exception:
+        # Don't break order flow if notification fails
+        logger.exception("Notification error", extra={'order_id': order.order_id})
+
+
+@rate_limit('create_order', keys=(client_ip, post_field('mobile_number')), methods=('POST',))
 def create_order(request, product_id):
     """Handle custom order creation"""
-    product = get_object_or_404(Product, id=product_id, is_active=True)
+    product = get_catalog().get(product_id)
+    if product is None:
+        raise Http404('Product not found')
     
     # Get website settings for payment info
     try:
@@ -62,15 +125,15 @@ def create_order(request, product_id):
     except WebsiteSettings.DoesNotExist:
         website_settings = None
     
+    idempotency_key = uuid.uuid4().hex
+    
     if request.method == 'POST':
-        # Check for duplicate submission (within last 10 seconds)
-        last_order_time = request.session.get('last_order_time')
-        if last_order_time:
-            from datetime import datetime, timedelta
-            last_time = datetime.fromisoformat(last_order_time)
-            if datetime.now() - last_time < timedelta(seconds=10):
-                messages.warning(request, '⚠️ Please wait a moment before placing another order.')
-                return redirect('product_detail', pk=product_id)
+        # A resubmitted form (double click, retry after a timeout) carries
+        # the same key: send it to the order the first submit created
+        idempotency_key = _idempotency_key(request) or idempotency_key
+        replay = _replayed_order_redirect(idempotency_key)
+        if replay:
+            return replay
         
         customization_form = CustomizationForm(request.POST, request.FILES)
         order_form = CustomOrderForm(request.POST)
@@ -84,16 +147,18 @@ def create_order(request, product_id):
                     if request.user.is_authenticated:
                         order.user = request.user
                     
+                    # Same price table the storefront's /api/prices/ serves
                     quantity = customization_form.cleaned_data['quantity']
-                    unit_price = product.base_price
+                    unit_price = get_catalog().prices[product.id]
                     total_price = unit_price * quantity
                     order.total_amount = total_price
                     order.save()
+                    IdempotencyKey.objects.create(key=idempotency_key, order=order)
                     
                     # Create order item
                     order_item = OrderItem.objects.create(
                         order=order,
-                        product=product,
+                        product_id=product.id,
                         quantity=quantity,
                         unit_price=unit_price,
                         total_price=total_price
@@ -109,26 +174,16 @@ def create_order(request, product_id):
                     payment_proof.order = order
                     payment_proof.save()
                     
-                    # Send Telegram notification
-                    try:
-                        from .utils import send_telegram_notification_with_buttons
-                        notification_sent = send_telegram_notification_with_buttons(order, website_settings)
-                        if notification_sent:
-                            print(f"✅ Telegram notification sent for order {order.order_id}")
-                        else:
-                            print(f"⚠️ Telegram notification failed for order {order.order_id}")
-                            print(f"   - Notifications enabled: {website_settings.enable_telegram_notifications if website_settings else 'No settings'}")
-                            print(f"   - Bot token exists: {bool(website_settings.telegram_bot_token) if website_settings else False}")
-                            print(f"   - Chat ID exists: {bool(website_settings.telegram_chat_id) if website_settings else False}")
-                    except Exception as e:
-                        # Don't break order flow if notification fails
-                        print(f"❌ Notification error: {e}")
-                        import traceback
-                        traceback.print_exc()
+                    logger.info("Order created", extra={
+                        'order_id': order.order_id,
+                        'product_id': product.id,
+                        'quantity': quantity,
+                        'total_amount': order.total_amount,
+                    })
                     
-                    # Set last order time to prevent duplicates
-                    from datetime import datetime
-                    request.session['last_order_time'] = datetime.now().isoformat()
+                    # After commit: sending can wait on the Telegram rate
+                    # limit, which mustn't hold the transaction open
+                    transaction.on_commit(lambda: _notify_new_order(order, website_settings))
                     
                     # Clear pending order session
                     if 'pending_order_id' in request.session:
@@ -137,11 +192,13 @@ def create_order(request, product_id):
                     messages.success(request, 'Order placed successfully! We have received your payment proof and will verify it shortly.')
                     return redirect('order_confirmation', order_id=order.order_id)
                     
-            except Exception as e:
+            except Exception:
+                # A concurrent submit with the same key got there first
+                replay = _replayed_order_redirect(idempotency_key)
+                if replay:
+                    return replay
                 messages.error(request, 'Error creating order. Please try again.')
-                print(f"Order creation error: {e}")
-                import traceback
-                traceback.print_exc()
+                logger.exception("Order creation error", extra={'product_id': product.id})
                 
     else:
         customization_form = CustomizationForm()
@@ -153,7 +210,9 @@ def create_order(request, product_id):
         'customization_form': customization_form,
         'order_form': order_form,
         'payment_form': payment_form,
-        'website_settings': website_settings
+        'website_settings': website_settings,
+        'idempotency_key': idempotency_key,
+        'price_version': get_catalog().price_etag,
     })
 
 
@@ -207,7 +266,7 @@ def payment_view(request, order_id):
 
 def order_confirmation(request, order_id):
     """Order confirmation page"""
-    order = get_object_or_404(Order, order_id=order_id)
+    order = get_object_or_404(Order.objects.with_full_detail(), order_id=order_id)
     
     # Allow access if user has payment proof or is authenticated user
     if not (hasattr(order, 'payment_proof') or 
@@ -220,6 +279,113 @@ def order_confirmation(request, order_id):
     })
 
 
+def add_to_cart(request, product_id):
+    """Add a customized product to the session cart"""
+    product = get_catalog().get(product_id)
+    if product is None:
+        raise Http404('Product not found')
+    if request.method != 'POST':
+        return redirect('product_detail', pk=product_id)
+    
+    cart = Cart(request)
+    if len(cart) >= MAX_CART_LINES:
+        messages.warning(request, f'Your cart can hold up to {MAX_CART_LINES} items. Please check out first.')
+        return redirect('view_cart')
+    
+    customization_form = CustomizationForm(request.POST, request.FILES)
+    if not customization_form.is_valid():
+        messages.error(request, 'Please check the customization details and try again.')
+        return redirect('product_detail', pk=product_id)
+    
+    cart.add(
+        product,
+        customization_form.cleaned_data['quantity'],
+        custom_text=customization_form.cleaned_data['custom_text'],
+        custom_image=customization_form.cleaned_data['custom_image'],
+        notes=customization_form.cleaned_data['notes'],
+    )
+    messages.success(request, f'{product.name} added to your cart.')
+    return redirect('view_cart')
+
+
+def remove_from_cart(request, index):
+    """Remove one line from the session cart"""
+    if request.method == 'POST':
+        Cart(request).remove(index)
+    return redirect('view_cart')
+
+
+def view_cart(request):
+    """Cart contents with the checkout form"""
+    return _render_cart(request, Cart(request).lines(), CustomOrderForm(), PaymentProofForm(), uuid.uuid4().hex)
+
+
+@rate_limit('create_order', keys=(client_ip, post_field('mobile_number')), methods=('POST',))
+def cart_checkout(request):
+    """Place one order for everything in the cart"""
+    if request.method != 'POST':
+        return redirect('view_cart')
+    idempotency_key = _idempotency_key(request) or uuid.uuid4().hex
+    replay = _replayed_order_redirect(idempotency_key)
+    if replay:
+        return replay
+    
+    cart = Cart(request)
+    lines = cart.lines()
+    if not lines:
+        messages.warning(request, 'Your cart is empty.')
+        return redirect('product_list')
+    
+    order_form = CustomOrderForm(request.POST)
+    payment_form = PaymentProofForm(request.POST, request.FILES)
+    
+    missing = missing_images(lines)
+    if missing:
+        for line in missing:
+            messages.error(request, f'The photo for {line.product.name} has expired. Please remove it and add it again.')
+        return _render_cart(request, lines, order_form, payment_form, idempotency_key)
+    
+    if order_form.is_valid() and payment_form.is_valid():
+        try:
+            website_settings = WebsiteSettings.objects.first()
+            with transaction.atomic():
+                order = order_form.save(commit=False)
+                if request.user.is_authenticated:
+                    order.user = request.user
+                create_cart_order(order, lines, payment_form.save(commit=False), idempotency_key)
+                
+                logger.info("Order created", extra={
+                    'order_id': order.order_id,
+                    'items': len(lines),
+                    'total_amount': order.total_amount,
+                })
+                transaction.on_commit(lambda: _notify_new_order(order, website_settings))
+            
+            cart.clear()
+            messages.success(request, 'Order placed successfully! We have received your payment proof and will verify it shortly.')
+            return redirect('order_confirmation', order_id=order.order_id)
+        except Exception:
+            replay = _replayed_order_redirect(idempotency_key)
+            if replay:
+                return replay
+            messages.error(request, 'Error creating order. Please try again.')
+            logger.exception("Cart checkout error")
+    
+    return _render_cart(request, lines, order_form, payment_form, idempotency_key)
+
+
+def _render_cart(request, lines, order_form, payment_form, idempotency_key):
+    return render(request, 'app/cart.html', {
+        'lines': lines,
+        'cart_total': sum(line.total_price for line in lines),
+        'order_form': order_form,
+        'payment_form': payment_form,
+        'website_settings': WebsiteSettings.objects.first(),
+        'idempotency_key': idempotency_key,
+    })
+
+
+@rate_limit('track_order', keys=(client_ip, post_field('tracking_info')), methods=('POST',))
 def track_order(request):
     """Order tracking page"""
     form = OrderTrackingForm()
@@ -230,11 +396,10 @@ def track_order(request):
         if form.is_valid():
             tracking_info = form.cleaned_data['tracking_info'].strip()
             
-            # Search by mobile number or email
-            orders = Order.objects.filter(
-                Q(mobile_number__icontains=tracking_info) | 
-                Q(email__iexact=tracking_info)
-            ).prefetch_related('items__product', 'items__customization').order_by('-created_at')
+            # Search by mobile number or email, including archived orders
+            lookup = Q(mobile_number__icontains=tracking_info) | Q(email__iexact=tracking_info)
+            orders = list(Order.objects.with_full_detail().filter(lookup).order_by('-created_at'))
+            orders += ArchivedOrder.objects.with_full_detail().filter(lookup).order_by('-created_at')
             
             if not orders:
                 messages.warning(request, 'No orders found with the provided information.')
@@ -245,16 +410,17 @@ def track_order(request):
     })
 
 
+@rate_limit('calculate_price', json=True)
 def calculate_price(request):
-    """AJAX endpoint for price calculation"""
+    """AJAX endpoint for price calculation (superseded by price_table)"""
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
             product_id = data.get('product_id')
             quantity = int(data.get('quantity', 1))
             
-            product = get_object_or_404(Product, id=product_id)
-            total_price = product.base_price * quantity
+            lines, total_price = get_catalog().quote([(product_id, quantity)])
+            product = lines[0][0]
             
             return JsonResponse({
                 'success': True,
@@ -265,4 +431,101 @@ def calculate_price(request):
         except Exception as e:
             return JsonResponse({'success': False, 'error': str(e)})
     
-    return JsonResponse({'success': False, 'error': 'Invalid request'})
\ No newline at end of file
+    return JsonResponse({'success': False, 'error': 'Invalid request'})
+
+
+def _parse_price_items(value):
+    """'3:2,5:1' -> [(3, 2), (5, 1)]; raises ValueError"""
+    items = []
+    for part in value.split(','):
+        product_id, _, quantity = part.partition(':')
+        items.append((int(product_id), int(quantity or 1)))
+    if len(items) > MAX_CART_LINES:
+        raise ValueError(f'At most {MAX_CART_LINES} items')
+    return items
+
+
+def _price_table_etag(request):
+    etag = get_catalog().price_etag
+    if request.GET.get('items'):
+        etag += '-' + hashlib.md5(request.GET['items'].encode()).hexdigest()
+    return etag
+
+
+@require_GET
+@condition(etag_func=_price_table_etag)
+def price_table(request):
+    """
+    Prices of all active products as exact decimal strings, or with
+    ?items=<id>:<quantity>,... a quote for those lines. Served from the
+    catalog snapshot that order totals are computed from; cacheable by the
+    browser and revalidated by ETag.
+    """
+    catalog = get_catalog()
+    if request.GET.get('items'):
+        try:
+            lines, total = catalog.quote(_parse_price_items(request.GET['items']))
+        except ValueError as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+        data = {
+            'success': True,
+            'items': [
+                {
+                    'product_id': product.id,
+                    'quantity': quantity,
+                    'unit_price': str(product.base_price),
+                    'total_price': str(line_total),
+                }
+                for product, quantity, line_total in lines
+            ],
+            'total': str(total),
+        }
+    else:
+        data = {
+            'success': True,
+            'version': catalog.price_etag,
+            'prices': {str(product_id): str(price) for product_id, price in catalog.prices.items()},
+        }
+    
+    response = JsonResponse(data)
+    patch_cache_control(response, public=True, max_age=getattr(django_settings, 'PRICE_TABLE_MAX_AGE', 300))
+    return response
+
+
+@csrf_exempt
+@require_POST
+def telegram_webhook(request):
+    """Receive Telegram updates: taps on the order status buttons"""
+    website_settings = WebsiteSettings.objects.first()
+    secret = website_settings.telegram_webhook_secret if website_settings else ''
+    received = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+    if not secret or not hmac.compare_digest(secret, received):
+        return HttpResponseForbidden()
+    
+    try:
+        update = json.loads(request.body)
+    except ValueError:
+        return HttpResponseBadRequest()
+    if not isinstance(update, dict):
+        return HttpResponseBadRequest()
+    
+    # Other update types are acknowledged and ignored
+    callback = update.get('callback_query')
+    if not isinstance(callback, dict):
+        return JsonResponse({})
+    
+    message = callback.get('message')
+    chat = message.get('chat') if isinstance(message, dict) else None
+    chat_id = chat.get('id') if isinstance(chat, dict) else None
+    if str(chat_id) != website_settings.telegram_chat_id.strip():
+        text = 'Not allowed'
+    else:
+        from .utils import apply_status_callback
+        text = apply_status_callback(website_settings, callback)
+    
+    # Answer the callback in the webhook response instead of another API call
+    return JsonResponse({
+        'method': 'answerCallbackQuery',
+        'callback_query_id': callback.get('id'),
+        'text': text,
+    })
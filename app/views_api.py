@@ -0,0 +1,183 @@
+"""
+Read-only JSON catalog API for mobile clients and other front-ends.
+
+Rows come straight from values() queries, without instantiating models.
+Every response carries an ETag and Last-Modified, so clients revalidate
+with If-None-Match / If-Modified-Since and get a 304 without a body.
+"""
+import calendar
+import hashlib
+
+from django.conf import settings as django_settings
+from django.db.models import Count, Max
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_GET
+
+from .banners import active_banners
+from .catalog import current_version as catalog_version
+from .models import Product, ProductImage, Banner, WebsiteSettings
+
+
+PRODUCT_FIELDS = ['id', 'name', 'description', 'base_price', 'customization_type', 'updated_at', 'image_url']
+BANNER_FIELDS = [
+    'id', 'title', 'subtitle', 'banner_type', 'image_url', 'link_url', 'link_text', 'order',
+    'starts_at', 'ends_at', 'updated_at',
+]
+SETTINGS_FIELDS = [
+    'site_name', 'tagline', 'contact_phone', 'contact_email', 'whatsapp_number', 'address',
+    'instagram_url', 'facebook_url', 'processing_time_days', 'delivery_time_days', 'updated_at',
+]
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def _error(message, status=400):
+    return JsonResponse({'success': False, 'error': message}, status=status)
+
+
+def _fields(request, allowed):
+    """Fields named in ?fields=a,b (default: all), validated against allowed"""
+    value = request.GET.get('fields', '')
+    if not value:
+        return list(allowed)
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise BadRequest(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(allowed)}")
+    return fields
+
+
+def _image_url(model, name):
+    return model._meta.get_field('image').storage.url(name) if name else ''
+
+
+def _respond(request, stats, build, version=''):
+    """
+    Conditional JSON response.
+
+    stats is an aggregate with 'count' and 'last_modified' over the rows
+    the response covers; together with version and the query string it
+    makes the ETag, so adding, editing or removing a row changes it.
+    build() produces the payload and only runs when the client's copy is
+    out of date.
+    """
+    last_modified = stats['last_modified']
+    timestamp = calendar.timegm(last_modified.utctimetuple()) if last_modified else None
+    etag = quote_etag(hashlib.md5(
+        f"{version}:{stats['count']}:{last_modified}:{request.GET.urlencode()}".encode()
+    ).hexdigest())
+
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = JsonResponse(build())
+    response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    patch_cache_control(response, public=True, max_age=getattr(django_settings, 'CATALOG_API_MAX_AGE', 60))
+    return response
+
+
+@require_GET
+def api_products(request):
+    """
+    Active products, ordered by id.
+
+    Query parameters:
+    - fields: comma-separated subset of PRODUCT_FIELDS
+    - limit: page size (default 24, at most 100)
+    - cursor: next_cursor from the previous page
+    """
+    try:
+        fields = _fields(request, PRODUCT_FIELDS)
+        limit = min(int(request.GET.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+        cursor = int(request.GET.get('cursor') or 0)
+        if limit < 1 or cursor < 0:
+            raise ValueError
+    except BadRequest as e:
+        return _error(str(e))
+    except ValueError:
+        return _error('limit and cursor must be positive integers')
+
+    products = Product.objects.filter(is_active=True)
+
+    def build():
+        columns = {'id'} | {field for field in fields if field != 'image_url'}
+        rows = list(products.filter(id__gt=cursor).order_by('id').values(*columns)[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        if 'image_url' in fields:
+            images = {}
+            # Primary image first, then display order; keep the first per product
+            for product_id, name in ProductImage.objects.filter(
+                product_id__in=[row['id'] for row in rows]
+            ).order_by('product_id', '-is_primary', 'order').values_list('product_id', 'image'):
+                images.setdefault(product_id, name)
+            for row in rows:
+                row['image_url'] = _image_url(ProductImage, images.get(row['id']))
+
+        return {
+            'success': True,
+            'results': [{field: row[field] for field in fields} for row in rows],
+            'next_cursor': str(rows[-1]['id']) if has_more else None,
+        }
+
+    # Image changes don't touch Product.updated_at; the catalog version does
+    stats = products.aggregate(count=Count('id'), last_modified=Max('updated_at'))
+    return _respond(request, stats, build, version=catalog_version())
+
+
+@require_GET
+def api_banners(request):
+    """Banners showing now, in display order; ?fields= and ?type= (hero, promotion, ...)"""
+    try:
+        fields = _fields(request, BANNER_FIELDS)
+    except BadRequest as e:
+        return _error(str(e))
+
+    banner_type = request.GET.get('type', '')
+    types = [value for value, _ in Banner.BANNER_TYPES]
+    if banner_type and banner_type not in types:
+        return _error(f"Unknown type: {banner_type}. Available: {', '.join(types)}")
+
+    # Ids from the cached resolver, so scheduled changes show up on time
+    resolved = active_banners()
+    if banner_type:
+        resolved = {banner_type: resolved[banner_type]}
+    ids = [banner.id for group in resolved.values() for banner in group]
+    banners = Banner.objects.filter(id__in=ids)
+
+    def build():
+        columns = {field for field in fields if field != 'image_url'}
+        if 'image_url' in fields:
+            columns.add('image')
+        rows = list(banners.values(*columns))
+        for row in rows:
+            if 'image_url' in fields:
+                row['image_url'] = _image_url(Banner, row['image'])
+        return {'success': True, 'results': [{field: row[field] for field in fields} for row in rows]}
+
+    stats = banners.aggregate(count=Count('id'), last_modified=Max('updated_at'))
+    return _respond(request, stats, build, version=','.join(map(str, sorted(ids))))
+
+
+@require_GET
+def api_settings(request):
+    """Public shop settings (contact details, delivery times); ?fields="""
+    try:
+        fields = _fields(request, SETTINGS_FIELDS)
+    except BadRequest as e:
+        return _error(str(e))
+
+    settings_row = WebsiteSettings.objects.values(*fields).first()
+    if settings_row is None:
+        return _error('Website settings not configured', status=404)
+
+    stats = WebsiteSettings.objects.aggregate(count=Count('id'), last_modified=Max('updated_at'))
+    return _respond(request, stats, lambda: {'success': True, 'result': settings_row})
@@ -1,11 +1,18 @@
-from django.http import HttpResponse, HttpResponseNotFound
+from django.http import HttpResponse, HttpResponseNotFound, HttpResponseServerError
 from django.views.decorators.http import require_GET
 from django.conf import settings as django_settings
+import hashlib
+import logging
 from .models import WebsiteSettings
+from .ratelimit import rate_limit
+from .singleflight import get_or_compute
 from .utils import generate_qr_image_bytes
 
+logger = logging.getLogger(__name__)
+
 
 @require_GET
+@rate_limit('upi_qr')
 def upi_qr(request):
     """Generate and return a QR PNG for the current UPI ID in WebsiteSettings.
     Priority: if WebsiteSettings.upi_id is set, generate QR for it dynamically.
@@ -36,10 +43,16 @@ def upi_qr(request):
                 except ValueError:
                     pass  # Skip invalid amount
             
-            qr_file = generate_qr_image_bytes(upi_uri)
-            return HttpResponse(qr_file.read(), content_type='image/png')
-        except Exception as e:
-            return HttpResponseNotFound(f'QR generation error: {e}')
+            # Keyed by the URI, so a settings change gets a new image
+            png = get_or_compute(
+                'upi_qr:' + hashlib.md5(upi_uri.encode()).hexdigest(),
+                lambda: generate_qr_image_bytes(upi_uri).read(),
+                getattr(django_settings, 'QR_CACHE_SECONDS', 86400),
+            )
+            return HttpResponse(png, content_type='image/png')
+        except Exception:
+            logger.exception("UPI QR generation failed")
+            return HttpResponseServerError('Could not generate the QR code')
 
     if ws.payment_qr_code:
         # stream the stored file
@@ -27,14 +27,10 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
 
-    // Auto-refresh for dashboard (every 30 seconds)
-    if (window.location.pathname.includes('dashboard')) {
-        setInterval(() => {
-            // Only refresh if page is visible
-            if (!document.hidden) {
-                location.reload();
-            }
-        }, 30000);
+    // Live dashboard updates pushed by the server
+    const recentOrders = document.getElementById('recentOrders');
+    if (recentOrders && window.EventSource) {
+        startDashboardEvents(recentOrders);
     }
 
     // Quick status update via AJAX
@@ -48,6 +44,32 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
 
+    // Bulk status update on the orders page
+    const bulkApply = document.getElementById('bulkStatusApply');
+    if (bulkApply) {
+        const selectAll = document.getElementById('bulkSelectAll');
+        const orderChecks = document.querySelectorAll('.bulk-order-select');
+        const selectedCount = document.getElementById('bulkSelectedCount');
+
+        const refreshSelection = () => {
+            const count = document.querySelectorAll('.bulk-order-select:checked').length;
+            selectedCount.textContent = count;
+            bulkApply.disabled = count === 0;
+        };
+
+        selectAll.addEventListener('change', function() {
+            orderChecks.forEach(check => { check.checked = this.checked; });
+            refreshSelection();
+        });
+        orderChecks.forEach(check => check.addEventListener('change', refreshSelection));
+
+        bulkApply.addEventListener('click', function() {
+            const orderIds = Array.from(document.querySelectorAll('.bulk-order-select:checked')).map(c => c.value);
+            const status = document.getElementById('bulkStatusSelect').value;
+            bulkUpdateOrderStatus(orderIds, status, this);
+        });
+    }
+
     // Form validation enhancement
     const forms = document.querySelectorAll('form');
     forms.forEach(form => {
@@ -190,6 +212,44 @@ function updateOrderStatus(orderId, newStatus, selectElement) {
     });
 }
 
+function bulkUpdateOrderStatus(orderIds, newStatus, button) {
+    button.disabled = true;
+
+    fetch('/api/admin/bulk-update-order-status/', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value
+        },
+        body: JSON.stringify({
+            order_ids: orderIds,
+            status: newStatus
+        })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (!data.success) {
+            showToast('Error updating orders: ' + data.error, 'danger');
+            button.disabled = false;
+            return;
+        }
+        if (data.failed) {
+            const errors = Object.entries(data.results)
+                .filter(([, result]) => !result.success)
+                .map(([orderId, result]) => orderId.slice(0, 8) + ': ' + result.error);
+            showToast(`Updated ${data.updated}, failed ${data.failed}<br>` + errors.join('<br>'), 'warning');
+            setTimeout(() => location.reload(), 3000);
+        } else {
+            showToast(`Updated ${data.updated} orders`, 'success');
+            location.reload();
+        }
+    })
+    .catch(error => {
+        showToast('Network error. Please try again.', 'danger');
+        button.disabled = false;
+    });
+}
+
 function clearImagePreview(button) {
     const preview = button.parentNode;
     const fileInput = preview.parentNode.querySelector('input[type="file"]');
@@ -252,4 +312,122 @@ if ('serviceWorker' in navigator) {
             console.log('SW registration failed: ', registrationError);
         });
     });
-}
\ No newline at end of file
+}
+
+// Dashboard live updates (server-sent events)
+const STATUS_BADGE_CLASSES = {
+    pending_payment: 'bg-warning text-dark',
+    confirmed: 'bg-info',
+    in_progress: 'bg-primary',
+    completed: 'bg-success',
+    cancelled: 'bg-danger'
+};
+const RECENT_ORDERS_SHOWN = 5;
+
+function startDashboardEvents(container) {
+    const source = new EventSource(container.dataset.eventsUrl);
+
+    source.addEventListener('order_created', e => {
+        const order = JSON.parse(e.data);
+        adjustStat('total', 1);
+        adjustStat(order.status, 1);
+        adjustStat('today', 1);
+        addRecentOrder(container, order);
+    });
+
+    source.addEventListener('payment_proof_added', e => {
+        const data = JSON.parse(e.data);
+        if (data.status === 'pending_payment') {
+            adjustStat('attention', 1);
+        }
+    });
+
+    source.addEventListener('status_changed', e => {
+        const change = JSON.parse(e.data);
+        adjustStat(change.old_status, -1);
+        adjustStat(change.status, 1);
+        if (change.has_proof) {
+            if (change.old_status === 'pending_payment') adjustStat('attention', -1);
+            if (change.status === 'pending_payment') adjustStat('attention', 1);
+        }
+        document.querySelectorAll(`[data-order-id="${change.order_id}"] [data-status-badge]`).forEach(badge => {
+            badge.className = `badge ${STATUS_BADGE_CLASSES[change.status]}`;
+            badge.textContent = change.status_display;
+        });
+    });
+
+    // Missed too many events: fall back to a full reload
+    source.addEventListener('resync', () => {
+        source.close();
+        location.reload();
+    });
+}
+
+function adjustStat(name, delta) {
+    document.querySelectorAll(`[data-stat="${name}"]`).forEach(el => {
+        const value = Math.max(0, (parseInt(el.textContent, 10) || 0) + delta);
+        el.textContent = value;
+        if (name === 'attention') {
+            el.classList.toggle('d-none', value === 0);
+        }
+        if (name === 'today') {
+            document.getElementById('todaySummary').classList.toggle('d-none', value === 0);
+            document.querySelectorAll('[data-plural="today"]').forEach(p => p.textContent = value === 1 ? '' : 's');
+        }
+    });
+}
+
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text;
+    return div.innerHTML;
+}
+
+function addRecentOrder(container, order) {
+    const rows = document.getElementById('recentOrderRows');
+    const cards = document.getElementById('recentOrderCards');
+    if (!rows || !cards) {
+        // Dashboard was showing the empty state
+        location.reload();
+        return;
+    }
+
+    const url = container.dataset.orderUrl.replace('00000000-0000-0000-0000-000000000000', order.order_id);
+    const shortId = order.order_id.slice(0, 11) + '…';
+    const badge = `<span data-status-badge class="badge ${STATUS_BADGE_CLASSES[order.status]}">${escapeHtml(order.status_display)}</span>`;
+
+    rows.insertAdjacentHTML('afterbegin', `
+        <tr data-order-id="${order.order_id}" class="table-success">
+            <td><small class="font-monospace text-muted">${shortId}</small></td>
+            <td><div><strong>${escapeHtml(order.full_name)}</strong><br><small class="text-muted">${escapeHtml(order.mobile_number)}</small></div></td>
+            <td>${badge}</td>
+            <td><strong class="text-success">₹${order.total_amount}</strong></td>
+            <td><small>${escapeHtml(order.created_at)}</small></td>
+            <td><a href="${url}" class="btn btn-sm btn-primary"><i class="bi bi-eye"></i></a></td>
+        </tr>`);
+
+    cards.insertAdjacentHTML('afterbegin', `
+        <div class="border-bottom p-3" data-order-id="${order.order_id}">
+            <div class="d-flex justify-content-between align-items-start mb-2">
+                <div>
+                    <h6 class="mb-1 fw-bold">${escapeHtml(order.full_name)}</h6>
+                    <small class="text-muted">${escapeHtml(order.mobile_number)}</small>
+                </div>
+                ${badge}
+            </div>
+            <div class="row g-2 mb-2">
+                <div class="col-6"><small class="text-muted">Order ID:</small><br><small class="font-monospace">${shortId}</small></div>
+                <div class="col-6"><small class="text-muted">Amount:</small><br><strong class="text-success">₹${order.total_amount}</strong></div>
+            </div>
+            <div class="d-flex justify-content-between align-items-center">
+                <small class="text-muted">${escapeHtml(order.created_at)}</small>
+                <a href="${url}" class="btn btn-sm btn-primary"><i class="bi bi-eye me-1"></i>View</a>
+            </div>
+        </div>`);
+
+    [rows, cards].forEach(list => {
+        while (list.children.length > RECENT_ORDERS_SHOWN) {
+            list.lastElementChild.remove();
+        }
+    });
+}
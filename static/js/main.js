@@ -81,8 +81,23 @@ document.addEventListener('DOMContentLoaded', function() {
         input.addEventListener('input', function() {
             calculatePrice(this);
         });
+        input.addEventListener('change', function() {
+            calculatePrice(this);
+        });
     });
 
+    // Refresh the shown unit price from the current price table
+    const unitPriceElement = document.getElementById('unit-price');
+    if (unitPriceElement && unitPriceElement.dataset.productId) {
+        loadPriceTable(unitPriceElement.dataset.pricesUrl, unitPriceElement.dataset.pricesVersion).then(table => {
+            const price = table && table.prices[unitPriceElement.dataset.productId];
+            if (price) {
+                unitPriceElement.textContent = price;
+                quantityInputs.forEach(input => calculatePrice(input));
+            }
+        });
+    }
+
     // Navbar scroll effect
     const navbar = document.querySelector('.navbar');
     if (navbar) {
@@ -153,6 +168,25 @@ function clearImagePreview(button) {
     preview.remove();
 }
 
+// Price table from /api/prices/, fetched once per browser session (and
+// again if a page reports a newer table version)
+function loadPriceTable(url, version) {
+    const stored = JSON.parse(sessionStorage.getItem('priceTable') || 'null');
+    if (stored && (!version || stored.version === version)) {
+        return Promise.resolve(stored);
+    }
+    return fetch(url || '/api/prices/', { headers: { 'Accept': 'application/json' } })
+        .then(response => response.ok ? response.json() : null)
+        .then(table => {
+            if (table && table.success) {
+                sessionStorage.setItem('priceTable', JSON.stringify(table));
+                return table;
+            }
+            return null;
+        })
+        .catch(() => null);
+}
+
 function calculatePrice(quantityInput) {
     const quantity = parseInt(quantityInput.value) || 1;
     const unitPriceElement = document.getElementById('unit-price');
@@ -160,8 +194,9 @@ function calculatePrice(quantityInput) {
     const quantityDisplayElement = document.getElementById('quantity-display');
     
     if (unitPriceElement && totalPriceElement) {
-        const unitPrice = parseFloat(unitPriceElement.textContent);
-        const totalPrice = unitPrice * quantity;
+        // Work in paise so totals match the server's decimal arithmetic
+        const unitPaise = Math.round(parseFloat(unitPriceElement.textContent) * 100);
+        const totalPrice = (unitPaise * quantity) / 100;
         
         totalPriceElement.textContent = `₹${totalPrice.toFixed(2)}`;
         if (quantityDisplayElement) {